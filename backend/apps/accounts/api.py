@@ -4,9 +4,9 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, viewsets, permissions
 from django.contrib.auth import authenticate
-from rest_framework_simplejwt.tokens import RefreshToken
 
 from apps.accounts.models import Membership, OrgRoleGroup, OrgRole
+from apps.accounts.tokens import RoleClaimsRefreshToken
 
 
 class AuthView(APIView):
@@ -18,7 +18,7 @@ class AuthView(APIView):
         user = authenticate(username=username, password=password)
         if not user:
             return Response({"detail":"Invalid credentials"}, status=status.HTTP_401_UNAUTHORIZED)
-        refresh = RefreshToken.for_user(user)
+        refresh = RoleClaimsRefreshToken.for_user(user)
         return Response({"access": str(refresh.access_token), "refresh": str(refresh)})
 
 class MeView(APIView):
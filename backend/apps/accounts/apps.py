@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = "django_mongodb_backend.fields.ObjectIdAutoField"
     name = 'apps.accounts'
+
+    def ready(self):
+        # Import signal handlers
+        from . import signals
@@ -0,0 +1,73 @@
+# apps/accounts/authentication.py
+from bson import ObjectId
+from bson.errors import InvalidId
+from django.utils.functional import SimpleLazyObject
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from .utils import membership_version
+
+
+class TokenClaimsUser(SimpleLazyObject):
+    """
+    Request user answered from the access token's claims.
+
+    Identity and role checks never touch Mongo; any other attribute
+    (e.g. ``is_superuser`` or assigning the user to a foreign key) loads the
+    real user once.
+    """
+
+    def __init__(self, token, loader):
+        self.__dict__["_token"] = token
+        super().__init__(loader)
+
+    def __bool__(self):
+        return True
+
+    @property
+    def pk(self):
+        user_id = self._token[api_settings.USER_ID_CLAIM]
+        try:
+            return ObjectId(user_id)
+        except (InvalidId, TypeError):
+            return user_id
+
+    id = pk
+
+    @property
+    def is_authenticated(self):
+        return True
+
+    @property
+    def is_anonymous(self):
+        return False
+
+    @property
+    def username(self):
+        return self._token.get("username", "")
+
+    @property
+    def role_claims(self):
+        return tuple(self._token.get("roles", ()))
+
+    @property
+    def membership_version(self):
+        return self._token.get("mver")
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that trusts role claims while the membership version
+    embedded in the token is still current; stale tokens fall back to the
+    regular user lookup.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if (
+            user_id is not None
+            and "roles" in validated_token
+            and validated_token.get("mver") == membership_version(user_id)
+        ):
+            return TokenClaimsUser(validated_token, lambda: super(ClaimsJWTAuthentication, self).get_user(validated_token))
+        return super().get_user(validated_token)
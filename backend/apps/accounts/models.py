@@ -25,4 +25,13 @@ class Membership(models.Model):
     role = models.ForeignKey(OrgRole, on_delete=models.CASCADE, related_name="members")
 
     class Meta:
-        unique_together = [("user", "role")]
\ No newline at end of file
+        unique_together = [("user", "role")]
+
+class MembershipVersion(models.Model):
+    """Per-user counter bumped whenever the user's memberships or account change"""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="+"
+    )
+    version = models.PositiveIntegerField(default=0)
@@ -0,0 +1,132 @@
+# apps/accounts/provisioning.py
+import csv
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+
+from .models import Membership, OrgRole
+
+User = get_user_model()
+
+BATCH_SIZE = getattr(settings, "BULK_PROVISION_BATCH_SIZE", 200)
+HASH_WORKERS = getattr(settings, "BULK_PROVISION_HASH_WORKERS", 4)
+
+TRUE_VALUES = {"1", "true", "yes", "y", "on"}
+
+
+def _as_bool(value, default):
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+def _as_role_list(value):
+    if not value:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(code).strip() for code in value if str(code).strip()]
+    # CSV cells carry several role codes separated by ';' or '|'
+    return [code.strip() for code in str(value).replace("|", ";").split(";") if code.strip()]
+
+
+def parse_rows(data, uploaded_file=None) -> list[dict]:
+    """Read provisioning rows from an uploaded CSV file or a JSON payload"""
+    if uploaded_file is not None:
+        text = io.TextIOWrapper(uploaded_file, encoding="utf-8-sig")
+        return [dict(row) for row in csv.DictReader(text)]
+
+    if isinstance(data, dict):
+        data = data.get("users", [])
+    if not isinstance(data, list):
+        raise ValueError("Expected a list of users or a CSV file")
+    return [row if isinstance(row, dict) else {} for row in data]
+
+
+def provision_users(rows: list[dict]) -> list[dict]:
+    """
+    Create users and their memberships in batches.
+
+    Every input row gets a result entry (``created`` or ``error``) in input
+    order, so a partially bad file still provisions all of its valid rows.
+    """
+    results = [None] * len(rows)
+    pending = []
+    seen = set()
+
+    usernames = [str(row.get("username") or "").strip() for row in rows]
+    existing = set(User.objects.filter(username__in=[u for u in usernames if u]).values_list("username", flat=True))
+
+    all_codes = {code for row in rows for code in _as_role_list(row.get("roles") or row.get("selected_roles"))}
+    role_ids = dict(OrgRole.objects.filter(code__in=all_codes).values_list("code", "id")) if all_codes else {}
+
+    for index, (row, username) in enumerate(zip(rows, usernames)):
+        errors = []
+        if not username:
+            errors.append("username is required")
+        elif username in existing:
+            errors.append("username already exists")
+        elif username in seen:
+            errors.append("duplicate username in payload")
+
+        if errors:
+            results[index] = {"row": index + 1, "username": username, "status": "error", "errors": errors}
+            continue
+
+        seen.add(username)
+        codes = _as_role_list(row.get("roles") or row.get("selected_roles"))
+        pending.append((index, username, row, codes))
+
+    with ThreadPoolExecutor(max_workers=HASH_WORKERS) as pool:
+        for start in range(0, len(pending), BATCH_SIZE):
+            batch = pending[start:start + BATCH_SIZE]
+
+            # Password hashing dominates the cost of a batch and releases the GIL
+            passwords = list(pool.map(
+                lambda item: make_password(item[2].get("password") or None),
+                batch,
+            ))
+
+            users = [
+                User(
+                    username=username,
+                    email=row.get("email", "") or "",
+                    first_name=row.get("first_name", "") or "",
+                    last_name=row.get("last_name", "") or "",
+                    is_active=_as_bool(row.get("is_active"), True),
+                    is_superuser=_as_bool(row.get("is_superuser"), False),
+                    password=password,
+                )
+                for (_, username, row, _), password in zip(batch, passwords)
+            ]
+            try:
+                users = User.objects.bulk_create(users)
+            except Exception as e:
+                for index, username, _, _ in batch:
+                    results[index] = {"row": index + 1, "username": username, "status": "error", "errors": [str(e)]}
+                continue
+
+            memberships = [
+                Membership(user=user, role_id=role_ids[code])
+                for user, (_, _, _, codes) in zip(users, batch)
+                for code in dict.fromkeys(codes)
+                if code in role_ids
+            ]
+            if memberships:
+                Membership.objects.bulk_create(memberships)
+
+            for user, (index, username, _, codes) in zip(users, batch):
+                results[index] = {
+                    "row": index + 1,
+                    "username": username,
+                    "status": "created",
+                    "id": str(user.pk),
+                    "roles": [code for code in dict.fromkeys(codes) if code in role_ids],
+                    "unknown_roles": [code for code in codes if code not in role_ids],
+                }
+
+    return results
@@ -0,0 +1,26 @@
+# apps/accounts/signals.py
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Membership
+from .utils import bump_membership_version
+
+User = get_user_model()
+
+@receiver(post_save, sender=Membership)
+@receiver(post_delete, sender=Membership)
+def invalidate_role_claims(sender, instance, origin=None, **kwargs):
+    """Role claims in issued tokens go stale when a membership changes"""
+    if isinstance(origin, User) or getattr(origin, "model", None) is User:
+        # Cascade from deleting the user: bumping would recreate the
+        # user's MembershipVersion after it was deleted
+        return
+    bump_membership_version(instance.user_id)
+
+@receiver(post_save, sender=User)
+def invalidate_user_claims(sender, instance, created, update_fields=None, **kwargs):
+    """Account changes (deactivation, password) must also re-check issued tokens"""
+    if created or (update_fields and set(update_fields) <= {"last_login"}):
+        return
+    bump_membership_version(instance.pk)
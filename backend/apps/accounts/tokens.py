@@ -0,0 +1,37 @@
+# apps/accounts/tokens.py
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import Membership
+from .utils import issued_membership_version
+
+User = get_user_model()
+
+
+class RoleClaimsRefreshToken(RefreshToken):
+    """
+    Refresh token whose access tokens carry the user's role codes.
+
+    The claims are read each time an access token is issued, on login and on
+    every refresh, so a refreshed access token never repeats the roles of an
+    old one.
+    """
+
+    no_copy_claims = RefreshToken.no_copy_claims + ("roles", "mver", "username")
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        user_id = self[api_settings.USER_ID_CLAIM]
+        # Read the version before the roles: a concurrent change then leaves
+        # the token stale instead of pairing new roles with an old version.
+        access["mver"] = issued_membership_version(user_id)
+        access["roles"] = sorted(set(Membership.objects.filter(user_id=user_id).values_list("role__code", flat=True)))
+        access["username"] = User.objects.filter(pk=user_id).values_list("username", flat=True).first() or ""
+        return access
+
+
+class RoleClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = RoleClaimsRefreshToken
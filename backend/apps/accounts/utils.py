@@ -1,7 +1,96 @@
 # apps/accounts/utils.py
-from .models import Membership
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F
+from pymongo import DeleteMany, InsertOne
+
+from .models import Membership, MembershipVersion, OrgRole
+
+MEMBERSHIP_VERSION_CACHE_TTL = getattr(settings, "MEMBERSHIP_VERSION_CACHE_TTL", 30)
 
 def user_role_codes(user) -> set[str]:
     if not user.is_authenticated:
         return set()
+    # Users authenticated from a current token carry their roles as claims
+    claimed = getattr(user, "role_claims", None)
+    if claimed is not None:
+        return set(claimed)
     return set(Membership.objects.filter(user=user).values_list("role__code", flat=True))
+
+def _membership_version_key(user_id) -> str:
+    return f"accounts:mver:{user_id}"
+
+def membership_version(user_id) -> int:
+    """
+    Return the user's membership version from a small cache.
+
+    A bump is visible immediately wherever the cache is shared; with the
+    default per-process cache that is only the bumping process, and other
+    processes see it within MEMBERSHIP_VERSION_CACHE_TTL seconds. Users
+    without a counter (deleted, or never issued a token) get -1, which no
+    token carries.
+    """
+    key = _membership_version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = MembershipVersion.objects.filter(user_id=user_id).values_list("version", flat=True).first()
+        if version is None:
+            version = -1
+        cache.set(key, version, MEMBERSHIP_VERSION_CACHE_TTL)
+    return version
+
+def issued_membership_version(user_id) -> int:
+    """The version to embed in a new token, creating the user's counter on first use"""
+    version = membership_version(user_id)
+    if version < 0:
+        MembershipVersion.objects.get_or_create(user_id=user_id)
+        cache.delete(_membership_version_key(user_id))
+        version = membership_version(user_id)
+    return version
+
+def bump_membership_version(user_id) -> None:
+    """Invalidate role claims issued to the user so far"""
+    updated = MembershipVersion.objects.filter(user_id=user_id).update(version=F("version") + 1)
+    if not updated:
+        _, created = MembershipVersion.objects.get_or_create(user_id=user_id, defaults={"version": 1})
+        if not created:
+            MembershipVersion.objects.filter(user_id=user_id).update(version=F("version") + 1)
+    cache.delete(_membership_version_key(user_id))
+
+def sync_memberships(user, role_codes) -> dict:
+    """
+    Bring a user's memberships in line with ``role_codes``.
+
+    The add/remove diff is computed against the current memberships and applied
+    with a single unordered bulk write. Unknown role codes are skipped and
+    reported back to the caller.
+    """
+    wanted = set(role_codes or [])
+    role_ids = dict(OrgRole.objects.filter(code__in=wanted).values_list("code", "id")) if wanted else {}
+    current = dict(Membership.objects.filter(user=user).values_list("role__code", "role_id"))
+
+    added = sorted(code for code in role_ids if code not in current)
+    removed = sorted(code for code in current if code not in wanted)
+
+    user_column = Membership._meta.get_field("user").column
+    role_column = Membership._meta.get_field("role").column
+
+    ops = []
+    if removed:
+        ops.append(DeleteMany({
+            user_column: user.pk,
+            role_column: {"$in": [current[code] for code in removed]},
+        }))
+    ops.extend(InsertOne({user_column: user.pk, role_column: role_ids[code]}) for code in added)
+
+    if ops:
+        connection.get_collection(Membership._meta.db_table).bulk_write(ops, ordered=False)
+        # The raw bulk write bypasses the Membership signals
+        bump_membership_version(user.pk)
+
+    return {
+        "added": added,
+        "removed": removed,
+        "unknown": sorted(wanted - set(role_ids)),
+    }
@@ -2,6 +2,8 @@
 from rest_framework import viewsets, permissions, status, decorators
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db.models import Q, Count
 from django.http import HttpResponse
@@ -11,9 +13,13 @@ import json
 import csv
 
 from apps.accounts.models import OrgRole, OrgRoleGroup, Membership
+from apps.accounts.provisioning import parse_rows, provision_users
+from apps.accounts.utils import sync_memberships
 from apps.workflows.models import Workflow
-from apps.workflows.workflow_spec import ADVANCER_STEPS, STATE_ORDER
+from apps.workflows.workflow_spec import ADVANCER_STEPS, OPEN_STATES, STATE_ORDER
 from .models import SystemLog
+from .presence import tracker as presence_tracker
+from workflow_engine.mongo_profiler import recent as mongo_profiles
 from .serializers import SystemLogSerializer
 
 User = get_user_model()
@@ -28,7 +34,7 @@ class AdminStatsView(APIView):
         
         # Calculate stats
         total_users = User.objects.count()
-        active_workflows = Workflow.objects.exclude(state='Settlment').count()
+        active_workflows = Workflow.objects.filter(state__in=OPEN_STATES).count()
         pending_approvals = Workflow.objects.filter(
             # Add logic for pending approvals based on your workflow
         ).count()
@@ -173,12 +179,7 @@ class AdminUsersViewSet(viewsets.ModelViewSet):
             
             # Assign roles
             selected_roles = data.get('selected_roles', [])
-            for role_code in selected_roles:
-                try:
-                    role = OrgRole.objects.get(code=role_code)
-                    Membership.objects.create(user=user, role=role)
-                except OrgRole.DoesNotExist:
-                    continue
+            sync_memberships(user, selected_roles)
             
             # Log the action
             SystemLog.objects.create(
@@ -219,19 +220,10 @@ class AdminUsersViewSet(viewsets.ModelViewSet):
             
             user.save()
             
-            # Update roles
-            selected_roles = data.get('selected_roles', [])
-            
-            # Remove old memberships
-            Membership.objects.filter(user=user).delete()
-            
-            # Add new memberships
-            for role_code in selected_roles:
-                try:
-                    role = OrgRole.objects.get(code=role_code)
-                    Membership.objects.create(user=user, role=role)
-                except OrgRole.DoesNotExist:
-                    continue
+            # Update roles (partial updates without selected_roles keep the current ones)
+            membership_changes = None
+            if not kwargs.get('partial') or 'selected_roles' in data:
+                membership_changes = sync_memberships(user, data.get('selected_roles', []))
             
             # Log the action
             SystemLog.objects.create(
@@ -240,7 +232,8 @@ class AdminUsersViewSet(viewsets.ModelViewSet):
                 message=f'کاربر بروزرسانی شد',
                 description=f'اطلاعات کاربر "{user.username}" تغییر کرد',
                 user=request.user.username,
-                ip_address=self.get_client_ip(request)
+                ip_address=self.get_client_ip(request),
+                details={'user_id': str(user.id), 'roles': membership_changes} if membership_changes else None
             )
             
             return Response({'message': 'کاربر با موفقیت بروزرسانی شد'})
@@ -248,6 +241,41 @@ class AdminUsersViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
+    @decorators.action(detail=False, methods=['post'], parser_classes=[JSONParser, MultiPartParser, FormParser])
+    def bulk_provision(self, request):
+        """Create users and memberships in batches from a CSV file or a JSON list"""
+        # Check admin permission
+        if not (request.user.is_superuser or 'ADMIN' in getattr(request.user, 'role_codes', [])):
+            return Response({'detail': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
+        
+        try:
+            rows = parse_rows(request.data, request.FILES.get('file'))
+        except (ValueError, UnicodeDecodeError, csv.Error) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if not rows:
+            return Response({'error': 'No users to provision'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        results = provision_users(rows)
+        created = [r for r in results if r['status'] == 'created']
+        
+        # Log the action
+        SystemLog.objects.create(
+            level='SUCCESS' if len(created) == len(results) else 'WARNING',
+            action='IMPORT',
+            message=f'ایجاد گروهی کاربران',
+            description=f'{len(created)} کاربر از {len(results)} ردیف ایجاد شد',
+            user=request.user.username,
+            ip_address=self.get_client_ip(request),
+            details={'created': len(created), 'failed': len(results) - len(created)}
+        )
+        
+        return Response({
+            'results': results,
+            'created': len(created),
+            'failed': len(results) - len(created)
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
+    
     def get_client_ip(self, request):
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
         if x_forwarded_for:
@@ -433,6 +461,58 @@ class RecentActivityView(APIView):
         })
 
 
+class OnlineUsersView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        # Check admin permission
+        if not (request.user.is_superuser or 'ADMIN' in getattr(request.user, 'role_codes', [])):
+            return Response({'detail': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
+        
+        try:
+            window = int(request.query_params.get('window', 0)) or None
+        except ValueError:
+            window = None
+        
+        presences = presence_tracker.online_users(window) if window else presence_tracker.online_users()
+        users_data = [
+            {
+                'user_id': presence.user_id,
+                'username': presence.username,
+                'last_seen': presence.last_seen,
+                'requests': presence.hits,
+            }
+            for presence in presences
+        ]
+        
+        return Response({
+            'results': users_data,
+            'count': len(users_data)
+        })
+
+
+class MongoProfileView(APIView):
+    """MongoDB commands per endpoint over this worker's recent requests"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        # Check admin permission
+        if not (request.user.is_superuser or 'ADMIN' in getattr(request.user, 'role_codes', [])):
+            return Response({'detail': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
+        
+        if not getattr(settings, 'MONGO_PROFILING', settings.DEBUG):
+            return Response({'detail': 'MongoDB profiling is disabled (MONGO_PROFILING)'}, status=status.HTTP_404_NOT_FOUND)
+        
+        try:
+            limit = int(request.query_params.get('limit', 50))
+        except ValueError:
+            limit = 50
+        
+        return Response({
+            'endpoints': mongo_profiles.summary(),
+            'recent': mongo_profiles.items()[::-1][:max(limit, 0)],
+        })
+
 class SystemLogsViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = SystemLog.objects.all().order_by('-created_at')
     serializer_class = SystemLogSerializer
@@ -38,6 +38,7 @@ class SystemLog(models.Model):
     class Meta:
         ordering = ['-created_at']
         indexes = [
+            models.Index(fields=['-created_at']),
             models.Index(fields=['level', 'created_at']),
             models.Index(fields=['action', 'created_at']),
             models.Index(fields=['user', 'created_at']),
@@ -75,4 +76,17 @@ def create_system_log(level, action, message, description='', user=None, ip_addr
         user=user_name,
         ip_address=ip_address,
         details=details
-    )
\ No newline at end of file
+    )
+
+class UserPresence(models.Model):
+    """Last heartbeat per user, written in batches by the presence tracker"""
+    user_id = models.CharField(max_length=64, unique=True)
+    username = models.CharField(max_length=150, blank=True, default='')
+    last_seen = models.DateTimeField()  # TTL-indexed by the presence tracker
+    hits = models.PositiveIntegerField(default=0)  # Requests seen since the entry was created
+
+    class Meta:
+        ordering = ['-last_seen']
+
+    def __str__(self):
+        return f"{self.username} @ {self.last_seen}"
@@ -4,6 +4,7 @@ from django.contrib.auth.signals import user_logged_in, user_logged_out
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from apps.workflows.models import Workflow
+from workflow_engine.tracing import span
 from .models import create_system_log
 
 User = get_user_model()
@@ -38,6 +39,10 @@ def log_user_logout(sender, request, user, **kwargs):
 @receiver(post_save, sender=Workflow)
 def log_letter_changes(sender, instance, created, **kwargs):
     """Log letter creation and updates"""
+    with span("audit.system_log", created=created):
+        _log_letter_change(instance, created)
+
+def _log_letter_change(instance, created):
     if created:
         create_system_log(
             level='SUCCESS',
@@ -4,18 +4,25 @@ from rest_framework.routers import DefaultRouter
 from .api import (
     AdminStatsView,
     AdminUsersView,
+    AdminUsersViewSet,
     AdminRolesView,
     SystemLogsViewSet,
-    RecentActivityView
+    RecentActivityView,
+    OnlineUsersView,
+    MongoProfileView
 )
 
 router = DefaultRouter()
 router.register(r'system-logs', SystemLogsViewSet, basename='admin-logs')
+# Writes and bulk provisioning; GET users/ above stays the superuser listing
+router.register(r'manage-users', AdminUsersViewSet, basename='admin-users-manage')
 
 urlpatterns = [
     path('stats/', AdminStatsView.as_view(), name='admin-stats'),
     path('users/', AdminUsersView.as_view(), name='admin-users'),
     path('roles/', AdminRolesView.as_view(), name='admin-roles'),
     path('recent-activity/', RecentActivityView.as_view(), name='admin-recent-activity'),
+    path('online-users/', OnlineUsersView.as_view(), name='admin-online-users'),
+    path('mongo-profile/', MongoProfileView.as_view(), name='admin-mongo-profile'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,13 +1,20 @@
 # apps/workflows/actions.py
+import time
+
 from django.db import transaction, IntegrityError
 from django.contrib.auth import get_user_model
 from apps.accounts.utils import user_role_codes
-from .workflow_spec import ADVANCER_STEPS
+from workflow_engine.metrics import WORKFLOW_ACTION_SECONDS
+from workflow_engine.tracing import span
+from .workflow_spec import ADVANCER_STEPS, OPEN_STATES
 
 User = get_user_model()
 
-def current_step(workflow) -> int:
-    """Return next required approval step index for the workflow's current state."""
+def current_step(workflow, actions=None) -> int:
+    """
+    Return next required approval step index for the workflow's current state.
+    ``actions`` may pass the workflow's already-loaded Action rows.
+    """
     from .models import Action
     
     if not workflow.pk:
@@ -18,15 +25,54 @@ def current_step(workflow) -> int:
         return _get_form3_current_step(workflow)
     
     # Regular state handling
-    taken = list(
-        Action.objects.filter(
-            workflow=workflow,
-            state=workflow.state,
-            action_type=Action.ActionType.APPROVE
-        ).values_list("step", flat=True)
-    )
+    if actions is not None:
+        taken = [
+            a.step for a in actions
+            if a.state == workflow.state and a.action_type == Action.ActionType.APPROVE
+        ]
+    else:
+        taken = list(
+            Action.objects.filter(
+                workflow=workflow,
+                state=workflow.state,
+                action_type=Action.ActionType.APPROVE
+            ).values_list("step", flat=True)
+        )
     return 0 if not taken else (max(taken) + 1)
 
+def current_steps(workflows) -> dict:
+    """
+    ``{workflow pk: current_step(workflow)}`` for many workflows, reading
+    their approvals with one ``$in`` query instead of one query each.
+    """
+    from .models import Action, Workflow
+
+    workflows = [wf for wf in workflows if wf.pk]
+    regular = {wf.pk: wf for wf in workflows if wf.state != 'Form3'}
+    form3 = {wf.pk: wf for wf in workflows if wf.state == 'Form3'}
+    # Form3 progress lives in the form data; read it for just those rows
+    # (in one query) when the caller deferred it
+    lean = [pk for pk, wf in form3.items() if "_data" in wf.get_deferred_fields()]
+    if lean:
+        form3.update((wf.pk, wf) for wf in Workflow.objects.filter(pk__in=lean).only("id", "state", "_data"))
+    taken = {}
+    if regular:
+        rows = Action.objects.filter(
+            workflow_id__in=list(regular),
+            action_type=Action.ActionType.APPROVE
+        ).values_list("workflow_id", "state", "step")
+        for workflow_id, state, step in rows:
+            if state == regular[workflow_id].state:
+                taken[workflow_id] = max(taken.get(workflow_id, -1), step)
+
+    steps = {}
+    for wf in workflows:
+        if wf.state == 'Form3':
+            steps[wf.pk] = _get_form3_current_step(form3[wf.pk])
+        else:
+            steps[wf.pk] = taken.get(wf.pk, -1) + 1
+    return steps
+
 def steps_required(state: str) -> int:
     """Return total number of steps required for a given state."""
     # Special handling for Form3 state
@@ -54,7 +100,8 @@ def can_user_satisfy_step(user, state: str, step_idx: int) -> bool:
     if not required_roles:
         return False
     
-    user_roles = set(user_role_codes(user))
+    # Trusts the role claims of token-backed users, so no membership read
+    user_roles = user_role_codes(user)
     return len(user_roles & set(required_roles)) > 0
 
 def actions_ok(workflow) -> bool:
@@ -63,27 +110,57 @@ def actions_ok(workflow) -> bool:
         return False
     return current_step(workflow) >= steps_required(workflow.state)
 
-def get_workflows_pending_user_action(user) -> list:
-    """Get all workflows where the user can perform the next required action."""
+def pending_user_steps(user, queryset=None) -> list:
+    """
+    ``[(workflow, current step), ...]`` for the workflows where the user can
+    perform the next required action. ``queryset`` narrows (or projects) the
+    workflows considered.
+    """
     from .models import Workflow
     
     user_roles = set(user_role_codes(user))
     if not user_roles:
         return []
     
+    if queryset is None:
+        queryset = Workflow.objects.all()
     pending = []
     # Exclude completed workflows (terminal state is "Settlment")
-    for wf in Workflow.objects.exclude(state="Settlment"):
-        idx = current_step(wf)
+    workflows = list(queryset.filter(state__in=OPEN_STATES))
+    steps = current_steps(workflows)
+    for wf in workflows:
+        idx = steps[wf.pk]
         if idx >= steps_required(wf.state):
             continue
-        if can_user_satisfy_step(user, wf.state, idx):
-            pending.append(wf)
+        # The roles read above, not a membership read per workflow
+        if user_roles & set(step_roles(wf.state, idx)):
+            pending.append((wf, idx))
     
     return pending
 
+def get_workflows_pending_user_action(user, queryset=None) -> list:
+    """Get all workflows where the user can perform the next required action."""
+    return [wf for wf, _ in pending_user_steps(user, queryset)]
+
 def perform_action(workflow, user, action_type: str, data: dict = None) -> dict:
     """Perform an action on the workflow. Returns dict with flags for the caller."""
+    state = workflow.state
+    start = time.perf_counter()
+    outcome = "exception"
+    try:
+        with span("workflow.perform_action", action_type=str(action_type), state=state,
+                  workflow_id=str(workflow.pk)) as current:
+            result = _perform_action(workflow, user, action_type, data)
+            outcome = result.get("error") or ("done" if result.get("done") else "ok")
+            current.set_attribute("outcome", outcome)
+        return result
+    finally:
+        from .models import Action
+        # Unknown types are rejected above; keep them out of the label values
+        label = action_type if action_type in Action.ActionType.values else "invalid"
+        WORKFLOW_ACTION_SECONDS.labels(label, state, outcome).observe(time.perf_counter() - start)
+
+def _perform_action(workflow, user, action_type: str, data: dict = None) -> dict:
     from .models import Action
 
     # Validate action_type first
@@ -98,12 +175,15 @@ def perform_action(workflow, user, action_type: str, data: dict = None) -> dict:
     if action_type == Action.ActionType.APPROVE:
         state = workflow.state
         total = steps_required(state)
-        idx = current_step(workflow)
+        with span("approval.current_step"):
+            idx = current_step(workflow)
 
         if idx >= total:
             return {"done": True, "state": state, "next_step": None}
 
-        if not can_user_satisfy_step(user, state, idx):
+        with span("approval.role_check", step=idx):
+            allowed = can_user_satisfy_step(user, state, idx)
+        if not allowed:
             return {"error": "forbidden", "needed_roles": step_roles(state, idx)}
 
         # Special handling for Form3 approvals
@@ -116,13 +196,14 @@ def perform_action(workflow, user, action_type: str, data: dict = None) -> dict:
         role_code = role_intersection[0] if role_intersection else None
 
         try:
-            with transaction.atomic():
+            # Includes the post_save receivers (version bump)
+            with span("approval.insert_action", step=idx), transaction.atomic():
                 Action.objects.create(
                     workflow=workflow,
                     state=state,
                     step=idx,
                     action_type=Action.ActionType.APPROVE,
-                    performer=user,
+                    performer_id=user.pk,
                     role_code=role_code,
                 )
         except IntegrityError:
@@ -130,7 +211,8 @@ def perform_action(workflow, user, action_type: str, data: dict = None) -> dict:
             pass
 
         # Recalculate current step AFTER creating the action
-        new_current_step = current_step(workflow)
+        with span("approval.current_step"):
+            new_current_step = current_step(workflow)
         is_done = new_current_step >= total
 
         return {
@@ -145,7 +227,7 @@ def perform_action(workflow, user, action_type: str, data: dict = None) -> dict:
         state=workflow.state,
         step=0,
         action_type=action_type,
-        performer=user,
+        performer_id=user.pk,
     )
     return {"success": True, "action_type": action_type}
 
@@ -192,7 +274,8 @@ def _perform_form3_approval(workflow, user, step_idx: int, total: int) -> dict:
         return {"error": "invalid_step", "message": f"Invalid Form3 step: {form3_step}"}
     
     step_info = PropertyStatusReviewForm.APPROVAL_STEPS[form3_step]
-    user_roles = [membership.role.code for membership in user.memberships.all()]
+    with span("approval.role_check", step=step_idx):
+        user_roles = user_role_codes(user)
     
     # Check if user has the required role for this specific step
     if step_info['role'] not in user_roles:
@@ -203,13 +286,13 @@ def _perform_form3_approval(workflow, user, step_idx: int, total: int) -> dict:
     # But we still create an Action record for tracking
     
     try:
-        with transaction.atomic():
+        with span("approval.insert_action", step=step_idx), transaction.atomic():
             Action.objects.create(
                 workflow=workflow,
                 state='Form3',
                 step=step_idx,  # Keep 0-indexed for Action model consistency
                 action_type=Action.ActionType.APPROVE,
-                performer=user,
+                performer_id=user.pk,
                 role_code=step_info['role'],
             )
     except IntegrityError:
@@ -218,7 +301,8 @@ def _perform_form3_approval(workflow, user, step_idx: int, total: int) -> dict:
 
     # For Form3, check if the actual form step is completed
     # (This would be done via form submission with signature)
-    new_current_step = _get_form3_current_step(workflow)
+    with span("approval.current_step"):
+        new_current_step = _get_form3_current_step(workflow)
     is_done = new_current_step >= total
 
     return {
@@ -252,11 +336,6 @@ def can_user_edit_form3_section(workflow, section: str, user) -> bool:
         return False
     
     from .forms.form_3 import PropertyStatusReviewForm
-    user_roles = [membership.role.code for membership in user.memberships.all()]
-    
-    for role in user_roles:
-        editable_sections = PropertyStatusReviewForm.get_editable_sections(workflow, role)
-        if editable_sections.get(section, False):
-            return True
-    
-    return False
\ No newline at end of file
+    user_roles = user_role_codes(user)
+    editable_sections = PropertyStatusReviewForm.get_user_editable_sections(workflow, user_roles)
+    return editable_sections.get(section, False)
\ No newline at end of file
@@ -1,19 +1,75 @@
 # apps/workflows/api.py - IMPROVED VERSION
 
+from django.conf import settings
 from django.db.models import Count,Q
-from rest_framework import viewsets, permissions, decorators, response, status, filters
+from rest_framework import viewsets, mixins, permissions, decorators, response, status, filters, exceptions
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser
-from django.db import transaction
+from django.db import IntegrityError, transaction, connection
 from django.utils import timezone
 from datetime import timedelta
-from ..models import Workflow, Attachment, Comment, Action
-from .serializers import WorkflowSerializer, AttachmentSerializer, CommentSerializer, ActionSerializer
-from ..actions import perform_action, current_step, steps_required, step_roles, can_user_satisfy_step, get_workflows_pending_user_action
-from ..workflow_spec import NEXT_STATE
+from ..models import Workflow, Attachment, Comment, Action, UploadSession
+from .serializers import (
+    WorkflowSerializer, AttachmentSerializer, CommentSerializer, ActionSerializer,
+    PresignedUploadSerializer, UploadSessionCreateSerializer, UploadSessionSerializer,
+)
+from ..actions import perform_action, current_step, current_steps, steps_required, step_roles, can_user_satisfy_step, pending_user_steps
+from ..workflow_spec import NEXT_STATE, OPEN_STATES
 from django_filters.rest_framework import DjangoFilterBackend
 from .. import actions
 from django.shortcuts import get_object_or_404
+from django.http import HttpResponseRedirect, StreamingHttpResponse
+from django.core import signing
+from bson import ObjectId
+from botocore.exceptions import ClientError
+from .. import storage, blobs
+from ..bundles import stream_attachments_zip
+from ..versioning import conditional_on_workflow_version
+from workflow_engine.tracing import span
+from ..forms.registry import FormRegistry
+from ..permissions import get_user_roles
+from .views import available_forms_payload, form_payload
+
+UPLOAD_TOKEN_SALT = "workflows.attachments.upload"
+BATCH_GET_MAX_IDS = getattr(settings, "WORKFLOW_BATCH_GET_MAX_IDS", 100)
+MAX_SIGNED_PARTS_PER_REQUEST = 100
+
+def pending_step_fields(workflow, cur, user_roles):
+    """The approval fields retrieve adds to a workflow at approval step ``cur``"""
+    total = steps_required(workflow.state)
+    needed_roles = step_roles(workflow.state, cur) if cur < total else []
+    return {
+        'can_approve': bool(set(user_roles) & set(needed_roles)),
+        'pending_step': cur if cur < total else None,
+        'total_steps_in_state': total,
+        'pending_step_roles': needed_roles,
+    }
+
+
+def status_payload(workflow, cur, user_roles):
+    """Body of GET status for a workflow at approval step ``cur``"""
+    total = steps_required(workflow.state)
+
+    # ✅ IMPROVED: More detailed approval checking
+    can_approve = False
+    needed_roles = []
+    if cur < total:
+        needed_roles = step_roles(workflow.state, cur)
+        can_approve = bool(set(user_roles) & set(needed_roles))
+    else:
+        user_roles = []
+
+    return {
+        "state": workflow.state,
+        "next_step_index": cur if cur < total else None,
+        "needed_roles": needed_roles,
+        "user_roles": user_roles,  # ✅ NEW: Show user's roles for debugging
+        "steps_total": total,
+        "can_approve": can_approve,
+        "will_auto_advance_on_next": (cur + 1 == total),
+        "next_state_if_complete": NEXT_STATE.get(workflow.state),
+    }
+
 
 class WorkflowViewSet(viewsets.ModelViewSet):
     queryset = Workflow.objects.all().order_by("-created_at")
@@ -76,13 +132,19 @@ class WorkflowViewSet(viewsets.ModelViewSet):
         
         # Filter by national code
         if applicant_national_id:
-            qs = qs.filter(_data__contains=f'"nationalCode":"{applicant_national_id}"')
+            qs = qs.filter(applicant_national_id=applicant_national_id)
         
         # Your existing date filtering
         if date_from := self.request.query_params.get('date_from'):
             qs = qs.filter(created_at__gte=date_from)
         if date_to := self.request.query_params.get('date_to'):
             qs = qs.filter(created_at__lte=date_to)
+
+        if self.action in ('list', 'inbox'):
+            # Read only the columns the (possibly ?fields= limited) rows render;
+            # the form data blob is never one of them
+            only, related = self.get_serializer_class().projection(self.get_serializer_context())
+            qs = qs.select_related(*related).only(*only)
             
         return qs
 
@@ -93,106 +155,181 @@ class WorkflowViewSet(viewsets.ModelViewSet):
 
     def list(self, request, *args, **kwargs):
         """Override list to add can_approve field to each workflow"""
-        response_data = super().list(request, *args, **kwargs)
-        
-        # Add can_approve field to each workflow in the response
-        if hasattr(response_data, 'data') and 'results' in response_data.data:
-            for workflow_data in response_data.data['results']:
-                workflow_id = workflow_data.get('id')
-                if workflow_id:
-                    try:
-                        workflow = Workflow.objects.get(id=workflow_id)
-                        cur = current_step(workflow)
-                        total = steps_required(workflow.state)
-                        can_approve = False
-                        if cur < total:
-                            can_approve = can_user_satisfy_step(request.user, workflow.state, cur)
-                        workflow_data['can_approve'] = can_approve
-                        
-                        # ✅ BONUS: Add additional useful fields
-                        workflow_data['pending_step'] = cur if cur < total else None
-                        workflow_data['total_steps_in_state'] = total
-                        workflow_data['pending_step_roles'] = step_roles(workflow.state, cur) if cur < total else []
-                    except Workflow.DoesNotExist:
-                        workflow_data['can_approve'] = False
-        
-        return response_data
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        workflows = list(page if page is not None else queryset)
+        serializer = self.get_serializer(workflows, many=True)
+
+        # The rows already loaded, not a re-read of every workflow
+        steps = current_steps(workflows)
+        user_roles = get_user_roles(request.user)
+        data = serializer.data
+        for workflow, workflow_data in zip(workflows, data):
+            workflow_data.update(pending_step_fields(workflow, steps[workflow.pk], user_roles))
+
+        if page is not None:
+            return self.get_paginated_response(data)
+        return response.Response(data)
 
+    @conditional_on_workflow_version
     def retrieve(self, request, *args, **kwargs):
         """Override retrieve to add can_approve field"""
-        response_data = super().retrieve(request, *args, **kwargs)
-        
-        # Add can_approve field to the workflow
         workflow = self.get_object()
-        cur = current_step(workflow)
-        total = steps_required(workflow.state)
-        can_approve = False
-        if cur < total:
-            can_approve = can_user_satisfy_step(request.user, workflow.state, cur)
-        
-        response_data.data['can_approve'] = can_approve
-        response_data.data['pending_step'] = cur if cur < total else None
-        response_data.data['total_steps_in_state'] = total
-        response_data.data['pending_step_roles'] = step_roles(workflow.state, cur) if cur < total else []
-        
-        return response_data
+        # Like snapshot: the serializer's related rows with their users, one query each
+        context = self.get_serializer_context()
+        context["preloaded"] = {workflow.pk: {
+            "attachments": list(
+                Attachment.objects.filter(workflow_id=workflow.pk).select_related("uploaded_by").order_by("uploaded_at")
+            ),
+            "comments": list(Comment.objects.filter(workflow_id=workflow.pk).select_related("author").order_by("created_at")),
+        }}
+        data = self.get_serializer(workflow, context=context).data
+        data.update(pending_step_fields(workflow, current_step(workflow), get_user_roles(request.user)))
+        return response.Response(data)
+
+    @decorators.action(detail=False, methods=["post"])
+    def batch_get(self, request):
+        """
+        ``{"ids": [...]}`` -> one result per id, in request order, each either
+        ``{"id", "status": 200, "workflow"}`` with the retrieve representation
+        or ``{"id", "status", "error"}`` for invalid, missing or forbidden ids.
+        Workflows, approvals, attachments and comments are each read with one
+        ``$in`` query.
+        """
+        ids = request.data.get("ids") if isinstance(request.data, dict) else None
+        if not isinstance(ids, list) or not ids:
+            return response.Response({"error": "invalid_request", "message": "ids must be a non-empty list"},
+                                     status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > BATCH_GET_MAX_IDS:
+            return response.Response({"error": "too_many_ids", "max": BATCH_GET_MAX_IDS},
+                                     status=status.HTTP_400_BAD_REQUEST)
+
+        ids = list(dict.fromkeys(str(workflow_id) for workflow_id in ids))
+        valid = [ObjectId(workflow_id) for workflow_id in ids if ObjectId.is_valid(workflow_id)]
+        workflows = {
+            str(wf.pk): wf
+            for wf in self.filter_queryset(self.get_queryset()).filter(pk__in=valid)
+        } if valid else {}
+
+        allowed = []
+        forbidden = set()
+        for workflow_id, wf in workflows.items():
+            try:
+                self.check_object_permissions(request, wf)
+                allowed.append(wf)
+            except exceptions.PermissionDenied:
+                forbidden.add(workflow_id)
+
+        context = self.get_serializer_context()
+        preloaded = {wf.pk: {"attachments": [], "comments": []} for wf in allowed}
+        if allowed:
+            pks = list(preloaded)
+            for attachment in Attachment.objects.filter(workflow_id__in=pks).select_related("uploaded_by", "blob").order_by("uploaded_at"):
+                preloaded[attachment.workflow_id]["attachments"].append(attachment)
+            for comment in Comment.objects.filter(workflow_id__in=pks).select_related("author").order_by("created_at"):
+                preloaded[comment.workflow_id]["comments"].append(comment)
+        context["preloaded"] = preloaded
+        # The serializers read row.workflow; point it at the instances already loaded
+        by_pk = {wf.pk: wf for wf in allowed}
+        for rows in preloaded.values():
+            for row in (*rows["attachments"], *rows["comments"]):
+                row.workflow = by_pk[row.workflow_id]
+
+        steps = current_steps(allowed)
+        user_roles = get_user_roles(request.user)
+        serializer = self.get_serializer_class()
+        results = []
+        for workflow_id in ids:
+            wf = workflows.get(workflow_id)
+            if not ObjectId.is_valid(workflow_id):
+                results.append({"id": workflow_id, "status": 400, "error": "invalid_id"})
+            elif workflow_id in forbidden:
+                results.append({"id": workflow_id, "status": 403, "error": "forbidden"})
+            elif wf is None:
+                results.append({"id": workflow_id, "status": 404, "error": "not_found"})
+            else:
+                data = serializer(wf, context=context).data
+                data.update(pending_step_fields(wf, steps[wf.pk], user_roles))
+                results.append({"id": workflow_id, "status": 200, "workflow": data})
+        return response.Response({"results": results})
 
     @decorators.action(detail=True, methods=["get"])
+    @conditional_on_workflow_version
     def status(self, request, pk=None):
         obj = self.get_object()
-        cur = current_step(obj)
-        total = steps_required(obj.state)
+        from apps.accounts.utils import user_role_codes
+        return response.Response(status_payload(obj, current_step(obj), user_role_codes(request.user)))
 
-        # ✅ IMPROVED: More detailed approval checking
-        can_approve = False
-        user_roles = []
-        needed_roles = []
-        
-        if cur < total:
-            can_approve = can_user_satisfy_step(request.user, obj.state, cur)
-            needed_roles = step_roles(obj.state, cur)
-            from apps.accounts.utils import user_role_codes
-            user_roles = user_role_codes(request.user)
-
-        data = {
-            "state": obj.state,
-            "next_step_index": cur if cur < total else None,
-            "needed_roles": needed_roles,
-            "user_roles": user_roles,  # ✅ NEW: Show user's roles for debugging
-            "steps_total": total,
-            "can_approve": can_approve,
-            "will_auto_advance_on_next": (cur + 1 == total),
-            "next_state_if_complete": NEXT_STATE.get(obj.state),
-        }
-        return response.Response(data)
+    @decorators.action(detail=True, methods=["get"])
+    @conditional_on_workflow_version
+    def snapshot(self, request, pk=None):
+        """
+        Everything the workflow detail page loads, in one request: the
+        workflow with its attachments and comments, approval status, actions,
+        available forms and the current form (with Form3 metadata). One
+        workflow read, one query per related collection, one role resolution.
+        """
+        workflow = self.get_object()
+        actions_qs = Action.objects.filter(workflow_id=workflow.pk).select_related("performer")
+        workflow_actions = list(actions_qs.order_by("-created_at"))
+        comments = list(Comment.objects.filter(workflow_id=workflow.pk).select_related("author").order_by("-created_at"))
+        attachments = list(
+            Attachment.objects.filter(workflow_id=workflow.pk).select_related("uploaded_by", "blob").order_by("uploaded_at")
+        )
+        # The serializers read row.workflow; point it at the instance already loaded
+        for row in (*workflow_actions, *comments, *attachments):
+            row.workflow = workflow
+
+        user_roles = get_user_roles(request.user)
+        cur = current_step(workflow, actions=workflow_actions)
+        status_data = status_payload(workflow, cur, set(user_roles))
+
+        context = self.get_serializer_context()
+        context["preloaded"] = {workflow.pk: {"attachments": attachments, "comments": comments[::-1]}}
+        workflow_data = WorkflowSerializer(workflow, context=context).data
+        workflow_data.update(pending_step_fields(workflow, cur, user_roles))
+
+        forms = available_forms_payload(workflow)
+        form_number = next(iter(forms["available_forms"]), None)
+        current_form = None if form_number is None else form_payload(
+            workflow, form_number, FormRegistry.get_form(form_number), user_roles,
+            request.query_params.get("schema_etag"),
+        )
+
+        return response.Response({
+            "workflow": workflow_data,
+            "status": status_data,
+            "actions": ActionSerializer(workflow_actions, many=True).data,
+            "comments": CommentSerializer(comments, many=True).data,
+            "available_forms": forms,
+            "form": current_form,
+        })
 
     @decorators.action(detail=False, methods=["get"])
     def inbox(self, request):
         """Get workflows pending current user's action"""
-        pending_workflows = get_workflows_pending_user_action(request.user)
-        serializer = self.get_serializer(pending_workflows, many=True)
+        # The steps the pending check computed; not looked up again
+        pending = pending_user_steps(request.user, self.get_queryset())
+        serializer = self.get_serializer([workflow for workflow, _ in pending], many=True)
+        data = serializer.data
 
         # Add additional context for each workflow
-        for i, workflow in enumerate(pending_workflows):
-            cur_step = current_step(workflow)
-            total_steps = steps_required(workflow.state)
-            
-            # ✅ IMPROVED: Actually verify can_approve instead of blindly setting True
-            can_approve = can_user_satisfy_step(request.user, workflow.state, cur_step)
-            
-            serializer.data[i].update({
+        for (workflow, cur_step), workflow_data in zip(pending, data):
+            workflow_data.update({
                 'pending_step': cur_step,
                 'pending_step_roles': step_roles(workflow.state, cur_step),
-                'total_steps_in_state': total_steps,
+                'total_steps_in_state': steps_required(workflow.state),
                 'urgency': 'high' if workflow.state in ['ApplicantRequest', 'CEOInstruction'] else 'medium',
-                'can_approve': can_approve,  # ✅ NOW PROPERLY CALCULATED
+                # Pending means the user can satisfy the current step
+                'can_approve': True,
             })
 
-        return response.Response(serializer.data)
+        return response.Response(data)
 
     @decorators.action(detail=True, methods=["post"])
     def perform_action(self, request, pk=None):
-        wf = self.get_object()
+        with span("workflow.load"):
+            wf = self.get_object()
         action_type = request.data.get("action")
         
         if not action_type:
@@ -210,7 +347,9 @@ class WorkflowViewSet(viewsets.ModelViewSet):
         if result.get("done"):
             transition_successful = wf.advance_to_next_state(by=request.user)
             if transition_successful:
-                wf.save(update_fields=["state"])
+                # Includes the post_save receivers (audit log, version bump)
+                with span("workflow.save_state", state=wf.state):
+                    wf.save(update_fields=["state"])
                 result["state"] = wf.state  # Return new state
                 result["transitioned"] = True
             else:
@@ -222,7 +361,8 @@ class WorkflowViewSet(viewsets.ModelViewSet):
     @decorators.action(detail=True, methods=["post"])
     def approve(self, request, pk=None):
         """Dedicated approval endpoint"""
-        workflow = self.get_object()
+        with span("workflow.load"):
+            workflow = self.get_object()
         
         # Check if user can approve
         cur = current_step(workflow)
@@ -255,7 +395,7 @@ class WorkflowViewSet(viewsets.ModelViewSet):
         total_letters = Workflow.objects.count()
         
         # Pending letters (not completed)
-        pending_letters = Workflow.objects.exclude(state='Settlment').count()
+        pending_letters = Workflow.objects.filter(state__in=OPEN_STATES).count()
         
         # Completed today
         today = timezone.now().date()
@@ -281,6 +421,7 @@ class WorkflowViewSet(viewsets.ModelViewSet):
         })
 
     @decorators.action(detail=True, methods=["get"])
+    @conditional_on_workflow_version
     def actions(self, request, pk=None):
         """Get all actions for a specific workflow"""
         workflow = self.get_object()
@@ -288,7 +429,24 @@ class WorkflowViewSet(viewsets.ModelViewSet):
         serializer = ActionSerializer(actions, many=True)
         return response.Response(serializer.data)
 
+    @decorators.action(detail=True, methods=["get"], url_path="attachments.zip", url_name="attachments-zip")
+    def attachments_zip(self, request, pk=None):
+        """All attachments of the workflow as one ZIP streamed straight from MinIO"""
+        workflow = self.get_object()
+        attachments = (
+            Attachment.objects.filter(workflow_id=workflow.pk)
+            .select_related("uploaded_by", "blob")
+            .order_by("uploaded_at")
+        )
+        resp = StreamingHttpResponse(stream_attachments_zip(attachments), content_type="application/zip")
+        resp["Content-Disposition"] = f'attachment; filename="workflow-{workflow.pk}.zip"'
+        resp["Cache-Control"] = "private, no-store"
+        # Keep proxies from buffering the whole archive
+        resp["X-Accel-Buffering"] = "no"
+        return resp
+
     @decorators.action(detail=True, methods=["get"])
+    @conditional_on_workflow_version
     def comments(self, request, pk=None):
         """Get all comments for a specific workflow"""
         workflow = self.get_object()
@@ -305,8 +463,365 @@ class AttachmentViewSet(viewsets.ModelViewSet):
         return Attachment.objects.filter(workflow__created_by=self.request.user)
     
     def perform_create(self, serializer):
-        attachment = serializer.save(uploaded_by=self.request.user)
-        print(f"File URL: {attachment.file.url}")
+        upload = serializer.validated_data["file"]
+        blob = blobs.ingest_file(upload, getattr(upload, "content_type", None) or "application/octet-stream")
+        serializer.save(uploaded_by=self.request.user, file=blob.key, blob=blob)
+
+    @decorators.action(detail=False, methods=["post"])
+    def presign(self, request):
+        """
+        Phase 1 of a direct upload: hand out a presigned PUT for MinIO.
+
+        With the file's ``sha256`` MinIO verifies the upload against it, and
+        content the workflow or the user already has attached is attached
+        again right away without any upload.
+        """
+        serializer = PresignedUploadSerializer(data=request.data, context={"max_size": storage.MAX_UPLOAD_SIZE})
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        name = data.get("name") or data["filename"]
+        sha256 = data.get("sha256")
+
+        if sha256 and (blob := blobs.acquire_referenced(sha256, ObjectId(data["workflow"]), request.user.pk)) is not None:
+            attachment = Attachment.objects.create(
+                workflow_id=ObjectId(data["workflow"]),
+                file=blob.key,
+                blob=blob,
+                name=name[:200],
+                uploaded_by_id=request.user.pk,
+            )
+            return response.Response({
+                "deduplicated": True,
+                "attachment": self.get_serializer(attachment).data,
+            }, status=status.HTTP_201_CREATED)
+
+        key = blobs.new_blob_key()
+        headers = {"Content-Type": data["content_type"]}
+        if sha256:
+            headers["x-amz-checksum-sha256"] = blobs.sha256_base64(sha256)
+        upload_token = signing.dumps({
+            "key": key,
+            "sha256": sha256,
+            "content_type": data["content_type"],
+            "workflow": data["workflow"],
+            "name": name,
+            "user": str(request.user.pk),
+        }, salt=UPLOAD_TOKEN_SALT)
+
+        return response.Response({
+            "deduplicated": False,
+            "key": key,
+            "upload_url": storage.presigned_put_url(
+                key, data["content_type"], checksum_sha256=headers.get("x-amz-checksum-sha256")
+            ),
+            "method": "PUT",
+            "headers": headers,
+            "expires_in": storage.UPLOAD_URL_EXPIRES,
+            "upload_token": upload_token,
+        }, status=status.HTTP_201_CREATED)
+
+    @decorators.action(detail=False, methods=["post"])
+    def complete(self, request):
+        """Phase 2 of a direct upload: verify the object landed and register it"""
+        try:
+            upload = signing.loads(
+                request.data.get("upload_token", ""),
+                salt=UPLOAD_TOKEN_SALT,
+                max_age=storage.UPLOAD_URL_EXPIRES * 2,
+            )
+        except signing.BadSignature:
+            return response.Response(
+                {"error": "invalid_upload_token", "message": "Upload token is invalid or expired"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if upload["user"] != str(request.user.pk):
+            return response.Response({"error": "forbidden"}, status=status.HTTP_403_FORBIDDEN)
+
+        key = upload["key"]
+        if Attachment.objects.filter(upload_key=key).exists():
+            return response.Response(
+                {"error": "upload_already_completed", "message": "This upload was already registered"},
+                status=status.HTTP_409_CONFLICT
+            )
+        head = storage.head_object(key, checksum=bool(upload.get("sha256")))
+        if head is None:
+            return response.Response(
+                {"error": "upload_missing", "message": "The file was not found in storage"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if head.get("ContentLength", 0) > storage.MAX_UPLOAD_SIZE:
+            storage.delete_objects([key])
+            return response.Response(
+                {"error": "upload_too_large", "message": f"File is larger than {storage.MAX_UPLOAD_SIZE} bytes"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        content_type = upload.get("content_type") or head.get("ContentType") or "application/octet-stream"
+        blob = None
+        if upload.get("sha256"):
+            # The presigned PUT carried the checksum, so MinIO stored it only if
+            # the content matched; an object without it was not put that way
+            if head.get("ChecksumSHA256") != blobs.sha256_base64(upload["sha256"]):
+                storage.delete_objects([key])
+                return response.Response(
+                    {"error": "checksum_mismatch", "message": "The stored file does not match its sha256"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            blob = blobs.register(upload["sha256"], head["ContentLength"], content_type, key)
+            if blob.key != key:
+                storage.delete_objects([key])
+        # Without a verified checksum the upload is attached at its key and
+        # content-addressed in the background (previews.process_attachment)
+
+        try:
+            attachment = Attachment.objects.create(
+                workflow_id=ObjectId(upload["workflow"]),
+                file=blob.key if blob else key,
+                blob=blob,
+                name=upload["name"][:200],
+                uploaded_by_id=request.user.pk,
+                upload_key=key,
+            )
+        except IntegrityError:
+            # A concurrent replay of the same token registered it first
+            if blob is not None:
+                blobs.release(blob.pk)
+            return response.Response(
+                {"error": "upload_already_completed", "message": "This upload was already registered"},
+                status=status.HTTP_409_CONFLICT
+            )
+        serializer = self.get_serializer(attachment)
+        return response.Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @decorators.action(detail=True, methods=["get"])
+    def download(self, request, pk=None):
+        """Redirect to a (cached) presigned GET so the bytes skip Django"""
+        attachment = self.get_object()
+        return HttpResponseRedirect(storage.presigned_get_url(attachment.file.name))
+
+    @decorators.action(
+        detail=True, methods=["get"], url_path="open", url_name="open",
+        permission_classes=[permissions.AllowAny], authentication_classes=[],
+    )
+    def open_link(self, request, pk=None):
+        """
+        Stable link rendered by AttachmentSerializer in lazy mode.
+
+        Browsers do not send the bearer header on plain links, so the signed
+        ``t`` token authorizes the redirect; S3 signing happens only here. The
+        link is a bearer URL like the presigned GET it redirects to, and it
+        expires within storage.LINK_MAX_AGE (the presigned GET lifetime by
+        default).
+        """
+        if not ObjectId.is_valid(pk) or storage.read_attachment_link_token(request.query_params.get("t", "")) != pk:
+            return response.Response(
+                {"error": "invalid_link", "message": "Link is invalid or expired"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        attachment = get_object_or_404(Attachment, pk=ObjectId(pk))
+        variant = request.query_params.get("variant")
+        key = {"thumbnail": attachment.thumbnail_key, "preview": attachment.preview_key}.get(variant) or attachment.file.name
+        return HttpResponseRedirect(storage.presigned_get_url(key))
+
+
+class UploadSessionViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Resumable multipart uploads straight into MinIO.
+
+    The client creates a session, asks for presigned part URLs, PUTs parts in
+    parallel and reports each ETag. After a disconnect it re-reads the session
+    to see which parts MinIO already holds and uploads only the rest.
+    """
+    serializer_class = UploadSessionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        qs = UploadSession.objects.filter(uploaded_by_id=self.request.user.pk).order_by("-created_at")
+        if self.action == "list":
+            qs = qs.filter(status=UploadSession.Status.ACTIVE)
+            if workflow_id := self.request.query_params.get("workflow"):
+                qs = qs.filter(workflow_id=workflow_id)
+        return qs
+
+    def create(self, request):
+        serializer = UploadSessionCreateSerializer(data=request.data, context={"max_size": storage.MAX_MULTIPART_SIZE})
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        key = blobs.new_blob_key()
+        session = UploadSession.objects.create(
+            workflow_id=ObjectId(data["workflow"]),
+            uploaded_by_id=request.user.pk,
+            key=key,
+            upload_id=storage.create_multipart_upload(key, data["content_type"]),
+            name=data.get("name") or data["filename"],
+            filename=data["filename"],
+            content_type=data["content_type"],
+            size=data["size"],
+            part_size=storage.part_size_for(data["size"]),
+        )
+        return response.Response(self.get_serializer(session).data, status=status.HTTP_201_CREATED)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Session state with the parts MinIO actually holds (used to resume)"""
+        session = self.get_object()
+        if session.status == UploadSession.Status.ACTIVE:
+            # Reported, not saved: a GET does not write
+            stored = storage.list_uploaded_parts(session.key, session.upload_id)
+            session.parts = {str(number): part for number, part in stored.items()}
+        return response.Response(self.get_serializer(session).data)
+
+    @decorators.action(detail=True, methods=["post"])
+    def sign_parts(self, request, pk=None):
+        """Presigned PUT URLs for the requested (default: all missing) parts"""
+        session = self.get_object()
+        if session.status != UploadSession.Status.ACTIVE:
+            return response.Response({"error": "upload_not_active", "status": session.status},
+                                     status=status.HTTP_400_BAD_REQUEST)
+
+        numbers = request.data.get("part_numbers")
+        if numbers is None:
+            numbers = [n for n in range(1, session.part_count + 1) if str(n) not in session.parts]
+        try:
+            numbers = sorted({int(n) for n in numbers})
+        except (TypeError, ValueError):
+            return response.Response({"error": "invalid_part_numbers"}, status=status.HTTP_400_BAD_REQUEST)
+        if any(n < 1 or n > session.part_count for n in numbers):
+            return response.Response({"error": "invalid_part_numbers", "part_count": session.part_count},
+                                     status=status.HTTP_400_BAD_REQUEST)
+
+        numbers = numbers[:MAX_SIGNED_PARTS_PER_REQUEST]
+        return response.Response({
+            "urls": {n: storage.presigned_upload_part_url(session.key, session.upload_id, n) for n in numbers},
+            "part_size": session.part_size,
+            "expires_in": storage.UPLOAD_URL_EXPIRES,
+        })
+
+    @decorators.action(detail=True, methods=["post"])
+    def parts(self, request, pk=None):
+        """Record one finished part; parallel reports update disjoint keys atomically"""
+        session = self.get_object()
+        try:
+            number = int(request.data.get("part_number"))
+        except (TypeError, ValueError):
+            return response.Response({"error": "invalid_part_number"}, status=status.HTTP_400_BAD_REQUEST)
+        etag = request.data.get("etag")
+        if not etag or number < 1 or number > session.part_count:
+            return response.Response({"error": "invalid_part"}, status=status.HTTP_400_BAD_REQUEST)
+
+        connection.get_collection(UploadSession._meta.db_table).update_one(
+            {"_id": session.pk, "status": UploadSession.Status.ACTIVE},
+            {
+                "$set": {
+                    f"parts.{number}": {"etag": etag, "size": request.data.get("size")},
+                    "updated_at": timezone.now(),
+                }
+            },
+        )
+        return response.Response({"part_number": number, "recorded": True})
+
+    @decorators.action(detail=True, methods=["post"])
+    def complete(self, request, pk=None):
+        """
+        Assemble the parts in MinIO and register the Attachment. Concurrent
+        calls race for the session: one assembles it, the others get 409.
+        """
+        session = self.get_object()
+        if session.status == UploadSession.Status.COMPLETED:
+            attachment = Attachment.objects.get(pk=session.attachment_id)
+            return response.Response(AttachmentSerializer(attachment, context=self.get_serializer_context()).data)
+        if session.status == UploadSession.Status.COMPLETING:
+            return response.Response({"error": "upload_completing", "status": session.status},
+                                     status=status.HTTP_409_CONFLICT)
+        if session.status == UploadSession.Status.ASSEMBLED:
+            # An earlier call assembled the parts; only the registration is left
+            if not UploadSession.objects.filter(pk=session.pk, status=UploadSession.Status.ASSEMBLED).update(
+                status=UploadSession.Status.COMPLETING, updated_at=timezone.now()
+            ):
+                return response.Response({"error": "upload_completing"}, status=status.HTTP_409_CONFLICT)
+            return self._register(session)
+        if session.status != UploadSession.Status.ACTIVE:
+            return response.Response({"error": "upload_not_active", "status": session.status},
+                                     status=status.HTTP_400_BAD_REQUEST)
+
+        # MinIO's view of the parts is authoritative; client reports may be lost
+        stored = storage.list_uploaded_parts(session.key, session.upload_id)
+        missing = [n for n in range(1, session.part_count + 1) if n not in stored]
+        if missing:
+            return response.Response({"error": "parts_missing", "missing_parts": missing},
+                                     status=status.HTTP_400_BAD_REQUEST)
+        if sum(part["size"] for part in stored.values()) != session.size:
+            return response.Response({"error": "size_mismatch", "expected": session.size},
+                                     status=status.HTTP_400_BAD_REQUEST)
+
+        claimed = UploadSession.objects.filter(pk=session.pk, status=UploadSession.Status.ACTIVE).update(
+            status=UploadSession.Status.COMPLETING, updated_at=timezone.now()
+        )
+        if not claimed:
+            return response.Response({"error": "upload_completing"}, status=status.HTTP_409_CONFLICT)
+        try:
+            storage.complete_multipart_upload(session.key, session.upload_id, stored)
+        except ClientError as e:
+            # Give the session back so the client can retry or resume
+            UploadSession.objects.filter(pk=session.pk, status=UploadSession.Status.COMPLETING).update(
+                status=UploadSession.Status.ACTIVE, updated_at=timezone.now()
+            )
+            return response.Response(
+                {"error": "complete_failed", "message": e.response.get("Error", {}).get("Code", str(e))},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return self._register(session, parts={str(number): part for number, part in stored.items()})
+
+    def _register(self, session, parts=None):
+        """
+        Register the assembled object as the session's Attachment; the caller
+        holds the COMPLETING claim. Safe to repeat: the attachment is keyed by
+        the upload, and on failure the session is left ASSEMBLED so the next
+        complete call finishes the registration instead of getting 409.
+        """
+        changes = {"parts": parts} if parts is not None else {}
+        try:
+            # Multipart ETags are not content hashes: the assembled object is
+            # hashed and content-addressed in the background, not in this request
+            attachment, _ = Attachment.objects.get_or_create(
+                upload_key=session.key,
+                defaults={
+                    "workflow_id": session.workflow_id,
+                    "file": session.key,
+                    "name": session.name[:200],
+                    "uploaded_by_id": session.uploaded_by_id,
+                },
+            )
+            UploadSession.objects.filter(pk=session.pk).update(
+                status=UploadSession.Status.COMPLETED, attachment=attachment, updated_at=timezone.now(), **changes
+            )
+        except Exception:
+            UploadSession.objects.filter(pk=session.pk, status=UploadSession.Status.COMPLETING).update(
+                status=UploadSession.Status.ASSEMBLED, updated_at=timezone.now(), **changes
+            )
+            raise
+        return response.Response(
+            AttachmentSerializer(attachment, context=self.get_serializer_context()).data,
+            status=status.HTTP_201_CREATED,
+        )
+
+    def destroy(self, request, *args, **kwargs):
+        """Abort the upload and release the stored parts"""
+        session = self.get_object()
+        # Only an active session can be aborted; one being completed is left alone
+        if UploadSession.objects.filter(pk=session.pk, status=UploadSession.Status.ACTIVE).update(
+            status=UploadSession.Status.ABORTED, updated_at=timezone.now()
+        ):
+            storage.abort_multipart_upload(session.key, session.upload_id)
+        elif UploadSession.objects.filter(pk=session.pk, status=UploadSession.Status.ASSEMBLED).update(
+            status=UploadSession.Status.ABORTED, updated_at=timezone.now()
+        ):
+            # The parts are already one object; drop it unless a failed
+            # registration got as far as creating its attachment
+            if not Attachment.objects.filter(upload_key=session.key).exists():
+                storage.delete_objects([session.key])
+        return response.Response(status=status.HTTP_204_NO_CONTENT)
 
 
 # New CommentViewSet
@@ -1,24 +1,225 @@
 # apps/workflows/serializers.py
+from urllib.parse import urlencode
+
 from rest_framework import serializers
-from ..models import Workflow, Attachment, Comment, Action
+from django.urls import reverse
+from django_fsm import FSMFieldMixin
+from ..models import Workflow, Attachment, Comment, Action, UploadSession
 from ..forms.registry import FormRegistry
+from .. import storage, blobs
 from bson import ObjectId
 
 
+def attachment_url_mode(context) -> str:
+    """``?url_mode=eager|lazy`` overrides ATTACHMENT_URL_MODE per request"""
+    request = context.get("request")
+    mode = request.query_params.get("url_mode") if request is not None and hasattr(request, "query_params") else None
+    return mode if mode in ("eager", "lazy") else storage.URL_MODE
+
+
+def _query_list(context, name):
+    """Comma-separated values of ``?name=``, or None when absent"""
+    request = context.get("request")
+    params = getattr(request, "query_params", None)
+    if params is None or name not in params:
+        return None
+    return {item.strip() for value in params.getlist(name) for item in value.split(",") if item.strip()}
+
+
+# View actions whose responses leave Meta.expandable_fields out unless asked for
+COLLAPSED_ACTIONS = {"list"}
+
+
+class SparseFieldsMixin:
+    """
+    ``?fields=a,b`` limits a response to those fields (``id`` is always kept)
+    and ``?expand=x`` adds fields listed in ``Meta.expandable_fields``, which
+    list actions omit by default. Dropped fields are removed before
+    serialization, so their SerializerMethodFields and the queries behind
+    them never run. ``projection()`` names the columns the remaining fields
+    read; method fields declare theirs in ``Meta.field_sources``.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = set(self.selected_fields(self.context))
+        for name in list(self.fields):
+            if name not in selected:
+                self.fields.pop(name)
+
+    @classmethod
+    def selected_fields(cls, context):
+        requested = _query_list(context, "fields")
+        expand = _query_list(context, "expand") or set()
+        collapsed = getattr(context.get("view"), "action", None) in COLLAPSED_ACTIONS
+        expandable = getattr(cls.Meta, "expandable_fields", ())
+
+        selected = []
+        for name in cls.Meta.fields:
+            explicit = name in expand or (requested is not None and name in requested)
+            if requested is not None and not explicit and name != "id":
+                continue
+            if collapsed and name in expandable and not explicit:
+                continue
+            selected.append(name)
+        return selected
+
+    @classmethod
+    def projection(cls, context):
+        """``(only() fields, select_related() fields)`` for the selected fields"""
+        opts = cls.Meta.model._meta
+        sources = getattr(cls.Meta, "field_sources", {})
+        only, related = {opts.pk.name}, set()
+        # ConcurrentTransitionMixin reads FSM state on instantiation: deferring it costs a query per row
+        only.update(f.name for f in opts.concrete_fields if isinstance(f, FSMFieldMixin))
+        for name in cls.selected_fields(context):
+            if name in sources:
+                only.update(sources[name])
+                continue
+            declared = cls._declared_fields.get(name)
+            source = (declared.source if declared is not None else None) or name
+            if source == "*":
+                continue
+            parts = source.split(".")
+            try:
+                model_field = opts.get_field(parts[0])
+            except Exception:
+                continue
+            if model_field.is_relation and len(parts) > 1:
+                related.add(parts[0])
+                only.add("__".join(parts))
+            else:
+                only.add(model_field.name)
+        return sorted(only), sorted(related)
+
+
+class AttachmentListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        items = list(data.all() if hasattr(data, "all") else data)
+        # Eager mode: fetch/sign every URL on the page with one cache round trip
+        self.child._signed_urls = {}
+        if attachment_url_mode(self.context) == "eager":
+            keys = [key for a in items for key in (a.file.name, a.thumbnail_key, a.preview_key) if key]
+            self.child._signed_urls = storage.presigned_get_urls(keys)
+        return super().to_representation(items)
+
+
+class SignedFileField(serializers.FileField):
+    """
+    Renders a stored attachment as a link the browser can open.
+
+    In lazy mode the link is the attachment's ``open`` endpoint and S3 signing
+    happens only when it is followed; in eager mode it is a cached presigned GET.
+    """
+    def __init__(self, *args, variant=None, **kwargs):
+        self.variant = variant
+        super().__init__(*args, **kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        return attachment_link(self.parent, value.instance, value.name, self.variant)
+
+
+def attachment_link(serializer, attachment, key, variant=None):
+    if not key:
+        return None
+    if attachment_url_mode(serializer.context) == "eager":
+        signed = getattr(serializer, "_signed_urls", None) or {}
+        return signed.get(key) or storage.presigned_get_url(key)
+
+    url = reverse("attachments-open", args=[str(attachment.pk)])
+    url += "?" + urlencode({k: v for k, v in (("t", storage.attachment_link_token(attachment.pk)), ("variant", variant)) if v})
+    request = serializer.context.get("request")
+    return request.build_absolute_uri(url) if request is not None else url
+
+
 class AttachmentSerializer(serializers.ModelSerializer):
     id = serializers.SerializerMethodField(read_only=True)
+    file = SignedFileField()
     uploaded_by = serializers.CharField(source="uploaded_by.username", read_only=True)
     workflow_id = serializers.SerializerMethodField(read_only=True)
+    thumbnail_url = serializers.SerializerMethodField(read_only=True)
+    preview_url = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = Attachment
-        fields = ["id", "file", "name", "uploaded_by", "uploaded_at", "workflow_id","workflow"]
+        fields = ["id", "file", "name", "uploaded_by", "uploaded_at", "workflow_id", "workflow",
+                  "thumbnail_url", "preview_url", "derivatives_status"]
+        read_only_fields = ["derivatives_status"]
+        list_serializer_class = AttachmentListSerializer
 
     def get_id(self, obj):
         return str(obj.pk)
 
     def get_workflow_id(self, obj):
-        return str(obj.workflow.pk) if obj.workflow else None
+        return str(obj.workflow_id) if obj.workflow_id else None
+
+    def get_thumbnail_url(self, obj):
+        return attachment_link(self, obj, obj.thumbnail_key, "thumbnail")
+
+    def get_preview_url(self, obj):
+        return attachment_link(self, obj, obj.preview_key, "preview")
+
+
+class PresignedUploadSerializer(serializers.Serializer):
+    """Request for a presigned direct-to-MinIO upload"""
+    workflow = serializers.CharField()
+    filename = serializers.CharField(max_length=255)
+    name = serializers.CharField(max_length=200, required=False)
+    content_type = serializers.CharField(max_length=200, required=False, default="application/octet-stream")
+    size = serializers.IntegerField(min_value=1, required=False)
+    sha256 = serializers.CharField(max_length=64, required=False, allow_blank=True)
+
+    def validate_workflow(self, value):
+        if not ObjectId.is_valid(value) or not Workflow.objects.filter(pk=ObjectId(value)).exists():
+            raise serializers.ValidationError("Workflow not found")
+        return value
+
+    def validate_size(self, value):
+        max_size = self.context.get("max_size")
+        if max_size and value > max_size:
+            raise serializers.ValidationError(f"File is larger than {max_size} bytes")
+        return value
+
+    def validate_sha256(self, value):
+        if not value:
+            return None
+        sha256 = blobs.normalize_sha256(value)
+        if sha256 is None:
+            raise serializers.ValidationError("Expected a hex SHA-256 digest")
+        return sha256
+
+
+class UploadSessionCreateSerializer(PresignedUploadSerializer):
+    """Request to start a resumable multipart upload; the size is mandatory"""
+    size = serializers.IntegerField(min_value=1)
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    id = serializers.SerializerMethodField(read_only=True)
+    workflow_id = serializers.SerializerMethodField(read_only=True)
+    attachment_id = serializers.SerializerMethodField(read_only=True)
+    part_count = serializers.IntegerField(read_only=True)
+    uploaded_parts = serializers.SerializerMethodField(read_only=True)
+
+    class Meta:
+        model = UploadSession
+        fields = ["id", "workflow_id", "name", "filename", "content_type", "size", "part_size",
+                  "part_count", "uploaded_parts", "status", "attachment_id", "created_at", "updated_at"]
+        read_only_fields = fields
+
+    def get_id(self, obj):
+        return str(obj.pk)
+
+    def get_workflow_id(self, obj):
+        return str(obj.workflow_id)
+
+    def get_attachment_id(self, obj):
+        return str(obj.attachment_id) if obj.attachment_id else None
+
+    def get_uploaded_parts(self, obj):
+        return sorted(int(number) for number in obj.parts)
 
 
 class CommentSerializer(serializers.ModelSerializer):
@@ -55,7 +256,7 @@ class ActionSerializer(serializers.ModelSerializer):
         return str(obj.workflow.pk) if obj.workflow else None
 
 
-class WorkflowSerializer(serializers.ModelSerializer):
+class WorkflowSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     id = serializers.SerializerMethodField(read_only=True)
     
     created_by = serializers.CharField(source="created_by.username", read_only=True)
@@ -66,25 +267,37 @@ class WorkflowSerializer(serializers.ModelSerializer):
         model = Workflow
         fields = [
             "id", "title", "body",
-            "state", "created_by", "created_at", "updated_at", "attachments", "comments"
+            "state", "created_by", "created_at", "updated_at", "attachments", "comments",
+            "applicant_name", "applicant_national_id",
         ]
-        read_only_fields = ["state", "created_by", "created_at", "updated_at"]
+        read_only_fields = ["state", "created_by", "created_at", "updated_at",
+                            "applicant_name", "applicant_national_id"]
+        # Each costs a query per workflow; list responses include them only with ?expand=
+        expandable_fields = ("attachments", "comments")
 
     def get_id(self, obj):
         return str(obj.pk)
 
+    def _preloaded(self, obj, name):
+        """Rows the view already fetched (context["preloaded"][pk][name]), or None"""
+        return self.context.get("preloaded", {}).get(obj.pk, {}).get(name)
+
     def get_attachments(self, obj):
         # Get attachments without using reverse foreign key to avoid ObjectId issues
         try:
-            attachments = Attachment.objects.filter(workflow_id=obj.pk)
-            return AttachmentSerializer(attachments, many=True).data
+            attachments = self._preloaded(obj, "attachments")
+            if attachments is None:
+                attachments = Attachment.objects.filter(workflow_id=obj.pk)
+            return AttachmentSerializer(attachments, many=True, context=self.context).data
         except Exception:
             return []
 
     def get_comments(self, obj):
         # Get comments without using reverse foreign key to avoid ObjectId issues
         try:
-            comments = Comment.objects.filter(workflow_id=obj.pk)
+            comments = self._preloaded(obj, "comments")
+            if comments is None:
+                comments = Comment.objects.filter(workflow_id=obj.pk)
             return CommentSerializer(comments, many=True).data
         except Exception:
             return []
@@ -117,13 +330,6 @@ class WorkflowSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("نام متقاضی باید حداقل ۲ کاراکتر داشته باشد")
         return value.strip()
     
-    def to_representation(self, instance):
-        data = super().to_representation(instance)
-        # Add computed properties
-        data['applicant_name'] = instance.applicant_name  # This calls the @property
-        data['applicant_national_id'] = instance.applicant_national_id  # This calls the @property
-        return data
-    
 class FormDataSerializer(serializers.Serializer):
     """Generic serializer for form data"""
     form_number = serializers.IntegerField()
@@ -146,7 +352,7 @@ class FormDataSerializer(serializers.Serializer):
         return attrs
 
 
-class WorkflowFormSerializer(serializers.ModelSerializer):
+class WorkflowFormSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for workflow with form data"""
     
     # Add data as a custom field since it's now a property
@@ -154,21 +360,13 @@ class WorkflowFormSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Workflow
-        fields = ['id', 'title', 'state', 'created_at', 'updated_at', 'data']
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        fields = ['id', 'title', 'state', 'created_at', 'updated_at', 'data',
+                  'applicant_name', 'applicant_national_id', 'property_address', 'registration_plate_number']
+        read_only_fields = ['id', 'created_at', 'updated_at',
+                            'applicant_name', 'applicant_national_id', 'property_address', 'registration_plate_number']
+        expandable_fields = ('data',)
+        field_sources = {'data': ('_data',)}
     
     def get_data(self, obj):
         """Get data property"""
         return obj.data
-    
-    def to_representation(self, instance):
-        """Add computed properties to representation"""
-        data = super().to_representation(instance)
-        
-        # Add computed properties
-        data['applicant_name'] = instance.applicant_name
-        data['applicant_national_id'] = instance.applicant_national_id
-        data['property_address'] = instance.property_address
-        data['registration_plate_number'] = instance.registration_plate_number
-        
-        return data
@@ -3,27 +3,147 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.conf import settings
+from django.db.models.signals import post_save
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
 from ..models import Workflow
+from ..drafts import buffer as draft_buffer
+from ..versioning import conditional_on_workflow_version
 from ..forms.registry import FormRegistry
+from ..forms.schemas import cached_schema, cached_forms_metadata
+from ..forms.patch import PatchError, PatchTestFailed, apply_operations, parse_operations, resolve, touched_paths
+from ..forms.form_3_permissions import Form3PermissionManager
 from ..actions import (
     get_form3_step_info, 
     get_form3_completion_status, 
     can_user_edit_form3_section,
     perform_action
 )
+from ..permissions import get_user_roles
 from .serializers import FormDataSerializer, WorkflowFormSerializer
 
+# Schemas change only on deploy; clients revalidate cheaply with the ETag
+# Compare-and-set retries when another write lands between read and write
+PATCH_MAX_ATTEMPTS = 3
+SCHEMA_CACHE_CONTROL = f"private, max-age={getattr(settings, 'FORM_SCHEMA_MAX_AGE', 300)}, must-revalidate"
+
+
+def cached_json_response(request, cached):
+    """Serve a pre-serialized payload, or 304 when the client already has it"""
+    not_modified = get_conditional_response(request, etag=cached.etag)
+    if not_modified is None:
+        resp = HttpResponse(cached.body, content_type="application/json")
+    else:
+        resp = not_modified
+    resp["ETag"] = cached.etag
+    resp["Cache-Control"] = SCHEMA_CACHE_CONTROL
+    return resp
+
+# Define which forms are available in which states
+STATE_FORMS = {
+    Workflow.State.Form1: [1],
+    Workflow.State.Form2: [2],
+    Workflow.State.Form3: [3],  # Add Form3
+    # Add more mappings as needed
+}
+
+
+def form3_metadata(workflow, user_roles):
+    """Form3 step, completion and the user's editable sections"""
+    from ..forms.form_3 import PropertyStatusReviewForm
+
+    step_info = get_form3_step_info(workflow)
+    completion_status = get_form3_completion_status(workflow)
+    editable_sections = PropertyStatusReviewForm.get_user_editable_sections(workflow, user_roles)
+
+    return {
+        "form3_metadata": {
+            "current_step": step_info,
+            "completion_status": completion_status,
+            "editable_sections": editable_sections,
+            "user_roles": user_roles,
+            "can_act_in_current_step": step_info.get('role') in user_roles
+        }
+    }
+
+
+def form_payload(workflow, form_number, form_class, user_roles, schema_etag=None):
+    """Body of GET forms/{n}"""
+    schema = cached_schema(form_class)
+    payload = {
+        "form_number": form_number,
+        "form_title": form_class.form_title,
+        "data": form_class.extract_from_workflow(workflow),
+        "schema_etag": schema.etag,
+        # Clients holding the current schema (?schema_etag=...) don't get it again
+        "schema": None if schema_etag == schema.etag else schema.schema,
+    }
+    if form_number == 3 and workflow.state == 'Form3':
+        payload.update(form3_metadata(workflow, user_roles))
+    return payload
+
+
+def is_form_completed(workflow, form_number):
+    """Check if a form is completed (has required data)"""
+    form_class = FormRegistry.get_form(form_number)
+    if not form_class:
+        return False
+
+    # Special handling for Form3
+    if form_number == 3 and workflow.state == 'Form3':
+        completion_status = get_form3_completion_status(workflow)
+        return completion_status.get('is_fully_completed', False)
+
+    # Regular form completion check
+    form_data = form_class.extract_from_workflow(workflow)
+    schema = form_class.get_cached_schema()
+
+    required_fields = schema.get('required', [])
+    for field in required_fields:
+        if not form_data.get(field):
+            return False
+
+    return True
+
+
+def available_forms_payload(workflow):
+    """Body of GET available_forms"""
+    available_forms = {}
+    for form_number in STATE_FORMS.get(workflow.state, []):
+        form_class = FormRegistry.get_form(form_number)
+        if form_class:
+            available_forms[form_number] = {
+                "form_number": form_number,
+                "form_title": form_class.form_title,
+                "can_edit": True,  # Add permission logic here
+                "is_completed": is_form_completed(workflow, form_number)
+            }
+    return {
+        "workflow_state": workflow.state,
+        "available_forms": available_forms
+    }
+
 class WorkflowFormViewSet(viewsets.ModelViewSet):
     """ViewSet for workflow form operations"""
     
     queryset = Workflow.objects.all()
     serializer_class = WorkflowFormSerializer
     permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self.action == 'list':
+            only, related = self.get_serializer_class().projection(self.get_serializer_context())
+            qs = qs.select_related(*related).only(*only)
+        return qs
     
-    @action(detail=True, methods=['get', 'post'], url_path='forms/(?P<form_number>[0-9]+)')
+    @action(detail=True, methods=['get', 'post', 'patch'], url_path='forms/(?P<form_number>[0-9]+)')
+    @conditional_on_workflow_version
     def form_action(self, request, pk=None, form_number=None):
-        """Handle both GET and POST for forms with Form3 special handling"""
+        """Handle GET, POST and JSON-Patch PATCH for forms with Form3 special handling"""
         workflow = self.get_object()
         form_number = int(form_number)
         
@@ -38,24 +158,15 @@ class WorkflowFormViewSet(viewsets.ModelViewSet):
             return self._handle_form_get(workflow, form_number, form_class)
         elif request.method == 'POST':
             return self._handle_form_post(workflow, form_number, form_class, request)
+        elif request.method == 'PATCH':
+            return self._handle_form_patch(workflow, form_number, form_class, request)
     
     def _handle_form_get(self, workflow, form_number, form_class):
         """Handle GET request for form data"""
-        # Extract form data
-        form_data = form_class.extract_from_workflow(workflow)
-        
-        response_data = {
-            "form_number": form_number,
-            "form_title": form_class.form_title,
-            "data": form_data,
-            "schema": form_class.get_schema()
-        }
-        
-        # Add Form3 specific metadata
-        if form_number == 3 and workflow.state == 'Form3':
-            response_data.update(self._get_form3_metadata(workflow))
-        
-        return Response(response_data)
+        return Response(form_payload(
+            workflow, form_number, form_class,
+            get_user_roles(self.request.user), self.request.query_params.get("schema_etag")
+        ))
     
     def _handle_form_post(self, workflow, form_number, form_class, request):
         """Handle POST request for form submission"""
@@ -75,6 +186,7 @@ class WorkflowFormViewSet(viewsets.ModelViewSet):
         # Regular form handling
         try:
             workflow.update_from_form(form_number, request.data)
+            draft_buffer.discard(workflow.pk, request.user.pk, form_number)
             workflow_serializer = WorkflowFormSerializer(workflow)
             
             return Response({
@@ -88,13 +200,130 @@ class WorkflowFormViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    def _handle_form_patch(self, workflow, form_number, form_class, request):
+        """
+        Apply RFC 6902 operations to a form.
+
+        Only the touched paths are permission-checked and validated, and the
+        write is a compare-and-set on the stored document so a concurrent
+        edit is retried on fresh data instead of being overwritten.
+        """
+        try:
+            operations = parse_operations(request.data)
+        except PatchError as e:
+            return Response({"error": "invalid_patch", **e.as_dict()}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not form_class.direct_data_mapping and any(op["op"] in ("remove", "move") for op in operations):
+            # Mapped sections are merged into the stored data, so a removal would not reach it
+            return Response(
+                {"error": "invalid_patch", "message": "Fields of this form cannot be removed; replace them instead"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        paths = touched_paths(operations)
+        step_info = None
+        if form_number == 3 and workflow.state == 'Form3':
+            step_info = get_form3_step_info(workflow)
+            permissions = Form3PermissionManager.get_user_permissions(
+                workflow, get_user_roles(request.user), step_info.get('step_number', 1)
+            )
+            errors = Form3PermissionManager.validate_user_paths(paths, permissions)
+            if errors:
+                return Response(
+                    {"error": "insufficient_permissions", "fields": errors, "current_step": step_info},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+        elif any(tokens[0] in Form3PermissionManager.METADATA_FIELDS for tokens in paths):
+            return Response({"error": "invalid_patch", "message": "Form metadata cannot be patched"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        validator = form_class.get_validator()
+        for _ in range(PATCH_MAX_ATTEMPTS):
+            original = workflow._data
+            data = workflow.data
+            if form_class.direct_data_mapping:
+                # Sections are presented as {} by extract_from_workflow even when unset
+                document = data
+                stored_keys = set(data)
+                for name, subschema in form_class.get_cached_schema().get("properties", {}).items():
+                    if subschema.get("type") == "object" and name not in Form3PermissionManager.METADATA_FIELDS:
+                        document.setdefault(name, {})
+            else:
+                document = form_class.extract_from_workflow(workflow)
+
+            try:
+                apply_operations(document, operations)
+            except PatchTestFailed as e:
+                return Response({"error": "test_failed", **e.as_dict()}, status=status.HTTP_409_CONFLICT)
+            except PatchError as e:
+                return Response({"error": "patch_failed", **e.as_dict()}, status=status.HTTP_400_BAD_REQUEST)
+
+            errors = {}
+            for tokens in paths:
+                if tokens[-1] == "-":
+                    tokens = tokens[:-1]
+                errors.update(validator.validate_at(tokens, resolve(document, tokens)))
+            if errors:
+                return Response({"data": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+            if form_class.direct_data_mapping:
+                new_data = {k: v for k, v in document.items() if v != {} or k in stored_keys}
+            else:
+                new_data = workflow.data
+                sections = {tokens[0] for tokens in paths}
+                workflow._deep_merge_data(
+                    new_data, form_class.map_to_workflow({k: document[k] for k in sections if k in document})
+                )
+
+            workflow.data = new_data
+            computed = {name: getattr(workflow, name) for name in workflow.refresh_computed_fields(new_data)}
+            now = timezone.now()
+            if Workflow.objects.filter(pk=workflow.pk, _data=original).update(
+                _data=workflow._data, updated_at=now, **computed
+            ):
+                workflow.updated_at = now
+                break
+            workflow.refresh_from_db(fields=['_data'])
+        else:
+            return Response(
+                {"error": "conflict", "message": "The form is being edited concurrently; retry the patch"},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        # The compare-and-set bypassed save(): run its receivers (audit log,
+        # version bump) and drop the draft the edit supersedes, as POST does
+        post_save.send(
+            sender=Workflow, instance=workflow, created=False, raw=False, using=workflow._state.db,
+            update_fields=frozenset({'_data', 'updated_at', *computed}),
+        )
+        draft_buffer.discard(workflow.pk, request.user.pk, form_number)
+
+        response_data = {
+            "message": "Form patched successfully",
+            "applied": len(operations),
+            "updated_at": workflow.updated_at,
+        }
+
+        # Writing the current step's signature completes the step, as with POST
+        signature_path = (step_info.get('section'), step_info.get('signature_field')) if step_info else None
+        signature = resolve(document, signature_path) if signature_path and signature_path[1] else None
+        if signature and signature_path in paths:
+            response_data["approval"] = perform_action(
+                workflow=workflow,
+                user=request.user,
+                action_type='APPROVE',
+                data={'signature': signature}
+            )
+
+        return Response(response_data)
+
     def _handle_form3_submission(self, workflow, request):
         """Special handling for Form3 submissions"""
         from ..forms.form_3 import PropertyStatusReviewForm
         
         # Get current step info
         step_info = get_form3_step_info(workflow)
-        user_roles = [m.role.code for m in request.user.memberships.all()]
+        user_roles = get_user_roles(request.user)
         
         # Check if user can act in current step
         if step_info.get('role') not in user_roles:
@@ -111,6 +340,7 @@ class WorkflowFormViewSet(viewsets.ModelViewSet):
         # Update workflow with form data
         try:
             workflow.update_from_form(3, request.data)
+            draft_buffer.discard(workflow.pk, request.user.pk, 3)
             
             # Check if this submission includes a signature (step completion)
             signature_field = step_info.get('signature_field')
@@ -154,28 +384,7 @@ class WorkflowFormViewSet(viewsets.ModelViewSet):
     
     def _get_form3_metadata(self, workflow):
         """Get Form3 specific metadata for the response"""
-        step_info = get_form3_step_info(workflow)
-        completion_status = get_form3_completion_status(workflow)
-        user_roles = [m.role.code for m in self.request.user.memberships.all()]
-        
-        # Get editable sections for current user
-        editable_sections = {}
-        for role in user_roles:
-            from ..forms.form_3 import PropertyStatusReviewForm
-            role_sections = PropertyStatusReviewForm.get_editable_sections(workflow, role)
-            for section, editable in role_sections.items():
-                if editable:
-                    editable_sections[section] = True
-        
-        return {
-            "form3_metadata": {
-                "current_step": step_info,
-                "completion_status": completion_status,
-                "editable_sections": editable_sections,
-                "user_roles": user_roles,
-                "can_act_in_current_step": step_info.get('role') in user_roles
-            }
-        }
+        return form3_metadata(workflow, get_user_roles(self.request.user))
     
     def _extract_signature_from_data(self, form_data, signature_field):
         """Extract signature value from nested form data"""
@@ -190,7 +399,70 @@ class WorkflowFormViewSet(viewsets.ModelViewSet):
         except (KeyError, TypeError):
             return None
     
+    @action(detail=True, methods=['get', 'put', 'delete'], url_path='forms/(?P<form_number>[0-9]+)/draft')
+    def form_draft(self, request, pk=None, form_number=None):
+        """
+        Autosave buffer for a form. PUT merges a partial form document into
+        the user's draft without touching the workflow; the draft is written
+        to the workflow when it goes idle, on draft/flush, or is discarded
+        by a regular form submission.
+        """
+        workflow = self.get_object()
+        form_number = int(form_number)
+        if not FormRegistry.get_form(form_number):
+            return Response({"error": f"Form {form_number} not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        if request.method == 'DELETE':
+            draft_buffer.discard(workflow.pk, request.user.pk, form_number)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        if request.method == 'GET':
+            draft = draft_buffer.get(workflow.pk, request.user.pk, form_number)
+            return Response({
+                "form_number": form_number,
+                "data": draft.data if draft else {},
+                "updated_at": draft.updated_at if draft else None,
+                "errors": draft.errors if draft and draft.rejected else None,
+            })
+
+        if not isinstance(request.data, dict):
+            return Response({"error": "A draft must be a JSON object"}, status=status.HTTP_400_BAD_REQUEST)
+        partial = {k: v for k, v in request.data.items() if k not in Form3PermissionManager.METADATA_FIELDS}
+
+        if form_number == 3 and workflow.state == 'Form3':
+            step_info = get_form3_step_info(workflow)
+            permissions = Form3PermissionManager.get_user_permissions(
+                workflow, get_user_roles(request.user), step_info.get('step_number', 1)
+            )
+            errors = Form3PermissionManager.validate_user_form_submission(partial, permissions)
+            if errors:
+                return Response(
+                    {"error": "insufficient_permissions", "fields": errors, "current_step": step_info},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+            # A signature completes the step, which only a submission may do
+            signature_field = step_info.get('signature_field')
+            if signature_field and self._extract_signature_from_data(partial, signature_field):
+                return Response(
+                    {"error": "signature_in_draft", "message": "Submit the form to sign it"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        draft_buffer.record(workflow.pk, request.user.pk, form_number, partial)
+        return Response({"buffered": True}, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['post'], url_path='forms/(?P<form_number>[0-9]+)/draft/flush')
+    def form_draft_flush(self, request, pk=None, form_number=None):
+        """Write the user's draft to the workflow now (e.g. when the editor closes)"""
+        workflow = self.get_object()
+        results = draft_buffer.flush(workflow_id=workflow.pk, user_id=request.user.pk, form_number=form_number)
+        errors = next((e for e in results.values() if e), None)
+        if errors:
+            return Response({"data": errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"flushed": len(results)})
+
     @action(detail=True, methods=['get'])
+    @conditional_on_workflow_version
     def form3_status(self, request, pk=None):
         """Get detailed Form3 status and progress"""
         workflow = self.get_object()
@@ -252,66 +524,21 @@ class WorkflowFormViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def forms_metadata(self, request):
         """Get metadata for all available forms"""
-        forms_data = {}
-        
-        for form_number, form_class in FormRegistry.get_all_forms().items():
-            forms_data[form_number] = {
-                "form_number": form_number,
-                "form_title": form_class.form_title,
-                "schema": form_class.get_schema()
-            }
-        
-        return Response(forms_data)
+        return cached_json_response(request, cached_forms_metadata(FormRegistry.get_all_forms()))
+
+    @action(detail=False, methods=['get'], url_path='schemas/(?P<form_number>[0-9]+)')
+    def schema(self, request, form_number=None):
+        """One form's schema, pre-serialized, with ETag / 304 support"""
+        form_class = FormRegistry.get_form(int(form_number))
+        if not form_class:
+            return Response(
+                {"error": f"Form {form_number} not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return cached_json_response(request, cached_schema(form_class))
     
     @action(detail=True, methods=['get'])
     def available_forms(self, request, pk=None):
         """Get available forms for current workflow state"""
         workflow = self.get_object()
-        
-        # Define which forms are available in which states
-        state_forms = {
-            Workflow.State.Form1: [1],
-            Workflow.State.Form2: [2],
-            Workflow.State.Form3: [3],  # Add Form3
-            # Add more mappings as needed
-        }
-        
-        available_form_numbers = state_forms.get(workflow.state, [])
-        available_forms = {}
-        
-        for form_number in available_form_numbers:
-            form_class = FormRegistry.get_form(form_number)
-            if form_class:
-                available_forms[form_number] = {
-                    "form_number": form_number,
-                    "form_title": form_class.form_title,
-                    "can_edit": True,  # Add permission logic here
-                    "is_completed": self._is_form_completed(workflow, form_number)
-                }
-        
-        return Response({
-            "workflow_state": workflow.state,
-            "available_forms": available_forms
-        })
-    
-    def _is_form_completed(self, workflow, form_number):
-        """Check if a form is completed (has required data)"""
-        form_class = FormRegistry.get_form(form_number)
-        if not form_class:
-            return False
-        
-        # Special handling for Form3
-        if form_number == 3 and workflow.state == 'Form3':
-            completion_status = get_form3_completion_status(workflow)
-            return completion_status.get('is_fully_completed', False)
-        
-        # Regular form completion check
-        form_data = form_class.extract_from_workflow(workflow)
-        schema = form_class.get_schema()
-        
-        required_fields = schema.get('required', [])
-        for field in required_fields:
-            if not form_data.get(field):
-                return False
-        
-        return True
\ No newline at end of file
+        return Response(available_forms_payload(workflow))
\ No newline at end of file
@@ -7,6 +7,8 @@ class WorkflowsConfig(AppConfig):
 
     def ready(self):
         """Import forms to register them"""
+        from . import signals  # noqa: F401
+
         try:
             # Import forms to trigger registration
             from .forms import form_1, form_2
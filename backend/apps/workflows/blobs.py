@@ -0,0 +1,152 @@
+# apps/workflows/blobs.py
+import base64
+import hashlib
+import logging
+import re
+import uuid
+
+from django.db import IntegrityError
+from django.db.models import F, Q
+
+from . import storage
+from .models import Attachment, Blob
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+_SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def normalize_sha256(value):
+    """Lower-case hex digest, or None when ``value`` is not one"""
+    value = (value or "").strip().lower()
+    return value if _SHA256_RE.match(value) else None
+
+
+def sha256_base64(sha256: str) -> str:
+    """The digest in the base64 form S3 checksum headers use"""
+    return base64.b64encode(bytes.fromhex(sha256)).decode()
+
+
+def new_blob_key() -> str:
+    """
+    A fresh key for uploaded content. Keys are never reused, so deleting a
+    released blob's object cannot remove a later upload of the same content.
+    """
+    return f"blobs/{uuid.uuid4().hex}"
+
+
+def acquire(sha256: str):
+    """Take a reference on stored content; None when the server does not have it"""
+    if not Blob.objects.filter(sha256=sha256).update(ref_count=F("ref_count") + 1):
+        return None
+    return Blob.objects.get(sha256=sha256)
+
+
+def acquire_referenced(sha256: str, workflow_id, user_id):
+    """
+    Take a reference on stored content that the workflow or the user already
+    references; None otherwise. Knowing a digest does not prove having the
+    file, so content only others uploaded is never handed out this way.
+    """
+    blob_id = Blob.objects.filter(sha256=sha256).values_list("pk", flat=True).first()
+    if blob_id is None or not Attachment.objects.filter(
+        Q(workflow_id=workflow_id) | Q(uploaded_by_id=user_id), blob_id=blob_id
+    ).exists():
+        return None
+    return acquire(sha256)
+
+
+def register(sha256: str, size: int, content_type: str, key: str) -> Blob:
+    """
+    Take a reference on ``sha256``, recording the content just written to
+    ``key`` when the server does not have it yet. When the returned blob's
+    key is not ``key`` the content was already stored and the caller drops
+    its copy.
+    """
+    while True:
+        blob = acquire(sha256)
+        if blob is not None:
+            return blob
+        try:
+            return Blob.objects.create(sha256=sha256, key=key, size=size, content_type=content_type, ref_count=1)
+        except IntegrityError:
+            # Another upload of the same content registered it first; take a
+            # reference on that one unless it was released in the meantime
+            continue
+
+
+def release(blob_id) -> bool:
+    """
+    Drop one reference. The last one deletes the stored object and its
+    derivatives; returns True when that happened.
+
+    The conditional delete only matches at ``ref_count <= 0``, so a concurrent
+    ``acquire`` either lands first and keeps the blob or finds it gone and
+    registers the content again under a new key.
+    """
+    from .previews import derivative_key
+
+    Blob.objects.filter(pk=blob_id).update(ref_count=F("ref_count") - 1)
+    blob = Blob.objects.filter(pk=blob_id, ref_count__lte=0).first()
+    if blob is None or not Blob.objects.filter(pk=blob_id, ref_count__lte=0).delete()[0]:
+        return False
+    try:
+        storage.delete_objects([blob.key, derivative_key(blob.key, "thumb"), derivative_key(blob.key, "preview")])
+    except Exception:
+        logger.exception("Deleting stored content %s failed", blob.key)
+    return True
+
+
+def _hash_chunks(chunks):
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in chunks:
+        digest.update(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def ingest_attachment(attachment):
+    """
+    Content-address an attachment registered at its upload key without a
+    verified checksum (multipart sessions, direct uploads without a sha256).
+
+    Reads the whole object, so it runs off the request path (see
+    previews.PreviewPipeline). The upload becomes the blob, or the attachment
+    is pointed at the copy already stored and the upload is deleted. Returns
+    the blob, or None when the attachment changed or went meanwhile.
+    """
+    from .previews import derivative_key
+
+    key = attachment.file.name
+    obj = storage.get_s3_client().get_object(Bucket=storage.bucket_name(), Key=key)
+    sha256, size = _hash_chunks(obj["Body"].iter_chunks(HASH_CHUNK_SIZE))
+    blob = register(sha256, size, obj.get("ContentType") or "application/octet-stream", key)
+
+    if not Attachment.objects.filter(pk=attachment.pk, file=key, blob__isnull=True).update(file=blob.key, blob=blob):
+        release(blob.pk)
+        return None
+    if blob.key != key:
+        storage.delete_objects([key, derivative_key(key, "thumb"), derivative_key(key, "preview")])
+    attachment.file.name = blob.key
+    attachment.blob = blob
+    return blob
+
+
+def ingest_file(fileobj, content_type: str) -> Blob:
+    """Store an uploaded file (e.g. a multipart form upload) by content"""
+    sha256, size = _hash_chunks(fileobj.chunks(HASH_CHUNK_SIZE))
+
+    blob = acquire(sha256)
+    if blob is None:
+        key = new_blob_key()
+        fileobj.seek(0)
+        storage.get_s3_client().upload_fileobj(
+            fileobj, storage.bucket_name(), key, ExtraArgs={"ContentType": content_type}
+        )
+        blob = register(sha256, size, content_type, key)
+        if blob.key != key:
+            # A concurrent upload of the same content registered first
+            storage.delete_objects([key])
+    return blob
@@ -0,0 +1,165 @@
+# apps/workflows/bundles.py
+import csv
+import io
+import logging
+import mimetypes
+import os
+import queue
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import storage
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+# Objects read ahead of the one being zipped, and chunks buffered per object:
+# memory stays below PREFETCH * QUEUE_CHUNKS * CHUNK_SIZE whatever the bundle size
+PREFETCH = getattr(settings, "ATTACHMENT_ZIP_PREFETCH", 4)
+QUEUE_CHUNKS = 8
+MANIFEST_NAME = "manifest.csv"
+
+_END = object()
+
+
+class _Sink(io.RawIOBase):
+    """Unseekable write target; zipfile then streams entries with data descriptors"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _entry_name(attachment, used: set) -> str:
+    """Readable, unique archive name built from the attachment's display name"""
+    base, ext = os.path.splitext((attachment.name or "").replace("/", "_").replace("\\", "_").strip())
+    if not ext:
+        ext = os.path.splitext(attachment.file.name)[1]
+    if not ext and attachment.blob_id:
+        ext = mimetypes.guess_extension(attachment.blob.content_type or "") or ""
+    base = base or "attachment"
+
+    name, n = f"{base}{ext}", 1
+    while name.lower() in used or name == MANIFEST_NAME:
+        n += 1
+        name = f"{base} ({n}){ext}"
+    used.add(name.lower())
+    return name
+
+
+def _put(out: queue.Queue, item, stop: threading.Event) -> bool:
+    """Put ``item`` unless the consumer stops first; False when it did"""
+    while not stop.is_set():
+        try:
+            out.put(item, timeout=1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _fetch(key: str, out: queue.Queue, stop: threading.Event):
+    """Producer: stream one object into a bounded queue"""
+    try:
+        body = storage.get_s3_client().get_object(Bucket=storage.bucket_name(), Key=key)["Body"]
+        with body:
+            for chunk in body.iter_chunks(CHUNK_SIZE):
+                if not _put(out, chunk, stop):
+                    return
+        _put(out, _END, stop)
+    except Exception as e:
+        _put(out, e, stop)
+
+
+def stream_attachments_zip(attachments):
+    """
+    Yield a ZIP archive of ``attachments`` followed by a manifest, built on
+    the fly: no temp files, bounded memory, and the next objects are read
+    from MinIO concurrently while the current one is being written.
+    """
+    attachments = list(attachments)
+    stop = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=max(PREFETCH, 1), thread_name_prefix="zip-prefetch")
+    pending = deque()
+    upcoming = iter(attachments)
+
+    def prefetch():
+        while len(pending) < max(PREFETCH, 1):
+            attachment = next(upcoming, None)
+            if attachment is None:
+                return
+            q = queue.Queue(maxsize=QUEUE_CHUNKS)
+            executor.submit(_fetch, attachment.file.name, q, stop)
+            pending.append((attachment, q))
+
+    sink = _Sink()
+    used = set()
+    manifest = []
+    try:
+        with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED, compresslevel=1) as archive:
+            prefetch()
+            while pending:
+                attachment, q = pending.popleft()
+                prefetch()
+
+                name = _entry_name(attachment, used)
+                row = {
+                    "file": name,
+                    "name": attachment.name,
+                    "uploaded_by": attachment.uploaded_by.username if attachment.uploaded_by_id else "",
+                    "uploaded_at": timezone.localtime(attachment.uploaded_at).isoformat() if attachment.uploaded_at else "",
+                    "size": attachment.blob.size if attachment.blob_id else "",
+                    "sha256": attachment.blob.sha256 if attachment.blob_id else "",
+                    "status": "ok",
+                }
+
+                item = q.get()
+                if isinstance(item, Exception):
+                    logger.warning("Skipping attachment %s in bundle: %s", attachment.pk, item)
+                    row.update(file="", status="missing")
+                    manifest.append(row)
+                    continue
+
+                info = zipfile.ZipInfo(name, date_time=timezone.localtime(attachment.uploaded_at).timetuple()[:6])
+                info.compress_type = zipfile.ZIP_DEFLATED
+                # Large objects need zip64 headers, which must be chosen up front
+                force_zip64 = bool(attachment.blob_id and attachment.blob.size >= zipfile.ZIP64_LIMIT)
+                with archive.open(info, mode="w", force_zip64=force_zip64) as entry:
+                    while item is not _END:
+                        if isinstance(item, Exception):
+                            logger.warning("Attachment %s truncated in bundle: %s", attachment.pk, item)
+                            row["status"] = "incomplete"
+                            break
+                        entry.write(item)
+                        yield sink.drain()
+                        item = q.get()
+                manifest.append(row)
+                yield sink.drain()
+
+            text = io.StringIO()
+            writer = csv.DictWriter(text, fieldnames=["file", "name", "uploaded_by", "uploaded_at", "size", "sha256", "status"])
+            writer.writeheader()
+            writer.writerows(manifest)
+            # BOM so spreadsheet apps read the Persian names as UTF-8
+            archive.writestr(MANIFEST_NAME, "\ufeff" + text.getvalue())
+        yield sink.drain()
+    finally:
+        # Also reached when the client disconnects mid-download
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
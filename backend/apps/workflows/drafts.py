@@ -0,0 +1,256 @@
+# apps/workflows/drafts.py
+import copy
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import F, Q
+from django.utils import timezone
+
+from workflow_engine.background import PeriodicTask
+from .actions import get_form3_step_info
+from .forms.form_3_permissions import Form3PermissionManager
+from .forms.registry import FormRegistry
+from .models import FormDraft
+from .permissions import get_user_roles
+
+logger = logging.getLogger(__name__)
+
+# Buffered edits reach the draft store at most this often per worker
+PERSIST_INTERVAL = getattr(settings, "FORM_DRAFT_PERSIST_INTERVAL", 5)
+# A draft idle for this long is written to its workflow
+FLUSH_DELAY = getattr(settings, "FORM_DRAFT_FLUSH_DELAY", 60)
+FLUSH_LEASE = getattr(settings, "FORM_DRAFT_FLUSH_LEASE", 120)
+# Discarded drafts are kept this long to drop edits other workers still buffer
+TOMBSTONE_TTL = getattr(settings, "FORM_DRAFT_TOMBSTONE_TTL", 3600)
+PERSIST_MAX_ATTEMPTS = 3
+FLUSH_BATCH = 100
+
+
+def merge(target: dict, source: dict) -> dict:
+    """Deep-merge ``source`` into ``target`` like Workflow._deep_merge_data"""
+    for key, value in source.items():
+        if isinstance(target.get(key), dict) and isinstance(value, dict):
+            merge(target[key], value)
+        else:
+            target[key] = copy.deepcopy(value)
+    return target
+
+
+def _persist(key, partial, since):
+    """
+    Merge ``partial`` into the stored draft (compare-and-set on revision).
+
+    Edits buffered since before the draft was discarded are dropped: the
+    submission that discarded it already saw them. Later edits start over.
+    """
+    workflow_id, user_id, form_number = key
+    lookup = {"workflow_id": workflow_id, "user_id": user_id, "form_number": form_number}
+    for _ in range(PERSIST_MAX_ATTEMPTS):
+        draft = FormDraft.objects.filter(**lookup).only("id", "data", "revision", "discarded_at").first()
+        if draft is None:
+            try:
+                FormDraft.objects.create(**lookup, data=partial, revision=1)
+                return
+            except IntegrityError:
+                continue
+        if draft.discarded_at is None:
+            data = merge(draft.data or {}, partial)
+        elif since > draft.discarded_at:
+            data = partial
+        else:
+            return
+        if FormDraft.objects.filter(pk=draft.pk, revision=draft.revision).update(
+            data=data, revision=F("revision") + 1, rejected=False, errors=None, discarded_at=None,
+            updated_at=timezone.now()
+        ):
+            return
+    raise RuntimeError(f"Draft {key} is being written concurrently")
+
+
+def draft_paths(data: dict) -> list:
+    """Token paths a draft writes: each field of the sections it holds, or the top-level key"""
+    paths = []
+    for key, value in data.items():
+        if isinstance(value, dict):
+            paths.extend((key, field) for field in value)
+        else:
+            paths.append((key,))
+    return paths
+
+
+def permission_errors(draft):
+    """
+    Check a Form3 draft against its user's permissions now, as a submission
+    would be: the step or the user's roles may have changed since the edits
+    were buffered.
+    """
+    workflow = draft.workflow
+    if draft.form_number != 3 or workflow.state != 'Form3':
+        return None
+    step_info = get_form3_step_info(workflow)
+    permissions = Form3PermissionManager.get_user_permissions(
+        workflow, get_user_roles(draft.user), step_info.get('step_number', 1)
+    )
+    data = draft.data or {}
+    errors = Form3PermissionManager.validate_user_paths(draft_paths(data), permissions)
+
+    # A signature completes the step, which only a submission may do
+    signature = data
+    for part in (step_info.get('signature_field') or '').split('.'):
+        signature = signature.get(part) if part and isinstance(signature, dict) else None
+    if signature:
+        errors[step_info['signature_field']] = "Submit the form to sign it"
+    return errors or None
+
+
+def flush_draft(draft):
+    """
+    Write a stored draft to its workflow as one form save.
+
+    Returns the permission or validation errors (the draft is kept and
+    marked rejected) or None once the workflow is updated. The draft is
+    deleted unless it was edited meanwhile, in which case it stays for the
+    next flush; a draft discarded meanwhile is not written.
+    """
+    workflow = draft.workflow
+    form_class = FormRegistry.get_form(draft.form_number)
+    if form_class is None:
+        FormDraft.objects.filter(pk=draft.pk).delete()
+        return None
+
+    errors = permission_errors(draft)
+    if not errors:
+        form_data = merge(form_class.extract_from_workflow(workflow), draft.data or {})
+        errors = form_class.validate(form_data)
+    if errors:
+        FormDraft.objects.filter(pk=draft.pk, revision=draft.revision).update(
+            rejected=True, errors=errors, lease_until=None
+        )
+        return errors
+
+    if not FormDraft.objects.filter(pk=draft.pk, revision=draft.revision, discarded_at__isnull=True).exists():
+        FormDraft.objects.filter(pk=draft.pk).update(lease_until=None)
+        return None
+    workflow.update_from_form(draft.form_number, form_data)
+    deleted, _ = FormDraft.objects.filter(pk=draft.pk, revision=draft.revision).delete()
+    if not deleted:
+        FormDraft.objects.filter(pk=draft.pk).update(lease_until=None)
+    return None
+
+
+class DraftBuffer:
+    """
+    Collect autosaved form edits in memory and persist them in batches.
+
+    ``record`` is a dict merge under a lock. Every PERSIST_INTERVAL the merged
+    edits are written to FormDraft (one write per draft, whatever the number
+    of autosaves), and drafts left idle for FLUSH_DELAY are written to their
+    workflow, so the workflow document and audit log see one save per
+    editing burst. Pending edits are persisted at interpreter exit and the
+    stored drafts survive restarts.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._task = PeriodicTask("form-drafts", self.tick, PERSIST_INTERVAL)
+
+    @staticmethod
+    def key(workflow_id, user_id, form_number):
+        return (workflow_id, user_id, int(form_number))
+
+    def record(self, workflow_id, user_id, form_number, partial):
+        key = self.key(workflow_id, user_id, form_number)
+        with self._lock:
+            # (time of the oldest buffered edit, merged edits)
+            merge(self._pending.setdefault(key, (timezone.now(), {}))[1], partial)
+        self._task.ensure_started()
+
+    def discard(self, workflow_id, user_id, form_number):
+        """
+        Drop a draft superseded by an explicit submission. The stored draft
+        becomes a tombstone, so edits other workers buffered before the
+        submission are dropped when they persist instead of recreating it.
+        """
+        key = self.key(workflow_id, user_id, form_number)
+        with self._lock:
+            self._pending.pop(key, None)
+        lookup = {"workflow_id": workflow_id, "user_id": user_id, "form_number": key[2]}
+        now = timezone.now()
+        tombstone = {"data": {}, "rejected": False, "errors": None, "lease_until": None, "discarded_at": now}
+        for _ in range(PERSIST_MAX_ATTEMPTS):
+            if FormDraft.objects.filter(**lookup).update(revision=F("revision") + 1, updated_at=now, **tombstone):
+                return
+            try:
+                FormDraft.objects.create(**lookup, revision=1, **tombstone)
+                return
+            except IntegrityError:
+                continue
+
+    def persist(self, keys=None):
+        """Write buffered edits (all, or only ``keys``) to the draft store"""
+        with self._lock:
+            if keys is None:
+                pending, self._pending = self._pending, {}
+            else:
+                pending = {key: self._pending.pop(key) for key in keys if key in self._pending}
+        for key, (since, partial) in pending.items():
+            try:
+                _persist(key, partial, since)
+            except Exception:
+                logger.exception("Could not persist form draft %s", key)
+                # Keep the edits, under anything recorded since
+                with self._lock:
+                    self._pending[key] = (since, merge(partial, self._pending.get(key, (since, {}))[1]))
+        return len(pending)
+
+    def get(self, workflow_id, user_id, form_number):
+        key = self.key(workflow_id, user_id, form_number)
+        self.persist([key])
+        self._task.ensure_started()
+        return FormDraft.objects.filter(
+            workflow_id=workflow_id, user_id=user_id, form_number=key[2], discarded_at__isnull=True
+        ).first()
+
+    def flush(self, workflow_id=None, user_id=None, form_number=None, idle=None):
+        """
+        Write stored drafts to their workflows; ``idle`` (seconds) limits it
+        to drafts not edited for that long. Returns {draft pk: errors or None}.
+        """
+        self.persist()
+        now = timezone.now()
+        qs = FormDraft.objects.filter(rejected=False, discarded_at__isnull=True).filter(Q(lease_until__isnull=True) | Q(lease_until__lt=now))
+        if workflow_id is not None:
+            qs = qs.filter(workflow_id=workflow_id)
+        if user_id is not None:
+            qs = qs.filter(user_id=user_id)
+        if form_number is not None:
+            qs = qs.filter(form_number=int(form_number))
+        if idle is not None:
+            qs = qs.filter(updated_at__lte=now - timedelta(seconds=idle))
+
+        results = {}
+        for draft in qs.select_related("workflow", "user").order_by("updated_at")[:FLUSH_BATCH]:
+            # Claim it so other workers skip it while it is being written
+            claimed = FormDraft.objects.filter(pk=draft.pk, revision=draft.revision).filter(
+                Q(lease_until__isnull=True) | Q(lease_until__lt=now)
+            ).update(lease_until=now + timedelta(seconds=FLUSH_LEASE))
+            if not claimed:
+                continue
+            try:
+                results[draft.pk] = flush_draft(draft)
+            except Exception:
+                logger.exception("Could not flush form draft %s", draft.pk)
+                FormDraft.objects.filter(pk=draft.pk).update(lease_until=None)
+        return results
+
+    def tick(self):
+        self.persist()
+        self.flush(idle=FLUSH_DELAY)
+        FormDraft.objects.filter(discarded_at__lt=timezone.now() - timedelta(seconds=TOMBSTONE_TTL)).delete()
+
+
+buffer = DraftBuffer()
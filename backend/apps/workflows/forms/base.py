@@ -1,14 +1,27 @@
 # apps/workflows/forms/base.py
 from abc import ABC, abstractmethod
+from functools import lru_cache
 from typing import Dict, Any, Optional
 from datetime import datetime
 from django.core.exceptions import ValidationError
+from .schemas import cached_schema
+from .validation import CompiledSchema, compile_schema
+
+
+@lru_cache(maxsize=None)
+def _compiled_validator(form_class, schema_version) -> CompiledSchema:
+    return compile_schema(cached_schema(form_class).schema)
 
 class BaseWorkflowForm(ABC):
     """Base class for all workflow forms"""
     
     form_number: int
     form_title: str
+    # Bump when get_schema() changes so cached validators are rebuilt
+    schema_version: int = 1
+    # True when map_to_workflow() only strips metadata, so JSON Patch
+    # operations can be applied to workflow.data directly
+    direct_data_mapping: bool = False
     
     @classmethod
     @abstractmethod
@@ -28,20 +41,27 @@ class BaseWorkflowForm(ABC):
         """Map form data to workflow data structure"""
         pass
     
+    @classmethod
+    def get_cached_schema(cls) -> Dict[str, Any]:
+        """get_schema() built once per schema_version; treat as read-only"""
+        return cached_schema(cls).schema
+
+    @classmethod
+    def get_validator(cls) -> CompiledSchema:
+        """Validator compiled from get_schema(), cached per form class and schema_version"""
+        return _compiled_validator(cls, cls.schema_version)
+
     @classmethod
     def validate(cls, form_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Validate form data and return errors"""
-        errors = {}
-        schema = cls.get_schema()
-        
-        # Basic validation logic here
-        # You can extend this with more sophisticated validation
-        
-        return errors
+        """Validate form data and return errors keyed by dotted field path"""
+        return cls.get_validator()(form_data)
     
     @classmethod
     def get_computed_fields(cls, workflow_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Calculate computed/derived fields"""
+        """
+        Calculate computed/derived fields. Keys listed in computed.COMPUTED_FIELDS
+        are materialized on the Workflow each time its data is saved.
+        """
         return {}
 
 
@@ -0,0 +1,35 @@
+# apps/workflows/forms/computed.py
+"""
+Derived workflow fields. Each form's get_computed_fields() hook resolves the
+values it owns from workflow data; the results are stored as top-level
+Workflow columns when data is saved, so reads never walk the JSON aliases.
+"""
+from typing import Any, Dict
+
+from .registry import FormRegistry
+
+# Materialized field -> value used when no form provides one
+COMPUTED_FIELDS: Dict[str, Any] = {
+    "applicant_name": "",
+    "applicant_national_id": "",
+    "property_address": "",
+    "registration_plate_number": "",
+}
+
+
+def compute_fields(workflow_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run every registered form's hook over ``workflow_data``. Forms are asked in
+    form-number order and the first non-empty value wins, so earlier forms
+    (e.g. Form 1's personalInformation) take precedence over later aliases.
+    """
+    values = dict(COMPUTED_FIELDS)
+    resolved = set()
+    for _, form_class in sorted(FormRegistry.get_all_forms().items()):
+        for name, value in form_class.get_computed_fields(workflow_data).items():
+            if name in values and name not in resolved and value:
+                values[name] = value
+                resolved.add(name)
+        if len(resolved) == len(values):
+            break
+    return values
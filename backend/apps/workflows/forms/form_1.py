@@ -9,6 +9,7 @@ class SpecificationsAndDocumentsForm(BaseWorkflowForm):
     
     form_number = 1
     form_title = "Specifications and Document Submission Form"
+    direct_data_mapping = True
     
     @classmethod
     def get_schema(cls) -> Dict[str, Any]:
@@ -130,3 +131,15 @@ class SpecificationsAndDocumentsForm(BaseWorkflowForm):
         
         return workflow_data
 
+    @classmethod
+    def get_computed_fields(cls, workflow_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Applicant and property fields as entered on Form 1"""
+        personal_info = workflow_data.get("personalInformation") or {}
+        first = personal_info.get("firstName") or ""
+        last = personal_info.get("lastName") or ""
+        return {
+            "applicant_name": f"{first} {last}".strip(),
+            "applicant_national_id": personal_info.get("nationalCode"),
+            "property_address": personal_info.get("residenceAddress"),
+            "registration_plate_number": workflow_data.get("propertyRegistrationPlateNumber"),
+        }
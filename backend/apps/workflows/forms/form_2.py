@@ -125,4 +125,16 @@ class ClientUndertakingForm(BaseWorkflowForm):
         if form_data.get("agreement"):
             workflow_data["agreement"] = form_data["agreement"]
         
-        return workflow_data
\ No newline at end of file
+        return workflow_data
+
+    @classmethod
+    def get_computed_fields(cls, workflow_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Fallbacks from the undertaking's applicant and property details"""
+        applicant_details = workflow_data.get("applicantDetails") or {}
+        property_details = workflow_data.get("propertyDetails") or {}
+        return {
+            "applicant_name": applicant_details.get("name"),
+            "applicant_national_id": applicant_details.get("nationalCode"),
+            "property_address": property_details.get("address"),
+            "registration_plate_number": property_details.get("registrationPlateNumber"),
+        }
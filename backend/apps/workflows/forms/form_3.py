@@ -9,6 +9,7 @@ class PropertyStatusReviewForm(BaseWorkflowForm):
     
     form_number = 3
     form_title = "Property Status Review"
+    direct_data_mapping = True
     
     # Define the approval chain steps
     APPROVAL_STEPS = {
@@ -207,10 +208,17 @@ class PropertyStatusReviewForm(BaseWorkflowForm):
         """Determine which sections are editable for the given user role"""
         from .form_3_permissions import Form3PermissionManager
         
+        return cls.get_user_editable_sections(workflow, [user_role])
+
+    @classmethod
+    def get_user_editable_sections(cls, workflow, user_roles) -> Dict[str, bool]:
+        """Sections editable by any of ``user_roles`` in the current step (one table lookup)"""
+        from .form_3_permissions import Form3PermissionManager
+        
         current_step = cls.get_current_step_info(workflow).get('step_number', 1)
-        permissions = Form3PermissionManager.get_user_permissions(workflow, [user_role], current_step)
+        permissions = Form3PermissionManager.get_user_permissions(workflow, user_roles, current_step)
         
-        return permissions.get('editable_sections', {})
+        return dict(permissions['editable_sections'])
     
     @classmethod
     def is_step_completed(cls, workflow, step_number) -> bool:
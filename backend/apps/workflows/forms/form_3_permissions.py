@@ -1,5 +1,6 @@
 # apps/workflows/forms/form_3_permissions.py
-from typing import Dict, List, Any
+from types import MappingProxyType
+from typing import Dict, List, Any, Iterable
 
 class Form3PermissionManager:
     """Manage permissions and visibility for Form3 sections"""
@@ -81,9 +82,17 @@ class Form3PermissionManager:
         }
     }
     
+    BASIC_INFO_FIELDS = ('requestNumber', 'requestDate', 'clientName')
+    METADATA_FIELDS = ('formTitle', 'formNumber')
+
+    # Filled by _compile_permission_table() when the module is imported
+    ROLE_BITS: Dict[str, int] = {}
+    STEPS: frozenset = frozenset()
+    _TABLE: Dict[tuple, Any] = {}
+
     @classmethod
-    def get_user_permissions(cls, workflow, user_roles: List[str], current_step: int) -> Dict[str, Any]:
-        """Get comprehensive permissions for user in Form3"""
+    def _build_permissions(cls, user_roles: Iterable[str], current_step: int) -> Dict[str, Any]:
+        """Evaluate the rules for one (role set, step); used only to build the table"""
         permissions = {
             'visible_sections': [],
             'editable_sections': {},
@@ -111,8 +120,63 @@ class Form3PermissionManager:
                     # User can act in current step
                     permissions['can_act_in_current_step'] = True
                     permissions['next_action'] = cls._get_next_action(current_step)
-        
-        return permissions
+
+        # Freeze, and precompute the projections used per request
+        visible_keys = list(cls.METADATA_FIELDS)
+        section_keys = []
+        for section in permissions['visible_sections']:
+            if section == 'basic_info':
+                visible_keys.extend(cls.BASIC_INFO_FIELDS)
+            else:
+                section_keys.append(section)
+
+        return MappingProxyType({
+            'visible_sections': tuple(permissions['visible_sections']),
+            'editable_sections': MappingProxyType(permissions['editable_sections']),
+            'editable_fields': MappingProxyType({
+                section: frozenset(fields) for section, fields in permissions['editable_fields'].items()
+            }),
+            'can_act_in_current_step': permissions['can_act_in_current_step'],
+            'next_action': MappingProxyType(permissions['next_action']) if permissions['next_action'] else None,
+            'visible_keys': tuple(visible_keys),
+            'section_keys': tuple(section_keys),
+        })
+
+    @classmethod
+    def _compile_permission_table(cls) -> None:
+        """
+        Precompute permissions for every (role bitmask, step).
+
+        Only roles named in SECTION_VISIBILITY affect the result, so a user's
+        role set reduces to a bitmask over them; steps without editing rules
+        share the step-0 entry.
+        """
+        roles = sorted({
+            role
+            for rules in cls.SECTION_VISIBILITY.values()
+            for role in rules['visible_to'] + [r for step_roles in rules['editable_by_step'].values() for r in step_roles]
+        })
+        cls.ROLE_BITS = {role: 1 << index for index, role in enumerate(roles)}
+        cls.STEPS = frozenset(
+            step for rules in cls.SECTION_VISIBILITY.values() for step in rules['editable_by_step']
+        )
+        cls._TABLE = {
+            (mask, step): cls._build_permissions([role for role, bit in cls.ROLE_BITS.items() if mask & bit], step)
+            for mask in range(1 << len(roles))
+            for step in cls.STEPS | {0}
+        }
+
+    @classmethod
+    def role_mask(cls, user_roles: Iterable[str]) -> int:
+        mask = 0
+        for role in user_roles:
+            mask |= cls.ROLE_BITS.get(role, 0)
+        return mask
+
+    @classmethod
+    def get_user_permissions(cls, workflow, user_roles: List[str], current_step: int) -> Dict[str, Any]:
+        """Get comprehensive permissions for user in Form3 (read-only table entry)"""
+        return cls._TABLE[(cls.role_mask(user_roles), current_step if current_step in cls.STEPS else 0)]
     
     @classmethod
     def _get_editable_fields(cls, section: str, step: int) -> List[str]:
@@ -138,56 +202,65 @@ class Form3PermissionManager:
     @classmethod
     def filter_form_data_for_user(cls, form_data: Dict[str, Any], user_permissions: Dict[str, Any]) -> Dict[str, Any]:
         """Filter form data based on user permissions"""
-        filtered_data = {}
-        
-        # Include basic form metadata
-        filtered_data.update({
-            "formTitle": form_data.get("formTitle"),
-            "formNumber": form_data.get("formNumber")
-        })
-        
-        # Include visible sections
-        for section in user_permissions['visible_sections']:
-            if section == 'basic_info':
-                # Handle basic info fields
-                filtered_data.update({
-                    "requestNumber": form_data.get("requestNumber"),
-                    "requestDate": form_data.get("requestDate"),
-                    "clientName": form_data.get("clientName")
-                })
-            else:
-                # Handle structured sections
-                if section in form_data:
-                    filtered_data[section] = form_data[section]
-        
+        filtered_data = {key: form_data.get(key) for key in user_permissions['visible_keys']}
+        for section in user_permissions['section_keys']:
+            if section in form_data:
+                filtered_data[section] = form_data[section]
         return filtered_data
     
     @classmethod
     def validate_user_form_submission(cls, form_data: Dict[str, Any], user_permissions: Dict[str, Any]) -> Dict[str, Any]:
         """Validate that user is only submitting data they have permission to edit"""
         errors = {}
+        editable_sections = user_permissions['editable_sections']
+        editable_fields = user_permissions['editable_fields']
         
-        # Check if user is trying to edit sections they don't have permission for
         for section, data in form_data.items():
-            if section in ['formTitle', 'formNumber']:
+            if section in cls.METADATA_FIELDS:
                 continue  # Skip metadata
                 
             if section == 'basic_info':
-                # Handle basic info validation
-                if not user_permissions['editable_sections'].get('basic_info', False):
-                    if any(form_data.get(field) for field in ['requestNumber', 'requestDate', 'clientName']):
+                if not editable_sections.get('basic_info', False):
+                    if any(form_data.get(field) for field in cls.BASIC_INFO_FIELDS):
                         errors['basic_info'] = "\u0634\u0645\u0627 \u0645\u062c\u0627\u0632 \u0628\u0647 \u0648\u06cc\u0631\u0627\u06cc\u0634 \u0627\u0637\u0644\u0627\u0639\u0627\u062a \u067e\u0627\u06cc\u0647 \u0646\u06cc\u0633\u062a\u06cc\u062f"
+            elif section not in editable_sections:
+                if data:  # If there's any data being submitted for this section
+                    errors[section] = f"\u0634\u0645\u0627 \u0645\u062c\u0627\u0632 \u0628\u0647 \u0648\u06cc\u0631\u0627\u06cc\u0634 \u0628\u062e\u0634 {section} \u0646\u06cc\u0633\u062a\u06cc\u062f"
             else:
-                # Handle structured sections
-                if section not in user_permissions['editable_sections']:
-                    if data:  # If there's any data being submitted for this section
-                        errors[section] = f"\u0634\u0645\u0627 \u0645\u062c\u0627\u0632 \u0628\u0647 \u0648\u06cc\u0631\u0627\u06cc\u0634 \u0628\u062e\u0634 {section} \u0646\u06cc\u0633\u062a\u06cc\u062f"
-                else:
-                    # Check field-level permissions
-                    allowed_fields = user_permissions['editable_fields'].get(section, [])
-                    if allowed_fields:  # If there are specific field restrictions
-                        for field, value in data.items():
-                            if field not in allowed_fields and value:
-                                errors[f"{section}.{field}"] = f"\u0634\u0645\u0627 \u0645\u062c\u0627\u0632 \u0628\u0647 \u0648\u06cc\u0631\u0627\u06cc\u0634 \u0641\u06cc\u0644\u062f {field} \u0646\u06cc\u0633\u062a\u06cc\u062f"
+                # Check field-level permissions
+                allowed_fields = editable_fields.get(section)
+                if allowed_fields:  # If there are specific field restrictions
+                    for field, value in data.items():
+                        if field not in allowed_fields and value:
+                            errors[f"{section}.{field}"] = f"\u0634\u0645\u0627 \u0645\u062c\u0627\u0632 \u0628\u0647 \u0648\u06cc\u0631\u0627\u06cc\u0634 \u0641\u06cc\u0644\u062f {field} \u0646\u06cc\u0633\u062a\u06cc\u062f"
         
-        return errors
\ No newline at end of file
+        return errors
+
+    @classmethod
+    def validate_user_paths(cls, paths, user_permissions: Dict[str, Any]) -> Dict[str, Any]:
+        """Like validate_user_form_submission, for the token paths a JSON Patch writes"""
+        errors = {}
+        editable_sections = user_permissions['editable_sections']
+        editable_fields = user_permissions['editable_fields']
+
+        for tokens in paths:
+            path = ".".join(tokens)
+            top = tokens[0]
+            if top in cls.METADATA_FIELDS:
+                errors[path] = "\u0641\u06cc\u0644\u062f\u0647\u0627\u06cc \u0633\u06cc\u0633\u062a\u0645\u06cc \u0641\u0631\u0645 \u0642\u0627\u0628\u0644 \u0648\u06cc\u0631\u0627\u06cc\u0634 \u0646\u06cc\u0633\u062a\u0646\u062f"
+            elif top in cls.BASIC_INFO_FIELDS:
+                if not editable_sections.get('basic_info', False):
+                    errors[path] = "\u0634\u0645\u0627 \u0645\u062c\u0627\u0632 \u0628\u0647 \u0648\u06cc\u0631\u0627\u06cc\u0634 \u0627\u0637\u0644\u0627\u0639\u0627\u062a \u067e\u0627\u06cc\u0647 \u0646\u06cc\u0633\u062a\u06cc\u062f"
+            elif top not in editable_sections:
+                errors[path] = f"\u0634\u0645\u0627 \u0645\u062c\u0627\u0632 \u0628\u0647 \u0648\u06cc\u0631\u0627\u06cc\u0634 \u0628\u062e\u0634 {top} \u0646\u06cc\u0633\u062a\u06cc\u062f"
+            else:
+                allowed_fields = editable_fields.get(top)
+                # A field-restricted section cannot be replaced wholesale
+                if allowed_fields and (len(tokens) < 2 or tokens[1] not in allowed_fields):
+                    field = tokens[1] if len(tokens) > 1 else top
+                    errors[path] = f"\u0634\u0645\u0627 \u0645\u062c\u0627\u0632 \u0628\u0647 \u0648\u06cc\u0631\u0627\u06cc\u0634 \u0641\u06cc\u0644\u062f {field} \u0646\u06cc\u0633\u062a\u06cc\u062f"
+
+        return errors
+
+
+Form3PermissionManager._compile_permission_table()
@@ -0,0 +1,173 @@
+# apps/workflows/forms/patch.py
+"""
+Minimal RFC 6902 (JSON Patch) support for partial form submissions.
+
+Operations are applied in order to a plain dict/list document; a failing
+operation raises PatchError and the caller discards the partially patched
+copy. Paths are RFC 6901 JSON pointers.
+"""
+import copy
+from typing import Any, Dict, List, Tuple
+
+OPS = ("add", "remove", "replace", "move", "copy", "test")
+MAX_OPERATIONS = 200
+
+
+class PatchError(ValueError):
+    def __init__(self, message: str, index: int = None, path: str = None):
+        super().__init__(message)
+        self.index = index
+        self.path = path
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"index": self.index, "path": self.path, "message": str(self)}
+
+
+class PatchTestFailed(PatchError):
+    """A ``test`` operation did not match; the client's view of the form is stale"""
+
+
+def parse_pointer(pointer: str) -> Tuple[str, ...]:
+    if pointer == "":
+        return ()
+    if not isinstance(pointer, str) or not pointer.startswith("/"):
+        raise PatchError(f"Invalid JSON pointer: {pointer!r}")
+    return tuple(token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/"))
+
+
+def parse_operations(operations) -> List[Dict[str, Any]]:
+    """Check the shape of a patch document and pre-parse its pointers"""
+    if not isinstance(operations, list) or not operations:
+        raise PatchError("A JSON Patch must be a non-empty array of operations")
+    if len(operations) > MAX_OPERATIONS:
+        raise PatchError(f"At most {MAX_OPERATIONS} operations are allowed per patch")
+
+    parsed = []
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or operation.get("op") not in OPS:
+            raise PatchError(f"Unsupported operation; expected one of {', '.join(OPS)}", index)
+        path = operation.get("path")
+        try:
+            tokens = parse_pointer(path)
+            source = parse_pointer(operation["from"]) if operation["op"] in ("move", "copy") else None
+        except KeyError:
+            raise PatchError("'from' is required", index, path)
+        except PatchError as e:
+            raise PatchError(str(e), index, path)
+        if operation["op"] in ("add", "replace", "test") and "value" not in operation:
+            raise PatchError("'value' is required", index, path)
+        if not tokens:
+            raise PatchError("Replacing the whole document is not allowed; use POST", index, path)
+        parsed.append({**operation, "tokens": tokens, "from_tokens": source, "index": index})
+    return parsed
+
+
+def _array_index(container: list, token: str, allow_end: bool) -> int:
+    if token == "-" and allow_end:
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token.startswith("0")):
+        raise PatchError(f"Invalid array index {token!r}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise PatchError(f"Array index {index} out of range")
+    return index
+
+
+def _parent(doc, tokens):
+    target = doc
+    for token in tokens[:-1]:
+        if isinstance(target, dict):
+            if token not in target:
+                raise PatchError(f"Path segment {token!r} does not exist")
+            target = target[token]
+        elif isinstance(target, list):
+            target = target[_array_index(target, token, allow_end=False)]
+        else:
+            raise PatchError(f"Cannot descend into {type(target).__name__} at {token!r}")
+    return target
+
+
+def _get(doc, tokens):
+    parent = _parent(doc, tokens)
+    key = tokens[-1]
+    if isinstance(parent, dict):
+        if key not in parent:
+            raise PatchError(f"Path segment {key!r} does not exist")
+        return parent[key]
+    if isinstance(parent, list):
+        return parent[_array_index(parent, key, allow_end=False)]
+    raise PatchError(f"Cannot read from {type(parent).__name__}")
+
+
+def _add(doc, tokens, value):
+    parent = _parent(doc, tokens)
+    key = tokens[-1]
+    if isinstance(parent, dict):
+        parent[key] = value
+    elif isinstance(parent, list):
+        parent.insert(_array_index(parent, key, allow_end=True), value)
+    else:
+        raise PatchError(f"Cannot add to {type(parent).__name__}")
+
+
+def _remove(doc, tokens):
+    parent = _parent(doc, tokens)
+    key = tokens[-1]
+    if isinstance(parent, dict):
+        if key not in parent:
+            raise PatchError(f"Path segment {key!r} does not exist")
+        return parent.pop(key)
+    if isinstance(parent, list):
+        return parent.pop(_array_index(parent, key, allow_end=False))
+    raise PatchError(f"Cannot remove from {type(parent).__name__}")
+
+
+def apply_operations(doc: Dict[str, Any], operations: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Apply pre-parsed operations to ``doc`` in place and return it"""
+    for operation in operations:
+        op, tokens = operation["op"], operation["tokens"]
+        try:
+            if op == "add":
+                _add(doc, tokens, copy.deepcopy(operation["value"]))
+            elif op == "remove":
+                _remove(doc, tokens)
+            elif op == "replace":
+                _get(doc, tokens)
+                parent = _parent(doc, tokens)
+                if isinstance(parent, list):
+                    parent[_array_index(parent, tokens[-1], allow_end=False)] = copy.deepcopy(operation["value"])
+                else:
+                    parent[tokens[-1]] = copy.deepcopy(operation["value"])
+            elif op == "move":
+                source = operation["from_tokens"]
+                if tokens[:len(source)] == source and tokens != source:
+                    raise PatchError("Cannot move a value into one of its children")
+                _add(doc, tokens, _remove(doc, source))
+            elif op == "copy":
+                _add(doc, tokens, copy.deepcopy(_get(doc, operation["from_tokens"])))
+            elif op == "test":
+                if _get(doc, tokens) != operation["value"]:
+                    raise PatchTestFailed("Test failed")
+        except PatchError as e:
+            raise type(e)(str(e), operation["index"], operation.get("path"))
+    return doc
+
+
+def resolve(doc, tokens, default=None):
+    """Value at ``tokens``, or ``default`` when the path does not exist"""
+    try:
+        return _get(doc, tokens)
+    except PatchError:
+        return default
+
+
+def touched_paths(operations: List[Dict[str, Any]]) -> List[Tuple[str, ...]]:
+    """Token paths written by the patch (``test`` only reads, ``move`` also removes its source)"""
+    paths = []
+    for operation in operations:
+        if operation["op"] == "test":
+            continue
+        paths.append(operation["tokens"])
+        if operation["op"] == "move":
+            paths.append(operation["from_tokens"])
+    return paths
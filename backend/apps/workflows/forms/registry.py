@@ -27,7 +27,7 @@ class FormRegistry:
     def get_form_schema(cls, form_number: int) -> Optional[Dict[str, Any]]:
         """Get form schema by number"""
         form_class = cls.get_form(form_number)
-        return form_class.get_schema() if form_class else None
+        return form_class.get_cached_schema() if form_class else None
 
 
 # Decorator for easy registration
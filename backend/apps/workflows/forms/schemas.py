@@ -0,0 +1,63 @@
+# apps/workflows/forms/schemas.py
+"""
+Form schemas built, serialized and hashed once per process.
+
+Schemas only change on deploy, so each form's ``get_schema()`` result is
+cached together with its JSON encoding and a content-hash ETag keyed by
+(form class, schema_version). Callers must treat the cached dicts as
+read-only.
+"""
+import hashlib
+import json
+from functools import lru_cache
+from typing import Any, Dict, NamedTuple
+
+
+class CachedSchema(NamedTuple):
+    schema: Dict[str, Any]
+    body: bytes
+    etag: str
+
+
+def _encode(value) -> bytes:
+    # Same shape DRF's JSONRenderer produces (compact, unescaped unicode)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _etag(body: bytes) -> str:
+    return '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+
+
+@lru_cache(maxsize=None)
+def _build(form_class, schema_version) -> CachedSchema:
+    schema = form_class.get_schema()
+    body = _encode(schema)
+    return CachedSchema(schema, body, _etag(body))
+
+
+def cached_schema(form_class) -> CachedSchema:
+    return _build(form_class, form_class.schema_version)
+
+
+@lru_cache(maxsize=4)
+def _build_metadata(forms) -> CachedSchema:
+    metadata = {
+        str(form_number): {
+            "form_number": form_number,
+            "form_title": form_class.form_title,
+            "schema_etag": cached_schema(form_class).etag,
+            "schema": cached_schema(form_class).schema,
+        }
+        for form_number, form_class, _ in forms
+    }
+    body = _encode(metadata)
+    return CachedSchema(metadata, body, _etag(body))
+
+
+def cached_forms_metadata(registered: Dict[int, Any]) -> CachedSchema:
+    """The forms_metadata payload for ``{form_number: form_class}``"""
+    forms = tuple(
+        (number, form_class, form_class.schema_version)
+        for number, form_class in sorted(registered.items())
+    )
+    return _build_metadata(forms)
@@ -0,0 +1,230 @@
+# apps/workflows/forms/validation.py
+"""
+Compiles the JSON-schema subset used by the workflow forms into plain
+Python closures, once per schema, so validating a submission is a walk
+over pre-built checks with no schema interpretation at request time.
+
+Supported keywords: type, properties, required, items, enum, pattern,
+minLength, maxLength, minimum, maximum, format (date, date-time) and
+additionalProperties (boolean). Values that are None, "" or {} count as
+absent, so partially filled forms (autosave) only fail on what they contain.
+"""
+import re
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List
+
+Errors = Dict[str, List[str]]
+Check = Callable[[Any, str, Errors], None]
+
+_TYPE_CHECKS = {
+    "string": lambda v: isinstance(v, str),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "null": lambda v: v is None,
+}
+
+
+def _is_date(value: str) -> bool:
+    try:
+        date.fromisoformat(value)
+        return True
+    except ValueError:
+        return False
+
+
+def _is_datetime(value: str) -> bool:
+    try:
+        datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return True
+    except ValueError:
+        return False
+
+
+_FORMAT_CHECKS = {
+    "date": _is_date,
+    "date-time": _is_datetime,
+}
+
+
+def is_absent(value) -> bool:
+    return value is None or value == "" or value == {}
+
+
+def _add(errors: Errors, path: str, message: str) -> None:
+    errors.setdefault(path or "__root__", []).append(message)
+
+
+def _join(path: str, key) -> str:
+    return f"{path}.{key}" if path else str(key)
+
+
+def _compile(schema: Dict[str, Any]) -> Check:
+    checks: List[Check] = []
+
+    expected = schema.get("type")
+    if expected:
+        types = [expected] if isinstance(expected, str) else list(expected)
+        type_checks = [_TYPE_CHECKS[t] for t in types if t in _TYPE_CHECKS]
+        label = " or ".join(types)
+        if type_checks:
+            def check_type(value, path, errors, type_checks=type_checks, label=label):
+                if not any(check(value) for check in type_checks):
+                    _add(errors, path, f"Expected {label}.")
+                    return False
+                return True
+        else:
+            check_type = None
+    else:
+        check_type = None
+
+    if "enum" in schema:
+        allowed = list(schema["enum"])
+        allowed_text = ", ".join(map(str, allowed))
+
+        def check_enum(value, path, errors):
+            if value not in allowed:
+                _add(errors, path, f"Must be one of: {allowed_text}.")
+        checks.append(check_enum)
+
+    if "pattern" in schema:
+        regex = re.compile(schema["pattern"])
+
+        def check_pattern(value, path, errors):
+            if isinstance(value, str) and not regex.search(value):
+                _add(errors, path, "Invalid format.")
+        checks.append(check_pattern)
+
+    if "maxLength" in schema:
+        max_length = schema["maxLength"]
+
+        def check_max_length(value, path, errors):
+            if isinstance(value, str) and len(value) > max_length:
+                _add(errors, path, f"Ensure this field has no more than {max_length} characters.")
+        checks.append(check_max_length)
+
+    if "minLength" in schema:
+        min_length = schema["minLength"]
+
+        def check_min_length(value, path, errors):
+            if isinstance(value, str) and len(value) < min_length:
+                _add(errors, path, f"Ensure this field has at least {min_length} characters.")
+        checks.append(check_min_length)
+
+    if "minimum" in schema:
+        minimum = schema["minimum"]
+
+        def check_minimum(value, path, errors):
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and value < minimum:
+                _add(errors, path, f"Ensure this value is greater than or equal to {minimum}.")
+        checks.append(check_minimum)
+
+    if "maximum" in schema:
+        maximum = schema["maximum"]
+
+        def check_maximum(value, path, errors):
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and value > maximum:
+                _add(errors, path, f"Ensure this value is less than or equal to {maximum}.")
+        checks.append(check_maximum)
+
+    format_check = _FORMAT_CHECKS.get(schema.get("format"))
+    if format_check:
+        format_name = schema["format"]
+
+        def check_format(value, path, errors):
+            if isinstance(value, str) and not format_check(value):
+                _add(errors, path, f"Expected a valid {format_name}.")
+        checks.append(check_format)
+
+    properties = {name: _compile(sub) for name, sub in schema.get("properties", {}).items()}
+    required = tuple(schema.get("required", ()))
+    additional = schema.get("additionalProperties", True)
+    if properties or required or additional is False:
+        def check_object(value, path, errors):
+            if not isinstance(value, dict):
+                return
+            for name in required:
+                if is_absent(value.get(name)):
+                    _add(errors, _join(path, name), "This field is required.")
+            for name, item in value.items():
+                validate_property = properties.get(name)
+                if validate_property is not None:
+                    validate_property(item, _join(path, name), errors)
+                elif additional is False:
+                    _add(errors, _join(path, name), "Unknown field.")
+        checks.append(check_object)
+
+    if isinstance(schema.get("items"), dict):
+        validate_item = _compile(schema["items"])
+
+        def check_items(value, path, errors):
+            if isinstance(value, list):
+                for index, item in enumerate(value):
+                    validate_item(item, _join(path, index), errors)
+        checks.append(check_items)
+
+    def validate(value, path, errors):
+        if is_absent(value):
+            return
+        if check_type is not None and not check_type(value, path, errors):
+            return
+        for check in checks:
+            check(value, path, errors)
+
+    return validate
+
+
+class CompiledSchema:
+    """Callable validator built from a form schema"""
+
+    def __init__(self, schema: Dict[str, Any]):
+        self._schema = schema
+        self._validate = _compile(schema)
+        self._subvalidators: Dict[tuple, Any] = {}
+
+    def __call__(self, data) -> Errors:
+        """Return ``{"dotted.field.path": [messages]}``; empty when valid"""
+        errors: Errors = {}
+        self._validate(data, "", errors)
+        return errors
+
+    def _subschema(self, tokens):
+        schema = self._schema
+        for token in tokens:
+            if token in schema.get("properties", {}):
+                schema = schema["properties"][token]
+            elif token == "*" and isinstance(schema.get("items"), dict):
+                schema = schema["items"]
+            else:
+                return None
+        return schema
+
+    def validate_at(self, tokens, value) -> Errors:
+        """
+        Validate ``value`` as if stored at ``tokens`` (a path of keys / array
+        indexes), with the checks compiled once per schema location.
+        """
+        key = tuple("*" if token.isdigit() or token == "-" else token for token in tokens)
+        if key not in self._subvalidators:
+            subschema = self._subschema(key)
+            self._subvalidators[key] = _compile(subschema) if subschema is not None else None
+
+        errors: Errors = {}
+        validate = self._subvalidators[key]
+        path = ".".join(tokens)
+        if validate is not None:
+            validate(value, path, errors)
+
+        parent = self._subschema(key[:-1]) if key else None
+        if parent is not None:
+            if is_absent(value) and key[-1] in parent.get("required", ()):
+                _add(errors, path, "This field is required.")
+            elif validate is None and parent.get("additionalProperties", True) is False:
+                _add(errors, path, "Unknown field.")
+        return errors
+
+
+def compile_schema(schema: Dict[str, Any]) -> CompiledSchema:
+    return CompiledSchema(schema)
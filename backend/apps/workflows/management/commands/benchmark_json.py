@@ -0,0 +1,114 @@
+# apps/workflows/management/commands/benchmark_json.py
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from bson import ObjectId
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from workflow_engine.encoders import MongoJSONRenderer, OrjsonParser, OrjsonRenderer, orjson
+
+FIRST_NAMES = ["علی", "محمد", "فاطمه", "زهرا", "حسین", "مریم", "رضا", "سارا"]
+LAST_NAMES = ["احمدی", "محمدی", "رضایی", "حسینی", "کریمی", "موسوی"]
+
+
+def _workflow_payload(i: int) -> dict:
+    """Roughly what the workflow list/detail endpoints return for one workflow"""
+    now = timezone.now() - timedelta(hours=i)
+    first, last = random.choice(FIRST_NAMES), random.choice(LAST_NAMES)
+    return {
+        "id": ObjectId(),
+        "title": f"درخواست ارزیابی ملک شماره {i}",
+        "body": "متن درخواست متقاضی برای بررسی وضعیت ملک و ارزیابی " * 3,
+        "state": "Form3",
+        "created_by": "lc_contracts",
+        "created_at": now,
+        "updated_at": now + timedelta(minutes=5),
+        "applicant_name": f"{first} {last}",
+        "applicant_national_id": f"{random.randint(0, 9999999999):010d}",
+        "appraisal_fee": Decimal("12500000.00"),
+        "can_approve": bool(i % 2),
+        "data": {
+            "personalInformation": {
+                "firstName": first,
+                "lastName": last,
+                "nationalCode": "0012345678",
+                "residenceAddress": "تهران، خیابان ولیعصر، کوچه بهار، پلاک ۱۲",
+            },
+            "legalDeputyReport": {
+                "ownerName": f"{first} {last}",
+                "hasLegalIssues": False,
+                "description": "ملک فاقد مشکل حقوقی است. " * 5,
+            },
+            "submittedDocuments": {f"doc{n}": n % 3 != 0 for n in range(12)},
+        },
+        "attachments": [
+            {
+                "id": ObjectId(),
+                "name": f"سند مالکیت {n}.pdf",
+                "uploaded_at": now,
+                "url": f"/api/attachments/open/?t={ObjectId()}:{ObjectId()}",
+            }
+            for n in range(4)
+        ],
+        "comments": [
+            {"id": ObjectId(), "text": "لطفاً مدارک تکمیلی ارسال شود.", "author": "re_manager", "created_at": now}
+            for _ in range(3)
+        ],
+    }
+
+
+def _timeit(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+class Command(BaseCommand):
+    help = "Compare the orjson renderer/parser with the stdlib MongoJSONRenderer on workflow payloads."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=200, help="Workflows per payload.")
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--from-db", action="store_true", help="Serialize real workflows instead of synthetic ones.")
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING("orjson is not installed; OrjsonRenderer falls back to the stdlib path."))
+
+        if options["from_db"]:
+            from apps.workflows.api.serializers import WorkflowSerializer
+            from apps.workflows.models import Workflow
+            workflows = Workflow.objects.order_by("-created_at")[:options["count"]]
+            payload = {"results": WorkflowSerializer(workflows, many=True).data}
+        else:
+            payload = {"count": options["count"], "results": [_workflow_payload(i) for i in range(options["count"])]}
+
+        stdlib, fast = MongoJSONRenderer(), OrjsonRenderer()
+        body = stdlib.render(payload)
+        if fast.render(payload) != body:
+            self.stdout.write(self.style.WARNING("Outputs differ; compare them before switching renderers."))
+
+        repeat = max(options["repeat"], 1)
+        rows = [
+            ("render", _timeit(lambda: stdlib.render(payload), repeat), _timeit(lambda: fast.render(payload), repeat)),
+        ]
+        if orjson is not None:
+            import io
+            import json
+            rows.append((
+                "parse",
+                _timeit(lambda: json.loads(body), repeat),
+                _timeit(lambda: OrjsonParser().parse(io.BytesIO(body)), repeat),
+            ))
+
+        self.stdout.write(f"Payload: {len(body) / 1024:.1f} KiB, {options['count']} workflows, best of {repeat}")
+        for name, slow, quick in rows:
+            self.stdout.write(
+                f"{name:>6}: stdlib {slow * 1000:8.2f} ms   orjson {quick * 1000:8.2f} ms   x{slow / quick:.1f}"
+            )
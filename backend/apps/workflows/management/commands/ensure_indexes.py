@@ -0,0 +1,189 @@
+# apps/workflows/management/commands/ensure_indexes.py
+from bson import ObjectId, json_util
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import UniqueConstraint
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+# The project's apps have no migrations, so nothing else creates their indexes
+INDEXED_APPS = ("workflows", "accounts", "wf_admin")
+
+
+def declared_indexes(model) -> list:
+    """
+    The indexes a model declares, as pymongo IndexModels: Meta.indexes,
+    unique_together, unconditional UniqueConstraints, unique fields (partial
+    on non-null values when nullable) and db_index fields (foreign keys
+    included) that no compound index already starts with. Of two declarations with the same keys the unique one wins:
+    MongoDB allows one index per key pattern.
+    """
+    opts = model._meta
+
+    def keys(fields):
+        return [
+            (opts.get_field(name.lstrip("-")).column, DESCENDING if name.startswith("-") else ASCENDING)
+            for name in fields
+        ]
+
+    declared = [IndexModel(keys(index.fields), name=index.name) for index in opts.indexes if index.fields]
+    unique_sets = list(opts.unique_together) + [
+        c.fields for c in opts.constraints
+        if isinstance(c, UniqueConstraint) and c.fields and c.condition is None
+    ]
+    declared += [IndexModel(keys(fields), unique=True) for fields in unique_sets]
+
+    prefixes = {next(iter(index.document["key"])) for index in declared}
+    for field in opts.local_concrete_fields:
+        if field.primary_key:
+            continue
+        if field.unique:
+            # Like the backend's own unique indexes: nulls do not collide
+            partial = {"partialFilterExpression": {field.column: {"$type": field.db_type(connection)}}} if field.null else {}
+            declared.append(IndexModel([(field.column, ASCENDING)], unique=True, **partial))
+        elif field.db_index and field.column not in prefixes:
+            declared.append(IndexModel([(field.column, ASCENDING)]))
+
+    by_key = {}
+    for index in declared:
+        key = _key(index.document["key"])
+        if key not in by_key or index.document.get("unique"):
+            by_key[key] = index
+    return list(by_key.values())
+
+
+def _key(spec) -> tuple:
+    return tuple((name, int(direction)) for name, direction in spec.items())
+
+
+def hot_queries():
+    """(label, queryset) for the queries every page load depends on"""
+    from apps.accounts.models import Membership
+    from apps.admin.models import SystemLog
+    from apps.workflows.models import Action, Attachment, Comment, FormDraft, Workflow
+    from apps.workflows.workflow_spec import OPEN_STATES
+
+    some_id = ObjectId()
+    approve = Action.ActionType.APPROVE
+    return [
+        ("workflow list", Workflow.objects.order_by("-created_at")[:20]),
+        ("workflow list ?state=", Workflow.objects.filter(state="Form1").order_by("-created_at")[:20]),
+        ("workflow list ?created_by=", Workflow.objects.filter(created_by_id=some_id).order_by("-created_at")[:20]),
+        ("workflow list ?applicant_national_id=", Workflow.objects.filter(applicant_national_id="0000000000")),
+        ("inbox", Workflow.objects.filter(state__in=OPEN_STATES)),
+        ("current_step", Action.objects.filter(workflow_id=some_id, state="Form1", action_type=approve)),
+        ("current_steps", Action.objects.filter(workflow_id__in=[some_id], action_type=approve)),
+        ("workflow actions", Action.objects.filter(workflow_id=some_id).order_by("-created_at")),
+        ("workflow attachments", Attachment.objects.filter(workflow_id=some_id).order_by("uploaded_at")),
+        ("workflow comments", Comment.objects.filter(workflow_id=some_id).order_by("created_at")),
+        ("form draft", FormDraft.objects.filter(workflow_id=some_id, user_id=some_id, form_number=1)),
+        ("user's form drafts", FormDraft.objects.filter(user_id=some_id)),
+        ("user memberships", Membership.objects.filter(user_id=some_id)),
+        ("system logs", SystemLog.objects.order_by("-created_at")[:50]),
+        ("system logs ?level=", SystemLog.objects.filter(level="ERROR").order_by("-created_at")[:50]),
+    ]
+
+
+def winning_plan_stages(explain) -> list:
+    """``[(stage, index name or None), ...]`` of every winning plan in an explain document"""
+    stages = []
+
+    def walk(node, in_plan):
+        if isinstance(node, dict):
+            if in_plan and "stage" in node:
+                stages.append((node["stage"], node.get("indexName")))
+            for key, value in node.items():
+                if key not in ("rejectedPlans", "allPlansExecution"):
+                    walk(value, in_plan or key == "winningPlan")
+        elif isinstance(node, list):
+            for value in node:
+                walk(value, in_plan)
+
+    walk(explain, False)
+    return stages
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the indexes the models declare, then explain the hot queries "
+        "(list filters, inbox, current_step, logs...) and fail on any collection scan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report the indexes that are missing.")
+        parser.add_argument("--skip-explain", action="store_true", help="Do not audit the query plans.")
+        parser.add_argument("--explain-only", action="store_true", help="Only audit the query plans.")
+
+    def handle(self, *args, **options):
+        failed = []
+        if not options["explain_only"]:
+            failed += self.ensure_indexes(options["dry_run"])
+        if not options["skip_explain"] and not options["dry_run"]:
+            failed += self.audit_plans()
+        if failed:
+            raise CommandError("; ".join(failed))
+
+    def ensure_indexes(self, dry_run):
+        failed = []
+        for model in apps.get_models():
+            opts = model._meta
+            if opts.app_label not in INDEXED_APPS or opts.proxy or not opts.managed:
+                continue
+            declared = declared_indexes(model)
+            if not declared:
+                continue
+
+            collection = connection.get_collection(opts.db_table)
+            existing = {}
+            for name, info in collection.index_information().items():
+                existing[_key(dict(info["key"]))] = (name, bool(info.get("unique")))
+
+            missing = []
+            for index in declared:
+                spec = index.document
+                found = existing.get(_key(spec["key"]))
+                if found is None:
+                    missing.append(index)
+                elif found[1] != bool(spec.get("unique")):
+                    failed.append(f"{opts.db_table}.{found[0]} exists with a different unique option")
+                    self.stderr.write(self.style.ERROR(f"{failed[-1]}; drop it to rebuild"))
+
+            if not missing:
+                self.stdout.write(f"{opts.db_table}: {len(declared)} indexes present")
+                continue
+            names = ", ".join(index.document["name"] for index in missing)
+            if dry_run:
+                self.stdout.write(self.style.WARNING(f"{opts.db_table}: missing {names}"))
+                continue
+
+            self.stdout.write(f"{opts.db_table}: building {names}")
+            # One createIndexes command scans the collection once for all of them;
+            # builds since MongoDB 4.2 only lock the collection at start and end
+            try:
+                collection.create_indexes(missing)
+            except OperationFailure:
+                # Retry one by one to report exactly which index cannot be built
+                for index in missing:
+                    try:
+                        collection.create_indexes([index])
+                    except OperationFailure as exc:
+                        failed.append(f"{opts.db_table}.{index.document['name']}: {exc.details.get('errmsg', exc)}")
+                        self.stderr.write(self.style.ERROR(failed[-1]))
+
+        if not dry_run:
+            from apps.admin.presence import tracker as presence_tracker
+            presence_tracker.ensure_indexes()  # TTL index, owned by the tracker
+        return failed
+
+    def audit_plans(self):
+        failed = []
+        for label, queryset in hot_queries():
+            stages = winning_plan_stages(json_util.loads(queryset.explain()))
+            used = ", ".join(name for stage, name in stages if stage == "IXSCAN" and name) or "no index"
+            if any(stage == "COLLSCAN" for stage, _ in stages):
+                failed.append(f"{label} scans {queryset.model._meta.db_table}")
+                self.stderr.write(self.style.ERROR(f"COLLSCAN  {label}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"ok        {label} ({used})"))
+        return failed
@@ -0,0 +1,16 @@
+# apps/workflows/management/commands/flush_form_drafts.py
+from django.core.management.base import BaseCommand
+
+from apps.workflows.drafts import FLUSH_DELAY, buffer
+
+class Command(BaseCommand):
+    help = "Write stored form drafts to their workflows (idle ones only unless --all)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Also flush drafts edited recently.")
+
+    def handle(self, *args, **options):
+        results = buffer.flush(idle=None if options["all"] else FLUSH_DELAY)
+        rejected = sum(1 for errors in results.values() if errors)
+        style = self.style.WARNING if rejected else self.style.SUCCESS
+        self.stdout.write(style(f"Flushed {len(results) - rejected} drafts, {rejected} rejected by validation."))
@@ -0,0 +1,37 @@
+# apps/workflows/management/commands/generate_attachment_previews.py
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from apps.workflows.models import Attachment
+from apps.workflows.previews import DERIVATIVES_VERSION, DerivativeStatus, process_attachment
+
+class Command(BaseCommand):
+    help = "Generate thumbnails and previews for attachments that do not have current ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Regenerate even up-to-date derivatives.")
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--retry-failed", action="store_true", help="Include attachments that failed before.")
+
+    def handle(self, *args, **options):
+        qs = Attachment.objects.all()
+        if not options["force"]:
+            stale = Q(derivatives_version__lt=DERIVATIVES_VERSION) | Q(derivatives_status=DerivativeStatus.PENDING)
+            if options["retry_failed"]:
+                stale |= Q(derivatives_status=DerivativeStatus.FAILED)
+            qs = qs.filter(stale)
+
+        attachments = list(qs.select_related("blob").only(
+            "id", "workflow_id", "file", "name", "blob__content_type", "derivatives_status", "derivatives_version"
+        ))
+        self.stdout.write(f"Processing {len(attachments)} attachments...")
+
+        with ThreadPoolExecutor(max_workers=max(options["workers"], 1)) as pool:
+            results = Counter(pool.map(lambda a: process_attachment(a, force=options["force"]), attachments))
+
+        summary = ", ".join(f"{status}: {count}" for status, count in sorted(results.items())) or "nothing to do"
+        style = self.style.WARNING if results.get(DerivativeStatus.FAILED) else self.style.SUCCESS
+        self.stdout.write(style(summary))
@@ -0,0 +1,31 @@
+# apps/workflows/management/commands/recompute_workflow_fields.py
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from apps.workflows.forms.computed import COMPUTED_FIELDS, compute_fields
+from apps.workflows.models import Workflow
+
+class Command(BaseCommand):
+    help = "Recompute the materialized workflow fields (applicant name, national ID, address, plate) from form data."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--dry-run", action="store_true", help="Report how many workflows would change.")
+
+    def handle(self, *args, **options):
+        fields = list(COMPUTED_FIELDS)
+        qs = Workflow.objects.only("id", "_data", *fields).order_by("pk")
+
+        scanned = changed = 0
+        for workflow in qs.iterator(chunk_size=max(options["batch_size"], 1)):
+            scanned += 1
+            values = compute_fields(workflow.data)
+            if all(getattr(workflow, name) == value for name, value in values.items()):
+                continue
+            changed += 1
+            if not options["dry_run"]:
+                # Leaves updated_at alone: the workflow's content did not change
+                Workflow.objects.filter(pk=workflow.pk).update(version=F("version") + 1, **values)
+
+        verb = "would change" if options["dry_run"] else "updated"
+        self.stdout.write(self.style.SUCCESS(f"Scanned {scanned} workflows, {verb} {changed}."))
@@ -8,6 +8,7 @@ from typing import Dict, Any
 
 from .workflow_spec import NEXT_STATE
 from . import actions as act
+from workflow_engine.tracing import span
 import json
 from datetime import datetime
 
@@ -53,50 +54,56 @@ class Workflow(ConcurrentTransitionMixin, models.Model):
         """Set data from Python dict"""
         self._data = json.dumps(value, ensure_ascii=False) if value else '{}'
     
+    # Materialized from the forms' get_computed_fields() whenever _data is saved
+    applicant_name = models.CharField(max_length=300, blank=True, default="", db_index=True)
+    applicant_national_id = models.CharField(max_length=20, blank=True, default="", db_index=True)
+    property_address = models.CharField(max_length=500, blank=True, default="")
+    registration_plate_number = models.CharField(max_length=100, blank=True, default="", db_index=True)
+
+    # Bumped on any change to the workflow or its actions, comments and
+    # attachments; ETags of the read endpoints derive from it (versioning.py)
+    version = models.PositiveIntegerField(default=0, editable=False)
+
     # Metadata
     created_by = models.ForeignKey(User, on_delete=models.PROTECT, related_name="workflows")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # Created by the ensure_indexes command, which also checks the hot
+        # queries (list, its filters, inbox) for collection scans
+        indexes = [
+            models.Index(fields=["-created_at"]),
+            models.Index(fields=["state", "-created_at"]),
+            models.Index(fields=["created_by", "-created_at"]),
+        ]
+
     def __str__(self):
         return f"{self.title} ({self.state})"
 
-    # Property accessors for common fields
-    @property
-    def applicant_name(self):
-        """Get full name from firstName and lastName"""
-        first = self.data.get('personalInformation', {}).get('firstName', '')
-        last = self.data.get('personalInformation', {}).get('lastName', '')
-        if first and last:
-            return f"{first} {last}"
-        return first or last or self.data.get('applicantDetails', {}).get('name', '')
-
-    @property
-    def applicant_national_id(self):
-        """Get national ID from various possible locations"""
-        return (
-            self.data.get('personalInformation', {}).get('nationalCode') or
-            self.data.get('applicantDetails', {}).get('nationalCode') or
-            ''
-        )
-
-    @property
-    def property_address(self):
-        """Get property address"""
-        return (
-            self.data.get('personalInformation', {}).get('residenceAddress') or
-            self.data.get('propertyDetails', {}).get('address') or
-            ''
-        )
-
-    @property
-    def registration_plate_number(self):
-        """Get property registration plate number"""
-        return (
-            self.data.get('propertyRegistrationPlateNumber') or
-            self.data.get('propertyDetails', {}).get('registrationPlateNumber') or
-            ''
-        )
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None and not self._state.adding:
+            # version only moves by $inc (versioning.bump_version): a full save
+            # would write back the value read with the instance
+            deferred = self.get_deferred_fields()
+            update_fields = kwargs["update_fields"] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != "version" and field.attname not in deferred
+            ]
+        if update_fields is None or "_data" in update_fields:
+            changed = self.refresh_computed_fields()
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, *changed}
+        super().save(*args, **kwargs)
+
+    def refresh_computed_fields(self, data=None):
+        """Re-derive the materialized fields from data; returns the field names"""
+        from .forms.computed import compute_fields
+        values = compute_fields(self.data if data is None else data)
+        for name, value in values.items():
+            setattr(self, name, value)
+        return list(values)
 
     def update_data(self, new_data, merge=True):
         """Update workflow data with proper merging"""
@@ -238,7 +245,7 @@ class Workflow(ConcurrentTransitionMixin, models.Model):
             # If the user doesn't have permission, Viewflow won't even list this
             # as an available transition. You might add an explicit check here
             # for safety if this method is called outside of the Viewflow UI.
-            with transaction.atomic():
+            with span("workflow.transition", source=current_state_name, target=next_state_name), transaction.atomic():
                 transition_method(by=by)
             return True
 
@@ -264,22 +271,121 @@ class Action(models.Model):
         unique_together = [("workflow", "state", "step")]
         indexes = [models.Index(fields=["workflow", "state", "step"])]
 
+class Blob(models.Model):
+    """
+    One stored copy of some file content, addressed by its SHA-256.
+
+    Attachments with identical content share a Blob; ``ref_count`` tracks how
+    many reference it and the object is garbage-collected at zero.
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    key = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    content_type = models.CharField(max_length=200, default="application/octet-stream")
+    ref_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.sha256
+
+
 class Attachment(models.Model):
     workflow = models.ForeignKey(Workflow, on_delete=models.CASCADE, related_name="attachments")
-    file = models.FileField(upload_to="attachments/", storage=S3Boto3Storage())
+    file = models.FileField(upload_to="attachments/", storage=S3Boto3Storage(), max_length=255)
+    # Null until content-addressed (in the background for uploads without a
+    # verified checksum) and for attachments stored before content addressing
+    blob = models.ForeignKey(Blob, on_delete=models.PROTECT, null=True, blank=True, related_name="attachments")
     name = models.CharField(max_length=200, default="پیوست")
     uploaded_by = models.ForeignKey(User, on_delete=models.PROTECT)
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    # Key of the presigned direct upload it was registered from; unique, so
+    # each upload token registers one attachment
+    upload_key = models.CharField(max_length=255, null=True, blank=True, unique=True)
+    # Derivatives written next to the original by apps.workflows.previews
+    thumbnail_key = models.CharField(max_length=255, blank=True, default="")
+    preview_key = models.CharField(max_length=255, blank=True, default="")
+    derivatives_status = models.CharField(max_length=16, default="PENDING")
+    derivatives_version = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=["workflow", "uploaded_at"])]
 
     def __str__(self):
         return self.name
 
 
+class UploadSession(models.Model):
+    """Server-side state of a resumable multipart upload into MinIO"""
+    class Status(models.TextChoices):
+        ACTIVE = "ACTIVE"
+        # Claimed by the one complete call assembling the parts
+        COMPLETING = "COMPLETING"
+        # Parts assembled in MinIO, but registering the attachment failed
+        ASSEMBLED = "ASSEMBLED"
+        COMPLETED = "COMPLETED"
+        ABORTED = "ABORTED"
+
+    workflow = models.ForeignKey(Workflow, on_delete=models.CASCADE, related_name="upload_sessions")
+    uploaded_by = models.ForeignKey(User, on_delete=models.PROTECT)
+    key = models.CharField(max_length=255)
+    upload_id = models.CharField(max_length=255)
+    name = models.CharField(max_length=200, default="پیوست")
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=200, default="application/octet-stream")
+    size = models.BigIntegerField()
+    part_size = models.IntegerField()
+    # {"<part number>": {"etag": ..., "size": ...}} as reported by the client
+    parts = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.ACTIVE)
+    attachment = models.ForeignKey(Attachment, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def part_count(self) -> int:
+        return max(1, -(-self.size // self.part_size))
+
+    def __str__(self):
+        return f"{self.filename} ({self.status})"
+
+
 class Comment(models.Model):
     workflow = models.ForeignKey(Workflow, on_delete=models.CASCADE, related_name="comments")
     text = models.TextField()
     author = models.ForeignKey(User, on_delete=models.PROTECT)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["workflow", "created_at"])]
+
+    def __str__(self):
+        return f"Comment by {self.author.username}"
+
+class FormDraft(models.Model):
+    """
+    Unsubmitted form edits of one user, merged server-side and written to the
+    workflow in one go (see drafts.py). ``data`` is a partial form document.
+    """
+    workflow = models.ForeignKey(Workflow, on_delete=models.CASCADE, related_name="drafts")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    form_number = models.IntegerField()
+    data = models.JSONField(default=dict, blank=True)
+    # Bumped on every merge; writes are compare-and-set on it
+    revision = models.PositiveIntegerField(default=0)
+    # Set when the merged form failed validation; cleared by the next edit
+    rejected = models.BooleanField(default=False)
+    errors = models.JSONField(null=True, blank=True)
+    # A worker flushing the draft holds it until then
+    lease_until = models.DateTimeField(null=True, blank=True)
+    # Set when a submission discards the draft: edits buffered before then are
+    # dropped instead of recreating it (see drafts.DraftBuffer.discard)
+    discarded_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = [("workflow", "user", "form_number")]
+        indexes = [models.Index(fields=["rejected", "updated_at"])]
+
     def __str__(self):
-        return f"Comment by {self.author.username}"
\ No newline at end of file
+        return f"Form {self.form_number} draft by {self.user_id}"
@@ -1,12 +1,13 @@
 # apps/workflows/permissions.py
 from typing import Dict, List, Any
+from apps.accounts.utils import user_role_codes
 
 def get_user_roles(user) -> List[str]:
-    """Get list of role codes for a user"""
+    """Get list of role codes for a user (from token claims when current)"""
     if not user.is_authenticated:
         return []
     
-    return [membership.role.code for membership in user.memberships.all()]
+    return sorted(user_role_codes(user))
 
 def can_user_edit_form3_section(workflow, section: str, user) -> bool:
     """Check if user can edit specific Form3 section"""
@@ -16,14 +17,7 @@ def can_user_edit_form3_section(workflow, section: str, user) -> bool:
         return False
     
     user_roles = get_user_roles(user)
-    editable_sections = {}
-    
-    # Check against all user roles
-    for role in user_roles:
-        role_sections = PropertyStatusReviewForm.get_editable_sections(workflow, role)
-        for sec, editable in role_sections.items():
-            if editable:
-                editable_sections[sec] = True
+    editable_sections = PropertyStatusReviewForm.get_user_editable_sections(workflow, user_roles)
     
     return editable_sections.get(section, False)
 
@@ -42,12 +36,7 @@ def get_form3_user_permissions(workflow, user) -> Dict[str, Any]:
     can_act_in_current_step = current_step_info.get('role') in user_roles
     
     # Get editable sections
-    editable_sections = {}
-    for role in user_roles:
-        role_sections = PropertyStatusReviewForm.get_editable_sections(workflow, role)
-        for section, editable in role_sections.items():
-            if editable:
-                editable_sections[section] = True
+    editable_sections = PropertyStatusReviewForm.get_user_editable_sections(workflow, user_roles)
     
     return {
         'can_view': len(user_roles) > 0,  # Any authenticated user with roles can view
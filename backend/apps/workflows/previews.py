@@ -0,0 +1,239 @@
+# apps/workflows/previews.py
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from . import storage
+
+try:
+    from PIL import Image, ImageOps
+except Exception:
+    Image = None
+
+try:
+    import pymupdf as fitz  # used for first-page previews of PDFs
+except Exception:
+    fitz = None
+
+logger = logging.getLogger(__name__)
+
+# Bump when the output format changes so existing derivatives get regenerated
+DERIVATIVES_VERSION = 1
+
+THUMBNAIL_SIZE = (320, 320)
+PREVIEW_SIZE = (1280, 1280)
+JPEG_QUALITY = 82
+MAX_SOURCE_SIZE = getattr(settings, "ATTACHMENT_PREVIEW_MAX_SOURCE_SIZE", 50 * 1024 * 1024)
+WORKERS = getattr(settings, "ATTACHMENT_PREVIEW_WORKERS", 2)
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tif", ".tiff", ".webp"}
+PDF_EXTENSIONS = {".pdf"}
+
+
+class DerivativeStatus:
+    PENDING = "PENDING"
+    READY = "READY"
+    UNSUPPORTED = "UNSUPPORTED"
+    FAILED = "FAILED"
+
+
+def derivative_key(key: str, kind: str) -> str:
+    """Deterministic key next to the original, so reprocessing overwrites in place"""
+    return f"{os.path.splitext(key)[0]}.{kind}.v{DERIVATIVES_VERSION}.jpg"
+
+
+def _source_kind(attachment):
+    # Content-addressed keys carry no extension: fall back to the stored
+    # content type, then to the attachment's display name
+    content_type = attachment.blob.content_type if attachment.blob_id else ""
+    if content_type.startswith("image/"):
+        return "image"
+    if content_type == "application/pdf":
+        return "pdf"
+    for candidate in (attachment.file.name, attachment.name):
+        ext = os.path.splitext(candidate or "")[1].lower()
+        if ext in IMAGE_EXTENSIONS:
+            return "image"
+        if ext in PDF_EXTENSIONS:
+            return "pdf"
+    return None
+
+
+def _render_first_page(data: bytes):
+    with fitz.open(stream=data, filetype="pdf") as document:
+        if document.page_count == 0:
+            return None
+        page = document.load_page(0)
+        # Render just large enough for the preview size
+        zoom = max(PREVIEW_SIZE) / max(page.rect.width, page.rect.height, 1)
+        pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        return Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+
+
+def _encode(image, size) -> bytes:
+    copy = image.copy()
+    copy.thumbnail(size, Image.LANCZOS)
+    out = io.BytesIO()
+    copy.save(out, format="JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+def _save(attachment, fields):
+    from .models import Attachment
+    from .versioning import bump_version
+
+    # queryset.update() so the post_save hook does not schedule the attachment again
+    Attachment.objects.filter(pk=attachment.pk).update(**fields)
+    # New thumbnail/preview URLs change the workflow's representation
+    bump_version(attachment.workflow_id)
+
+
+def generate_derivatives(attachment, force: bool = False) -> str:
+    """
+    Create the thumbnail and preview for one attachment and record them.
+
+    Idempotent: attachments already processed at the current
+    DERIVATIVES_VERSION are skipped unless ``force`` is set.
+    """
+    from .models import Attachment
+
+    if (
+        not force
+        and attachment.derivatives_version >= DERIVATIVES_VERSION
+        and attachment.derivatives_status in (DerivativeStatus.READY, DerivativeStatus.UNSUPPORTED)
+    ):
+        return attachment.derivatives_status
+
+    key = attachment.file.name
+    kind = _source_kind(attachment)
+    fields = {"derivatives_version": DERIVATIVES_VERSION}
+
+    # Deduplicated content: reuse what another attachment of the same blob produced
+    if not force and attachment.blob_id:
+        sibling = (
+            Attachment.objects.filter(
+                blob_id=attachment.blob_id,
+                derivatives_version=DERIVATIVES_VERSION,
+                derivatives_status=DerivativeStatus.READY,
+            )
+            .exclude(pk=attachment.pk)
+            .values("thumbnail_key", "preview_key")
+            .first()
+        )
+        if sibling:
+            fields.update(derivatives_status=DerivativeStatus.READY, **sibling)
+            _save(attachment, fields)
+            return DerivativeStatus.READY
+
+    if Image is None or kind is None or (kind == "pdf" and fitz is None):
+        fields.update(derivatives_status=DerivativeStatus.UNSUPPORTED, thumbnail_key="", preview_key="")
+        _save(attachment, fields)
+        return DerivativeStatus.UNSUPPORTED
+
+    try:
+        head = storage.head_object(key)
+        if head is None or head.get("ContentLength", 0) > MAX_SOURCE_SIZE:
+            raise ValueError(f"Source {key} is missing or too large for previews")
+
+        client = storage.get_s3_client()
+        data = client.get_object(Bucket=storage.bucket_name(), Key=key)["Body"].read()
+
+        if kind == "pdf":
+            image = _render_first_page(data)
+        else:
+            image = Image.open(io.BytesIO(data))
+            image.seek(0)
+            image = ImageOps.exif_transpose(image)
+        if image is None:
+            raise ValueError(f"Nothing to render in {key}")
+        image = image.convert("RGB")
+
+        thumbnail_key = derivative_key(key, "thumb")
+        preview_key = derivative_key(key, "preview")
+        for target, size in ((thumbnail_key, THUMBNAIL_SIZE), (preview_key, PREVIEW_SIZE)):
+            client.put_object(
+                Bucket=storage.bucket_name(),
+                Key=target,
+                Body=_encode(image, size),
+                ContentType="image/jpeg",
+                CacheControl="private, max-age=31536000, immutable",
+            )
+
+        fields.update(
+            derivatives_status=DerivativeStatus.READY,
+            thumbnail_key=thumbnail_key,
+            preview_key=preview_key,
+        )
+    except Exception:
+        logger.exception("Generating previews for attachment %s failed", attachment.pk)
+        fields.update(derivatives_status=DerivativeStatus.FAILED)
+
+    _save(attachment, fields)
+    return fields["derivatives_status"]
+
+
+def process_attachment(attachment, force: bool = False) -> str:
+    """
+    Background work for one attachment: content-address uploads that arrived
+    without a verified checksum, then generate the derivatives.
+    """
+    from .blobs import ingest_attachment
+
+    if not attachment.blob_id:
+        try:
+            ingest_attachment(attachment)
+        except Exception:
+            # The attachment stays usable at its upload key
+            logger.exception("Content-addressing attachment %s failed", attachment.pk)
+    return generate_derivatives(attachment, force=force)
+
+
+class PreviewPipeline:
+    """Bounded worker pool processing new attachments off the request path"""
+
+    def __init__(self, workers=WORKERS):
+        self.workers = workers
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._in_flight = set()
+
+    def _get_executor(self):
+        # Recreate the pool after a fork; threads do not survive it
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="previews")
+                    self._in_flight = set()
+                    self._pid = os.getpid()
+        return self._executor
+
+    def submit(self, attachment_id, force=False):
+        """Queue an attachment; duplicates already queued are dropped"""
+        executor = self._get_executor()
+        key = str(attachment_id)
+        with self._lock:
+            if key in self._in_flight:
+                return None
+            self._in_flight.add(key)
+        return executor.submit(self._run, attachment_id, force)
+
+    def _run(self, attachment_id, force):
+        from django.db import close_old_connections
+        from .models import Attachment
+
+        try:
+            attachment = Attachment.objects.select_related("blob").filter(pk=attachment_id).first()
+            if attachment is not None:
+                return process_attachment(attachment, force=force)
+        finally:
+            with self._lock:
+                self._in_flight.discard(str(attachment_id))
+            close_old_connections()
+
+
+pipeline = PreviewPipeline()
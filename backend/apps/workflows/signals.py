@@ -0,0 +1,36 @@
+# apps/workflows/signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django_fsm.signals import post_transition
+
+from workflow_engine.metrics import WORKFLOW_TRANSITIONS
+
+from .blobs import release
+from .models import Action, Attachment, Comment, Workflow
+from .previews import pipeline
+from .versioning import bump_version
+
+@receiver(post_save, sender=Attachment)
+def schedule_attachment_previews(sender, instance, created, **kwargs):
+    """Thumbnails and previews are generated off the request path once the file is registered"""
+    if created and instance.file:
+        pipeline.submit(instance.pk)
+
+@receiver(post_delete, sender=Attachment)
+def release_attachment_blob(sender, instance, **kwargs):
+    """Shared content is garbage-collected when its last attachment goes"""
+    if instance.blob_id:
+        release(instance.blob_id)
+
+@receiver(post_transition, sender=Workflow)
+def count_transition(sender, instance, name, source, target, **kwargs):
+    WORKFLOW_TRANSITIONS.labels(source, target).inc()
+
+def bump_workflow_version(sender, instance, **kwargs):
+    """Anything shown on the workflow pages invalidates their ETags"""
+    bump_version(instance.pk if sender is Workflow else instance.workflow_id)
+
+for model in (Workflow, Action, Comment, Attachment):
+    post_save.connect(bump_workflow_version, sender=model, dispatch_uid=f"bump-version-{model.__name__}")
+for model in (Action, Comment, Attachment):
+    post_delete.connect(bump_workflow_version, sender=model, dispatch_uid=f"bump-version-deleted-{model.__name__}")
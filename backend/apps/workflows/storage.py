@@ -0,0 +1,224 @@
+# apps/workflows/storage.py
+import time
+from functools import lru_cache
+
+import boto3
+from botocore.client import Config
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+
+from workflow_engine.metrics import URL_SIGNING_CACHE, URL_SIGNING_SECONDS
+
+UPLOAD_URL_EXPIRES = getattr(settings, "ATTACHMENT_UPLOAD_URL_EXPIRES", 900)
+DOWNLOAD_URL_EXPIRES = getattr(settings, "ATTACHMENT_DOWNLOAD_URL_EXPIRES", 3600)
+MAX_UPLOAD_SIZE = getattr(settings, "ATTACHMENT_MAX_UPLOAD_SIZE", 100 * 1024 * 1024)
+URL_MODE = getattr(settings, "ATTACHMENT_URL_MODE", "lazy")
+LINK_MAX_AGE = getattr(settings, "ATTACHMENT_LINK_MAX_AGE", DOWNLOAD_URL_EXPIRES)
+LINK_TOKEN_SALT = "workflows.attachments.link"
+
+
+@lru_cache(maxsize=2)
+def get_s3_client(public: bool = False):
+    """
+    Return a boto3 S3 client for the attachments bucket.
+
+    ``public=True`` signs against the endpoint browsers can reach, which
+    differs from the in-cluster MinIO address under docker-compose.
+    """
+    endpoint = settings.AWS_S3_ENDPOINT_URL
+    if public:
+        endpoint = getattr(settings, "AWS_S3_PUBLIC_ENDPOINT_URL", None) or endpoint
+    return boto3.client(
+        "s3",
+        endpoint_url=endpoint,
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        region_name=settings.AWS_S3_REGION_NAME,
+        verify=settings.AWS_S3_VERIFY,
+        config=Config(
+            signature_version=settings.AWS_S3_SIGNATURE_VERSION,
+            s3={"addressing_style": settings.AWS_S3_ADDRESSING_STYLE},
+        ),
+    )
+
+
+def bucket_name() -> str:
+    return settings.AWS_STORAGE_BUCKET_NAME
+
+
+def presigned_put_url(key: str, content_type: str, expires: int = UPLOAD_URL_EXPIRES, checksum_sha256: str = None) -> str:
+    """
+    Sign a PUT the client uses to upload straight to MinIO.
+
+    With ``checksum_sha256`` (base64) the client must send it as the
+    ``x-amz-checksum-sha256`` header and MinIO rejects content that does not match.
+    """
+    params = {"Bucket": bucket_name(), "Key": key, "ContentType": content_type}
+    if checksum_sha256:
+        params["ChecksumSHA256"] = checksum_sha256
+    return _presign("put_object", params, expires)
+
+
+def _presign(operation: str, params: dict, expires: int) -> str:
+    start = time.perf_counter()
+    url = get_s3_client(public=True).generate_presigned_url(operation, Params=params, ExpiresIn=expires)
+    URL_SIGNING_SECONDS.labels(operation).observe(time.perf_counter() - start)
+    return url
+
+
+def _expiry_bucket(expires: int, now=None):
+    """
+    Return ``(bucket, seconds left in it)`` for a ``expires / 2`` wide window.
+
+    A URL signed anywhere inside a bucket stays valid for at least half its
+    lifetime after the bucket ends, so every process can share one cached URL
+    per (key, bucket) and never hand out one that is about to expire.
+    """
+    window = max(expires // 2, 1)
+    now = int(time.time() if now is None else now)
+    return now // window, window - now % window
+
+
+def _get_url_cache_key(key: str, expires: int, bucket: int) -> str:
+    return f"s3:get:{expires}:{bucket}:{key}"
+
+
+def _sign_get(key: str, expires: int) -> str:
+    return _presign("get_object", {"Bucket": bucket_name(), "Key": key}, expires)
+
+
+def presigned_get_url(key: str, expires: int = DOWNLOAD_URL_EXPIRES) -> str:
+    """Sign a GET for ``key``, reusing the URL cached for the current expiry bucket"""
+    return presigned_get_urls([key], expires)[key]
+
+
+def presigned_get_urls(keys, expires: int = DOWNLOAD_URL_EXPIRES) -> dict:
+    """
+    Batch version of ``presigned_get_url``: one cache round trip for all keys,
+    and signing only for the ones not signed yet in this bucket.
+    """
+    bucket, ttl = _expiry_bucket(expires)
+    cache_keys = {_get_url_cache_key(key, expires, bucket): key for key in set(keys)}
+    cached = cache.get_many(list(cache_keys))
+
+    urls = {cache_keys[ck]: url for ck, url in cached.items()}
+    missing = {ck: _sign_get(key, expires) for ck, key in cache_keys.items() if ck not in cached}
+    URL_SIGNING_CACHE.labels("hit").inc(len(cached))
+    URL_SIGNING_CACHE.labels("miss").inc(len(missing))
+    if missing:
+        cache.set_many(missing, ttl)
+        urls.update((cache_keys[ck], url) for ck, url in missing.items())
+    return urls
+
+
+def attachment_link_token(attachment_id, now=None) -> str:
+    """
+    Signed token that lets a browser follow an attachment link without a
+    bearer header. It names the link's expiry bucket rather than the signing
+    time, so serializing the same attachment gives the same link (and ETag)
+    for the whole bucket.
+    """
+    bucket, _ = _expiry_bucket(LINK_MAX_AGE, now)
+    return signing.Signer(salt=LINK_TOKEN_SALT).sign(f"{attachment_id}:{bucket}")
+
+
+def read_attachment_link_token(token: str, now=None):
+    """
+    Return the attachment id from a link token, or None when invalid or
+    expired. A token is accepted in its own bucket and the next one, so a
+    link works for at least half of LINK_MAX_AGE and never longer than it.
+    """
+    try:
+        attachment_id, bucket = signing.Signer(salt=LINK_TOKEN_SALT).unsign(token).rsplit(":", 1)
+    except (signing.BadSignature, ValueError):
+        return None
+    current, _ = _expiry_bucket(LINK_MAX_AGE, now)
+    return attachment_id if bucket in (str(current), str(current - 1)) else None
+
+
+def head_object(key: str, checksum: bool = False):
+    """
+    Return the object's metadata, or None when it does not exist. With
+    ``checksum`` it includes the checksums stored with the object
+    (``ChecksumSHA256``, ...).
+    """
+    params = {"Bucket": bucket_name(), "Key": key}
+    if checksum:
+        params["ChecksumMode"] = "ENABLED"
+    try:
+        return get_s3_client().head_object(**params)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return None
+        raise
+
+
+def delete_objects(keys) -> None:
+    keys = [key for key in keys if key]
+    for start in range(0, len(keys), 1000):
+        get_s3_client().delete_objects(
+            Bucket=bucket_name(),
+            Delete={"Objects": [{"Key": key} for key in keys[start:start + 1000]], "Quiet": True},
+        )
+
+
+# ===== Multipart (resumable) uploads =====
+
+MIN_PART_SIZE = 5 * 1024 * 1024  # S3/MinIO minimum for every part but the last
+MAX_PARTS = 10000
+PART_SIZE = max(getattr(settings, "ATTACHMENT_UPLOAD_PART_SIZE", 8 * 1024 * 1024), MIN_PART_SIZE)
+MAX_MULTIPART_SIZE = getattr(settings, "ATTACHMENT_MAX_MULTIPART_SIZE", 2 * 1024 * 1024 * 1024)
+
+
+def part_size_for(size: int) -> int:
+    """Pick a part size that keeps the upload under the S3 part-count limit"""
+    part_size = PART_SIZE
+    while size > part_size * MAX_PARTS:
+        part_size *= 2
+    return part_size
+
+
+def create_multipart_upload(key: str, content_type: str) -> str:
+    result = get_s3_client().create_multipart_upload(
+        Bucket=bucket_name(), Key=key, ContentType=content_type
+    )
+    return result["UploadId"]
+
+
+def presigned_upload_part_url(key: str, upload_id: str, part_number: int, expires: int = UPLOAD_URL_EXPIRES) -> str:
+    return _presign(
+        "upload_part",
+        {"Bucket": bucket_name(), "Key": key, "UploadId": upload_id, "PartNumber": part_number},
+        expires,
+    )
+
+
+def list_uploaded_parts(key: str, upload_id: str) -> dict:
+    """Return ``{part_number: {"etag", "size"}}`` as stored by MinIO"""
+    parts = {}
+    paginator = get_s3_client().get_paginator("list_parts")
+    for page in paginator.paginate(Bucket=bucket_name(), Key=key, UploadId=upload_id):
+        for part in page.get("Parts", []):
+            parts[part["PartNumber"]] = {"etag": part["ETag"], "size": part["Size"]}
+    return parts
+
+
+def complete_multipart_upload(key: str, upload_id: str, parts: dict) -> None:
+    get_s3_client().complete_multipart_upload(
+        Bucket=bucket_name(),
+        Key=key,
+        UploadId=upload_id,
+        MultipartUpload={"Parts": [
+            {"PartNumber": number, "ETag": parts[number]["etag"]} for number in sorted(parts)
+        ]},
+    )
+
+
+def abort_multipart_upload(key: str, upload_id: str) -> None:
+    try:
+        get_s3_client().abort_multipart_upload(Bucket=bucket_name(), Key=key, UploadId=upload_id)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") != "NoSuchUpload":
+            raise
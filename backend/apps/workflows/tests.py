@@ -1,3 +1,879 @@
-from django.test import TestCase
+import io
+import json
+import queue
+import threading
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from bson import ObjectId
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import QuerySet
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from apps.accounts.models import Membership, OrgRole, OrgRoleGroup
+from apps.admin.models import SystemLog
+from workflow_engine.encoders import MongoJSONRenderer, OrjsonRenderer
+from workflow_engine.mongo_profiler import assert_max_commands
+
+from . import blobs, bundles, drafts, storage
+from .api.api import WorkflowViewSet
+from .api.serializers import WorkflowFormSerializer, WorkflowSerializer
+from .api.views import PATCH_MAX_ATTEMPTS
+from .forms.computed import COMPUTED_FIELDS, compute_fields
+from .forms.form_3_permissions import Form3PermissionManager
+from .forms.patch import PatchError, PatchTestFailed, apply_operations, parse_operations, touched_paths
+from .forms.registry import FormRegistry
+from .management.commands.benchmark_json import _workflow_payload
+from .models import Attachment, Blob, Comment, FormDraft, UploadSession, Workflow
+from .previews import pipeline
+from .versioning import bump_version
+
+User = get_user_model()
+
+SHA256 = "a" * 64
+
+
+class WorkflowTestCase(TestCase):
+    """A workflow created by ``self.user``, an API client logged in as them, no background jobs"""
+
+    def setUp(self):
+        self.user = User.objects.create_user("applicant", password="secret")
+        self.other = User.objects.create_user("other", password="secret")
+        self.workflow = Workflow.objects.create(title="Loan request", created_by=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        submit = mock.patch.object(pipeline, "submit")
+        self.submit = submit.start()
+        self.addCleanup(submit.stop)
+
+    def attach(self, workflow, user, sha256=SHA256, key=None):
+        blob = blobs.register(sha256, 10, "application/pdf", key or blobs.new_blob_key())
+        return Attachment.objects.create(workflow=workflow, file=blob.key, blob=blob, uploaded_by=user)
+
+
+class ContentAddressingTests(WorkflowTestCase):
+    def presign(self, sha256=SHA256):
+        return self.client.post("/api/attachments/presign/", {
+            "workflow": str(self.workflow.pk), "filename": "deed.pdf", "sha256": sha256,
+        }, format="json")
+
+    def test_presign_never_hands_out_content_only_others_reference(self):
+        elsewhere = Workflow.objects.create(title="Someone else's", created_by=self.other)
+        self.attach(elsewhere, self.other)
+
+        resp = self.presign()
+
+        self.assertEqual(resp.status_code, 201)
+        self.assertFalse(resp.data["deduplicated"])
+        self.assertIn("upload_url", resp.data)
+        self.assertFalse(Attachment.objects.filter(workflow=self.workflow).exists())
+        self.assertEqual(Blob.objects.get(sha256=SHA256).ref_count, 1)
+
+    def test_presign_reattaches_content_the_user_already_references(self):
+        elsewhere = Workflow.objects.create(title="Earlier request", created_by=self.user)
+        self.attach(elsewhere, self.user)
+
+        resp = self.presign()
+
+        self.assertEqual(resp.status_code, 201)
+        self.assertTrue(resp.data["deduplicated"])
+        self.assertEqual(Blob.objects.get(sha256=SHA256).ref_count, 2)
+
+    def test_complete_rejects_an_object_without_the_signed_checksum(self):
+        token = self.presign().data["upload_token"]
+        head = {"ContentLength": 10, "ContentType": "application/pdf"}
+        with mock.patch.object(storage, "head_object", return_value=head), \
+                mock.patch.object(storage, "delete_objects") as delete_objects:
+            resp = self.client.post("/api/attachments/complete/", {"upload_token": token}, format="json")
+
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.data["error"], "checksum_mismatch")
+        self.assertEqual(delete_objects.call_count, 1)
+        self.assertFalse(Blob.objects.filter(sha256=SHA256).exists())
+
+    def test_content_registered_after_release_gets_a_new_key(self):
+        first = blobs.register(SHA256, 10, "application/pdf", "blobs/first")
+        with mock.patch.object(storage, "delete_objects") as delete_objects:
+            self.assertTrue(blobs.release(first.pk))
+        second = blobs.register(SHA256, 10, "application/pdf", "blobs/second")
+
+        self.assertEqual(second.key, "blobs/second")
+        deleted = delete_objects.call_args.args[0]
+        self.assertIn("blobs/first", deleted)
+        self.assertNotIn("blobs/second", deleted)
+
+    def test_uploads_without_a_verified_checksum_are_not_read_in_the_request(self):
+        session = UploadSession.objects.create(
+            workflow=self.workflow, uploaded_by=self.user, key="blobs/upload", upload_id="u1",
+            filename="scan.tif", size=10, part_size=storage.PART_SIZE,
+        )
+        with mock.patch.object(storage, "list_uploaded_parts", return_value={1: {"etag": '"e"', "size": 10}}), \
+                mock.patch.object(storage, "complete_multipart_upload"), \
+                mock.patch.object(storage, "get_s3_client") as get_s3_client:
+            resp = self.client.post(f"/api/uploads/{session.pk}/complete/")
+
+        self.assertEqual(resp.status_code, 201)
+        get_s3_client.return_value.get_object.assert_not_called()
+        attachment = Attachment.objects.get(workflow=self.workflow)
+        self.assertEqual(attachment.file.name, "blobs/upload")
+        self.assertIsNone(attachment.blob_id)
+        self.submit.assert_called_once_with(attachment.pk)
+
+
+class DirectUploadTests(WorkflowTestCase):
+    def presign(self):
+        resp = self.client.post("/api/attachments/presign/", {
+            "workflow": str(self.workflow.pk), "filename": "deed.pdf",
+        }, format="json")
+        return resp.data["upload_token"]
+
+    def complete(self, token, head):
+        with mock.patch.object(storage, "head_object", return_value=head), \
+                mock.patch.object(storage, "delete_objects") as delete_objects:
+            resp = self.client.post("/api/attachments/complete/", {"upload_token": token}, format="json")
+        return resp, delete_objects
+
+    def test_an_upload_token_registers_one_attachment(self):
+        token = self.presign()
+        head = {"ContentLength": 10, "ContentType": "application/pdf"}
+
+        first, _ = self.complete(token, head)
+        replay, _ = self.complete(token, head)
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(replay.status_code, 409)
+        self.assertEqual(replay.data["error"], "upload_already_completed")
+        self.assertEqual(Attachment.objects.filter(workflow=self.workflow).count(), 1)
+
+    def test_an_oversized_upload_is_deleted(self):
+        token = self.presign()
+
+        resp, delete_objects = self.complete(token, {"ContentLength": storage.MAX_UPLOAD_SIZE + 1})
+
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.data["error"], "upload_too_large")
+        delete_objects.assert_called_once()
+        self.assertFalse(Attachment.objects.filter(workflow=self.workflow).exists())
+
+
+class UploadSessionTests(WorkflowTestCase):
+    def setUp(self):
+        super().setUp()
+        self.session = UploadSession.objects.create(
+            workflow=self.workflow, uploaded_by=self.user, key="blobs/upload", upload_id="u1",
+            filename="scan.tif", size=10, part_size=storage.PART_SIZE,
+        )
+        self.url = f"/api/uploads/{self.session.pk}/"
+
+    def test_the_losing_concurrent_complete_gets_409(self):
+        def claimed_meanwhile(*args):
+            # Another request claims the session between our checks and our claim
+            UploadSession.objects.filter(pk=self.session.pk).update(status=UploadSession.Status.COMPLETING)
+            return {1: {"etag": '"e"', "size": 10}}
+
+        with mock.patch.object(storage, "list_uploaded_parts", side_effect=claimed_meanwhile), \
+                mock.patch.object(storage, "complete_multipart_upload") as complete_multipart_upload:
+            resp = self.client.post(self.url + "complete/")
+
+        self.assertEqual(resp.status_code, 409)
+        complete_multipart_upload.assert_not_called()
+        self.assertFalse(Attachment.objects.filter(workflow=self.workflow).exists())
+
+    def test_complete_on_a_claimed_session_gets_409(self):
+        UploadSession.objects.filter(pk=self.session.pk).update(status=UploadSession.Status.COMPLETING)
+
+        resp = self.client.post(self.url + "complete/")
+
+        self.assertEqual(resp.status_code, 409)
+
+    def test_a_failed_registration_is_finished_by_the_next_complete(self):
+        stored = {1: {"etag": '"e"', "size": 10}}
+        with mock.patch.object(storage, "list_uploaded_parts", return_value=stored), \
+                mock.patch.object(storage, "complete_multipart_upload") as complete_multipart_upload, \
+                mock.patch.object(Attachment.objects, "get_or_create", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.post(self.url + "complete/")
+
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.status, UploadSession.Status.ASSEMBLED)
+        self.assertEqual(self.session.parts, {"1": {"etag": '"e"', "size": 10}})
+
+        with mock.patch.object(storage, "complete_multipart_upload") as complete_again:
+            resp = self.client.post(self.url + "complete/")
+
+        self.assertEqual(resp.status_code, 201)
+        complete_multipart_upload.assert_called_once()
+        complete_again.assert_not_called()
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.status, UploadSession.Status.COMPLETED)
+        self.assertEqual(Attachment.objects.get(upload_key=self.session.key).pk, self.session.attachment_id)
+
+    def test_complete_returns_absolute_attachment_links(self):
+        with mock.patch.object(storage, "list_uploaded_parts", return_value={1: {"etag": '"e"', "size": 10}}), \
+                mock.patch.object(storage, "complete_multipart_upload"):
+            created = self.client.post(self.url + "complete/")
+        repeated = self.client.post(self.url + "complete/")
+
+        self.assertEqual(created.status_code, 201)
+        self.assertTrue(created.data["file"].startswith("http://testserver/"))
+        self.assertEqual(repeated.data["file"], created.data["file"])
+
+    def test_destroy_deletes_an_assembled_but_unregistered_object(self):
+        UploadSession.objects.filter(pk=self.session.pk).update(status=UploadSession.Status.ASSEMBLED)
+
+        with mock.patch.object(storage, "delete_objects") as delete_objects, \
+                mock.patch.object(storage, "abort_multipart_upload") as abort_multipart_upload:
+            resp = self.client.delete(self.url)
+
+        self.assertEqual(resp.status_code, 204)
+        delete_objects.assert_called_once_with([self.session.key])
+        abort_multipart_upload.assert_not_called()
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.status, UploadSession.Status.ABORTED)
+
+    def test_retrieve_reports_stored_parts_without_saving_them(self):
+        updated_at = self.session.updated_at
+        with mock.patch.object(storage, "list_uploaded_parts", return_value={1: {"etag": '"e"', "size": 10}}):
+            resp = self.client.get(self.url)
+
+        self.assertEqual(resp.data["uploaded_parts"], [1])
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.parts, {})
+        self.assertEqual(self.session.updated_at, updated_at)
+
+    def test_sign_parts_signs_at_most_one_batch(self):
+        UploadSession.objects.filter(pk=self.session.pk).update(size=storage.PART_SIZE * 150)
+
+        resp = self.client.post(self.url + "sign_parts/", {}, format="json")
+
+        self.assertEqual(len(resp.data["urls"]), 100)
+
+
+class FormDraftTests(WorkflowTestCase):
+    def setUp(self):
+        super().setUp()
+        self.key = drafts.DraftBuffer.key(self.workflow.pk, self.user.pk, 1)
+
+    def test_edits_buffered_before_a_submission_do_not_recreate_the_draft(self):
+        since = timezone.now()
+        drafts.buffer.discard(*self.key)
+
+        drafts._persist(self.key, {"personalInformation": {"firstName": "Stale"}}, since)
+
+        draft = FormDraft.objects.get(workflow=self.workflow, user=self.user, form_number=1)
+        self.assertEqual(draft.data, {})
+        self.assertIsNotNone(draft.discarded_at)
+        self.assertEqual(drafts.buffer.flush(workflow_id=self.workflow.pk), {})
+
+    def test_edits_made_after_a_submission_start_a_new_draft(self):
+        drafts.buffer.discard(*self.key)
+
+        drafts._persist(self.key, {"personalInformation": {"firstName": "New"}}, timezone.now())
+
+        draft = FormDraft.objects.get(workflow=self.workflow, user=self.user, form_number=1)
+        self.assertEqual(draft.data, {"personalInformation": {"firstName": "New"}})
+        self.assertIsNone(draft.discarded_at)
+
+    def test_flush_rechecks_form3_permissions_for_the_drafts_user(self):
+        Workflow.objects.filter(pk=self.workflow.pk).update(state="Form3")
+        FormDraft.objects.create(
+            workflow=self.workflow, user=self.user, form_number=3, revision=1,
+            data={"legalDeputyReport": {"legalStatus": "clear"}},
+        )
+        draft = FormDraft.objects.select_related("workflow", "user").get(workflow=self.workflow)
+        data = draft.workflow.data
+
+        errors = drafts.flush_draft(draft)
+
+        self.assertIn("legalDeputyReport.legalStatus", errors)
+        self.assertEqual(Workflow.objects.get(pk=self.workflow.pk).data, data)
+        self.assertTrue(FormDraft.objects.get(pk=draft.pk).rejected)
+
+
+class WorkflowVersionTests(WorkflowTestCase):
+    def test_a_full_save_never_writes_back_a_stale_version(self):
+        stale = Workflow.objects.get(pk=self.workflow.pk)
+        version = stale.version
+        bump_version(self.workflow.pk)
+
+        stale.title = "Loan request (amended)"
+        stale.save()
+
+        self.assertEqual(Workflow.objects.get(pk=self.workflow.pk).version, version + 2)
+
+    def test_not_modified_is_only_answered_after_object_permissions(self):
+        url = f"/api/workflows/{self.workflow.pk}/"
+        etag = self.client.get(url)["ETag"]
+
+        with mock.patch.object(WorkflowViewSet, "check_object_permissions", side_effect=PermissionDenied):
+            resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(resp.status_code, 403)
+
+
+class FormPatchTests(WorkflowTestCase):
+    def test_a_patch_has_the_side_effects_of_a_save(self):
+        FormDraft.objects.create(
+            workflow=self.workflow, user=self.user, form_number=1, revision=1,
+            data={"personalInformation": {"lastName": "Stale"}},
+        )
+        version = Workflow.objects.get(pk=self.workflow.pk).version
+        logged = SystemLog.objects.filter(action="UPDATE").count()
+
+        resp = self.client.patch(f"/api/workflow-forms/{self.workflow.pk}/forms/1/", [
+            {"op": "add", "path": "/personalInformation/firstName", "value": "Sara"},
+        ], format="json")
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(Workflow.objects.get(pk=self.workflow.pk).version, version + 1)
+        self.assertEqual(SystemLog.objects.filter(action="UPDATE").count(), logged + 1)
+        self.assertIsNotNone(FormDraft.objects.get(workflow=self.workflow).discarded_at)
+
+    def patch_form(self, form_number, operations):
+        return self.client.patch(f"/api/workflow-forms/{self.workflow.pk}/forms/{form_number}/", operations, format="json")
+
+    def test_removals_are_rejected_for_forms_merged_into_the_stored_data(self):
+        self.workflow.update_from_form(2, {"applicantDetails": {"name": "Sara", "nationalCode": "0012345678"}})
+
+        for operation in (
+            {"op": "remove", "path": "/applicantDetails/name"},
+            {"op": "move", "from": "/applicantDetails/name", "path": "/applicantDetails/fatherName"},
+        ):
+            resp = self.patch_form(2, [operation])
+
+            self.assertEqual(resp.status_code, 400)
+            self.assertEqual(resp.data["error"], "invalid_patch")
+        self.assertEqual(Workflow.objects.get(pk=self.workflow.pk).data, self.workflow.data)
+
+    def test_a_concurrent_edit_is_retried_on_fresh_data(self):
+        real_update = QuerySet.update
+        raced = []
+
+        def update(queryset, **kwargs):
+            if "_data" in kwargs and not raced:
+                raced.append(True)
+                # Another edit lands between the PATCH's read and its write
+                Workflow.objects.get(pk=self.workflow.pk).update_data({"personalInformation": {"lastName": "Rahimi"}})
+            return real_update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, "update", autospec=True, side_effect=update):
+            resp = self.patch_form(1, [{"op": "add", "path": "/personalInformation/firstName", "value": "Sara"}])
+
+        self.assertEqual(resp.status_code, 200)
+        data = Workflow.objects.get(pk=self.workflow.pk).data
+        self.assertEqual(data["personalInformation"]["firstName"], "Sara")
+        self.assertEqual(data["personalInformation"]["lastName"], "Rahimi")
+
+    def test_a_patch_that_keeps_losing_the_race_gets_409(self):
+        real_update = QuerySet.update
+        attempts = []
+
+        def update(queryset, **kwargs):
+            if "_data" in kwargs:
+                attempts.append(True)
+                return 0
+            return real_update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, "update", autospec=True, side_effect=update):
+            resp = self.patch_form(1, [{"op": "add", "path": "/personalInformation/firstName", "value": "Sara"}])
+
+        self.assertEqual(resp.status_code, 409)
+        self.assertEqual(resp.data["error"], "conflict")
+        self.assertEqual(len(attempts), PATCH_MAX_ATTEMPTS)
+
+
+class ComputedFieldTests(WorkflowTestCase):
+    DATA = {
+        "personalInformation": {"firstName": "Sara", "lastName": "Karimi", "nationalCode": "0012345678"},
+        "applicantDetails": {"name": "Someone Else", "nationalCode": "0099999999"},
+        "propertyDetails": {"address": "Tehran, Valiasr St."},
+    }
+    EXPECTED = {
+        "applicant_name": "Sara Karimi",
+        "applicant_national_id": "0012345678",
+        "property_address": "Tehran, Valiasr St.",
+        "registration_plate_number": "",
+    }
+
+    def computed(self, workflow):
+        workflow = Workflow.objects.get(pk=workflow.pk)
+        return {name: getattr(workflow, name) for name in COMPUTED_FIELDS}
+
+    def test_saving_data_alone_also_writes_the_computed_fields(self):
+        self.workflow.data = self.DATA
+
+        self.workflow.save(update_fields=["_data"])
+
+        self.assertEqual(self.computed(self.workflow), self.EXPECTED)
+
+    def test_a_patch_writes_what_a_save_would(self):
+        self.workflow.data = {key: self.DATA[key] for key in ("applicantDetails", "propertyDetails")}
+        self.workflow.save()
+
+        resp = self.client.patch(f"/api/workflow-forms/{self.workflow.pk}/forms/1/", [
+            {"op": "add", "path": "/personalInformation", "value": self.DATA["personalInformation"]},
+        ], format="json")
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self.computed(self.workflow), self.EXPECTED)
+
+    def test_recompute_writes_what_a_save_would(self):
+        self.workflow.data = self.DATA
+        self.workflow.save()
+        Workflow.objects.filter(pk=self.workflow.pk).update(applicant_name="Stale", property_address="")
+
+        call_command("recompute_workflow_fields", stdout=io.StringIO())
+
+        self.assertEqual(self.computed(self.workflow), self.EXPECTED)
+
+
+class EndpointBudgetTests(WorkflowTestCase):
+    """Command budgets that hold whatever the number of rows (no per-row queries)"""
+
+    def setUp(self):
+        super().setUp()
+        group = OrgRoleGroup.objects.create(code="RE", name_fa="Real estate")
+        role = OrgRole.objects.create(code="RE_VALUATION_LEASING_LEAD", name_fa="Valuation lead", group=group)
+        Membership.objects.create(user=self.user, role=role)
+        for n in range(5):
+            Workflow.objects.create(title=f"Request {n}", created_by=self.other)
+            self.attach(self.workflow, self.other)
+            Comment.objects.create(workflow=self.workflow, author=self.other, text=f"Comment {n}")
+
+    def test_inbox(self):
+        with assert_max_commands(5, "inbox"):
+            resp = self.client.get("/api/workflows/inbox/")
+
+        self.assertEqual(len(resp.data), 6)
+        self.assertTrue(all(row["can_approve"] for row in resp.data))
+
+    def test_list(self):
+        with assert_max_commands(5, "workflow list"):
+            resp = self.client.get("/api/workflows/")
+
+        self.assertEqual(resp.status_code, 200)
+
+    def test_retrieve(self):
+        with assert_max_commands(10, "workflow retrieve"):
+            resp = self.client.get(f"/api/workflows/{self.workflow.pk}/")
+
+        self.assertEqual(len(resp.data["attachments"]), 5)
+        self.assertEqual(len(resp.data["comments"]), 5)
+
+
+class BatchGetTests(WorkflowTestCase):
+    url = "/api/workflows/batch_get/"
+
+    def test_each_id_gets_its_own_result_in_request_order(self):
+        hidden = Workflow.objects.create(title="Not yours", created_by=self.other)
+        Comment.objects.create(workflow=self.workflow, author=self.user, text="Hello")
+        missing = str(ObjectId())
+        real_check = WorkflowViewSet.check_object_permissions
+
+        def check_object_permissions(view, request, obj):
+            if obj.pk == hidden.pk:
+                raise PermissionDenied
+            return real_check(view, request, obj)
+
+        with mock.patch.object(WorkflowViewSet, "check_object_permissions", autospec=True,
+                               side_effect=check_object_permissions):
+            resp = self.client.post(self.url, {
+                "ids": [str(hidden.pk), missing, "not-an-id", str(self.workflow.pk), str(self.workflow.pk)],
+            }, format="json")
+
+        self.assertEqual(resp.status_code, 200)
+        results = resp.data["results"]
+        self.assertEqual([(r["id"], r["status"]) for r in results], [
+            (str(hidden.pk), 403), (missing, 404), ("not-an-id", 400), (str(self.workflow.pk), 200),
+        ])
+        self.assertEqual([r.get("error") for r in results[:3]], ["forbidden", "not_found", "invalid_id"])
+        found = results[3]["workflow"]
+        self.assertEqual(found["id"], str(self.workflow.pk))
+        self.assertEqual([c["text"] for c in found["comments"]], ["Hello"])
+
+    def test_the_number_of_ids_is_limited(self):
+        ids = [str(ObjectId()) for _ in range(3)]
+
+        with mock.patch("apps.workflows.api.api.BATCH_GET_MAX_IDS", 2):
+            too_many = self.client.post(self.url, {"ids": ids}, format="json")
+            at_limit = self.client.post(self.url, {"ids": ids[:2]}, format="json")
+
+        self.assertEqual(too_many.status_code, 400)
+        self.assertEqual(too_many.data, {"error": "too_many_ids", "max": 2})
+        self.assertEqual(at_limit.status_code, 200)
+        self.assertEqual([r["status"] for r in at_limit.data["results"]], [404, 404])
+
+    def test_ids_must_be_a_non_empty_list(self):
+        for body in ({"ids": []}, {"ids": "abc"}, {}):
+            resp = self.client.post(self.url, body, format="json")
+
+            self.assertEqual(resp.status_code, 400)
+            self.assertEqual(resp.data["error"], "invalid_request")
+
+
+class JsonPatchTests(SimpleTestCase):
+    def apply(self, doc, operations):
+        return apply_operations(doc, parse_operations(operations))
+
+    def test_add_sets_keys_and_inserts_into_arrays(self):
+        doc = self.apply({"a": {}, "items": [1, 3]}, [
+            {"op": "add", "path": "/a/b", "value": 1},
+            {"op": "add", "path": "/items/1", "value": 2},
+            {"op": "add", "path": "/items/-", "value": 4},
+        ])
+
+        self.assertEqual(doc, {"a": {"b": 1}, "items": [1, 2, 3, 4]})
+
+    def test_replace_requires_an_existing_value(self):
+        self.assertEqual(self.apply({"a": 1}, [{"op": "replace", "path": "/a", "value": 2}]), {"a": 2})
+        with self.assertRaises(PatchError):
+            self.apply({"a": 1}, [{"op": "replace", "path": "/b", "value": 2}])
+
+    def test_remove_deletes_keys_and_array_items(self):
+        doc = self.apply({"a": 1, "b": 2, "items": [1, 2, 3]}, [
+            {"op": "remove", "path": "/a"},
+            {"op": "remove", "path": "/items/0"},
+        ])
+
+        self.assertEqual(doc, {"b": 2, "items": [2, 3]})
+        with self.assertRaises(PatchError):
+            self.apply({}, [{"op": "remove", "path": "/a"}])
+
+    def test_move_and_copy(self):
+        doc = self.apply({"a": {"x": [1]}, "b": {}}, [
+            {"op": "copy", "from": "/a/x", "path": "/b/y"},
+            {"op": "move", "from": "/a/x", "path": "/b/x"},
+        ])
+        doc["b"]["y"].append(2)
+
+        self.assertEqual(doc, {"a": {}, "b": {"x": [1], "y": [1, 2]}})
+
+    def test_a_value_cannot_move_into_its_own_child(self):
+        with self.assertRaises(PatchError):
+            self.apply({"a": {"b": {}}}, [{"op": "move", "from": "/a", "path": "/a/b/c"}])
+
+    def test_test_compares_the_current_value(self):
+        self.apply({"a": [1]}, [{"op": "test", "path": "/a", "value": [1]}])
+        with self.assertRaises(PatchTestFailed) as raised:
+            self.apply({"a": [1]}, [
+                {"op": "add", "path": "/b", "value": 1},
+                {"op": "test", "path": "/a", "value": [2]},
+            ])
+
+        self.assertEqual(raised.exception.index, 1)
+
+    def test_pointer_escapes(self):
+        doc = self.apply({"a/b": {"c~d": 1}}, [{"op": "replace", "path": "/a~1b/c~0d", "value": 2}])
+
+        self.assertEqual(doc, {"a/b": {"c~d": 2}})
+
+    def test_array_indexes_out_of_range_or_malformed(self):
+        for operation in (
+            {"op": "add", "path": "/items/3", "value": 0},
+            {"op": "replace", "path": "/items/2", "value": 0},
+            {"op": "replace", "path": "/items/-", "value": 0},
+            {"op": "remove", "path": "/items/01"},
+            {"op": "add", "path": "/items/x", "value": 0},
+        ):
+            with self.subTest(operation=operation), self.assertRaises(PatchError):
+                self.apply({"items": [1, 2]}, [operation])
+
+    def test_malformed_patches_are_rejected_before_applying(self):
+        for operations in (
+            [],
+            {"op": "add", "path": "/a", "value": 1},
+            [{"op": "merge", "path": "/a"}],
+            [{"op": "add", "path": "/a"}],
+            [{"op": "move", "path": "/a"}],
+            [{"op": "add", "path": "a", "value": 1}],
+            [{"op": "replace", "path": "", "value": {}}],
+        ):
+            with self.subTest(operations=operations), self.assertRaises(PatchError):
+                parse_operations(operations)
+
+    def test_touched_paths_include_move_sources_but_not_tests(self):
+        operations = parse_operations([
+            {"op": "test", "path": "/a", "value": 1},
+            {"op": "move", "from": "/a", "path": "/b"},
+        ])
+
+        self.assertEqual(touched_paths(operations), [("b",), ("a",)])
+
+
+class AttachmentLinkTokenTests(SimpleTestCase):
+    def test_a_link_is_stable_within_its_bucket(self):
+        window = storage.LINK_MAX_AGE // 2
+        start = 1000 * window
+
+        self.assertEqual(
+            storage.attachment_link_token("a1", now=start),
+            storage.attachment_link_token("a1", now=start + window - 1),
+        )
+
+    def test_a_link_expires_within_the_max_age(self):
+        window = storage.LINK_MAX_AGE // 2
+        token = storage.attachment_link_token("a1", now=1000 * window)
+
+        self.assertEqual(storage.read_attachment_link_token(token, now=1001 * window), "a1")
+        self.assertIsNone(storage.read_attachment_link_token(token, now=1002 * window))
+
+    def test_a_tampered_link_is_rejected(self):
+        token = storage.attachment_link_token("a1")
+
+        self.assertIsNone(storage.read_attachment_link_token("a2" + token[2:]))
+
+
+class BundlePrefetchTests(SimpleTestCase):
+    def test_a_producer_with_a_full_queue_exits_once_stopped(self):
+        out = queue.Queue(maxsize=1)
+        out.put(b"unread")
+        stop = threading.Event()
+        stop.set()
+
+        for failure in (None, OSError("connection reset")):
+            with mock.patch.object(storage, "get_s3_client") as get_s3_client, \
+                    mock.patch.object(storage, "bucket_name", return_value="attachments"):
+                body = get_s3_client.return_value.get_object.return_value["Body"]
+                body.iter_chunks.return_value = iter([])
+                if failure:
+                    body.iter_chunks.side_effect = failure
+                worker = threading.Thread(target=bundles._fetch, args=("blobs/a", out, stop))
+                worker.start()
+                worker.join(timeout=5)
+
+            self.assertFalse(worker.is_alive())
+
+
+class OrjsonRendererTests(SimpleTestCase):
+    def assertSameAsStdlib(self, data):
+        self.assertEqual(OrjsonRenderer().render(data), MongoJSONRenderer().render(data))
+
+    def test_workflow_payloads_render_as_with_the_stdlib(self):
+        self.assertSameAsStdlib({"count": 20, "results": [_workflow_payload(i) for i in range(20)]})
+        self.assertSameAsStdlib({"file": None, "size": 1.5, "ids": [ObjectId()], "text": " "})
+
+    def test_integers_beyond_64_bits_fall_back_to_the_stdlib(self):
+        self.assertSameAsStdlib({"n": 2 ** 64, "m": -(2 ** 70)})
+
+    def test_non_finite_floats_are_rejected_like_the_stdlib(self):
+        for value in (float("nan"), float("inf"), Decimal("-Infinity")):
+            for renderer in (MongoJSONRenderer(), OrjsonRenderer()):
+                with self.assertRaises(ValueError):
+                    renderer.render({"results": [{"value": value, "note": None}]})
+
+    def test_exponent_floats_keep_their_value(self):
+        data = {"big": 1e16, "small": 1e-05, "tiny": 1.5e-07}
+
+        self.assertEqual(json.loads(OrjsonRenderer().render(data)), json.loads(MongoJSONRenderer().render(data)))
+
+
+class FormValidationTests(SimpleTestCase):
+    def setUp(self):
+        self.form1, self.form2, self.form3 = (FormRegistry.get_form(n) for n in (1, 2, 3))
+
+    def form1_payload(self, **personal):
+        """Form 1 as the frontend first sends it: empty documents are null or ''"""
+        return {
+            "personalInformation": {
+                "firstName": "Ali", "lastName": "Ahmadi", "nationalCode": "0012345678",
+                "birthCertificateNumber": "", "residenceAddress": "", "mobileNumber": "", **personal,
+            },
+            "roleAndOwnership": {"role": "owner", "ownershipType": "mafruz"},
+            "submittedDocuments": {
+                "ownershipDeed": {"file": None, "type": "booklet"},
+                "benchagh": None,
+                "buildingPermit": {"file": None, "date": ""},
+                "certificateOfNoViolation": {"file": None, "date": ""},
+                "buildingCompletionCertificate": {"file": None, "date": ""},
+                "representationDocument": {"file": None, "type": "legal"},
+                "imageFiles": [],
+            },
+            "propertyRegistrationPlateNumber": "",
+        }
+
+    def test_the_default_form1_payload_is_valid(self):
+        self.assertEqual(self.form1.validate(self.form1_payload()), {})
+
+    def test_form1_errors_are_keyed_by_field_path(self):
+        data = self.form1_payload(nationalCode="12345", lastName="")
+        data["roleAndOwnership"]["role"] = "tenant"
+        data["submittedDocuments"]["buildingPermit"]["date"] = "1402-13-40"
+        data["submittedDocuments"]["imageFiles"] = ["a.jpg", 7]
+
+        self.assertEqual(self.form1.validate(data), {
+            "personalInformation.nationalCode": ["Invalid format."],
+            "personalInformation.lastName": ["This field is required."],
+            "roleAndOwnership.role": ["Must be one of: owner, representative."],
+            "submittedDocuments.buildingPermit.date": ["Expected a valid date."],
+            "submittedDocuments.imageFiles.1": ["Expected string."],
+        })
+
+    def test_form2_errors_are_keyed_by_field_path(self):
+        errors = self.form2.validate({
+            "applicantDetails": {"name": "", "nationalCode": "001234567a", "isRepresentative": "no"},
+            "agreement": {"signatureDate": "2024-02-30"},
+        })
+
+        self.assertEqual(errors, {
+            "applicantDetails.name": ["This field is required."],
+            "applicantDetails.nationalCode": ["Invalid format."],
+            "applicantDetails.isRepresentative": ["Expected boolean."],
+            "agreement.signatureDate": ["Expected a valid date."],
+        })
+
+    def test_form3_errors_are_keyed_by_field_path(self):
+        errors = self.form3.validate({
+            "requestDate": "2024-01-01",
+            "legalDeputyReport": {"isMortgaged": False, "description": 5},
+            "realEstateDeputyReport": {"propertyArea": "120", "levyBill": {"hasBill": True, "date": "soon"}},
+        })
+
+        self.assertEqual(errors, {
+            "legalDeputyReport.description": ["Expected string."],
+            "realEstateDeputyReport.propertyArea": ["Expected number."],
+            "realEstateDeputyReport.levyBill.date": ["Expected a valid date."],
+        })
+
+    def test_validate_at_checks_one_location(self):
+        validator = self.form1.get_validator()
+
+        self.assertEqual(validator.validate_at(["personalInformation", "nationalCode"], "0012345678"), {})
+        self.assertEqual(
+            validator.validate_at(["personalInformation", "nationalCode"], "12"),
+            {"personalInformation.nationalCode": ["Invalid format."]},
+        )
+        self.assertEqual(
+            validator.validate_at(["personalInformation", "firstName"], ""),
+            {"personalInformation.firstName": ["This field is required."]},
+        )
+        self.assertEqual(
+            validator.validate_at(["submittedDocuments", "imageFiles", "0"], 7),
+            {"submittedDocuments.imageFiles.0": ["Expected string."]},
+        )
+        self.assertEqual(validator.validate_at(["submittedDocuments", "imageFiles", "-"], "b.jpg"), {})
+        # Keys the schema does not describe are left alone, as by validate()
+        self.assertEqual(validator.validate_at(["personalInformation", "nickname"], 1), {})
+
+
+def _rule_based_form3_permissions(user_roles, step):
+    """Form3 permissions evaluated straight from the rules, as before the table"""
+    manager = Form3PermissionManager
+    permissions = {"visible_sections": [], "editable_sections": {}, "editable_fields": {},
+                   "can_act_in_current_step": False, "next_action": None}
+    for section, rules in manager.SECTION_VISIBILITY.items():
+        if not set(user_roles) & set(rules["visible_to"]):
+            continue
+        permissions["visible_sections"].append(section)
+        if set(user_roles) & set(rules["editable_by_step"].get(step, [])):
+            permissions["editable_sections"][section] = True
+            if fields := manager.FIELD_PERMISSIONS.get(section, {}).get(f"step_{step}_fields"):
+                permissions["editable_fields"][section] = set(fields)
+            permissions["can_act_in_current_step"] = True
+            permissions["next_action"] = manager._get_next_action(step)
+    return permissions
+
+
+class Form3PermissionTableTests(SimpleTestCase):
+    FORM_DATA = {
+        "formTitle": "Form 3", "formNumber": 3, "requestNumber": "r-1", "requestDate": "2024-01-01",
+        "clientName": "Ali", "legalDeputyReport": {"ownerName": "Ali"},
+        "realEstateDeputyReport": {"parcelNumber": "12"}, "finalApproval": {"ceoSignature": "s"},
+    }
+
+    def test_the_table_matches_the_rules_for_every_role_set_and_step(self):
+        # The Form3 roles and one the rules do not mention
+        roles = sorted(Form3PermissionManager.ROLE_BITS) + ["APPLICANT"]
+        for mask in range(1 << len(roles)):
+            user_roles = [role for index, role in enumerate(roles) if mask & (1 << index)]
+            for step in range(10):
+                expected = _rule_based_form3_permissions(user_roles, step)
+                permissions = Form3PermissionManager.get_user_permissions(None, user_roles, step)
+
+                self.assertEqual({
+                    "visible_sections": list(permissions["visible_sections"]),
+                    "editable_sections": dict(permissions["editable_sections"]),
+                    "editable_fields": {s: set(f) for s, f in permissions["editable_fields"].items()},
+                    "can_act_in_current_step": permissions["can_act_in_current_step"],
+                    "next_action": dict(permissions["next_action"]) if permissions["next_action"] else None,
+                }, expected, (user_roles, step))
+
+                visible = ["formTitle", "formNumber"]
+                for section in expected["visible_sections"]:
+                    if section == "basic_info":
+                        visible += ["requestNumber", "requestDate", "clientName"]
+                    else:
+                        visible.append(section)
+                self.assertEqual(
+                    Form3PermissionManager.filter_form_data_for_user(self.FORM_DATA, permissions),
+                    {key: self.FORM_DATA[key] for key in visible},
+                    (user_roles, step),
+                )
+
+
+class ComputeFieldsTests(SimpleTestCase):
+    def test_earlier_forms_take_precedence(self):
+        values = compute_fields({
+            "personalInformation": {"firstName": "Sara", "lastName": "Karimi"},
+            "applicantDetails": {"name": "Someone Else", "nationalCode": "0099999999"},
+            "propertyRegistrationPlateNumber": "123/45",
+            "propertyDetails": {"registrationPlateNumber": "999/1", "address": "Tehran"},
+        })
+
+        self.assertEqual(values, {
+            "applicant_name": "Sara Karimi",
+            # Form 1 has none, so Form 2's is used
+            "applicant_national_id": "0099999999",
+            "property_address": "Tehran",
+            "registration_plate_number": "123/45",
+        })
+
+    def test_fields_no_form_provides_get_their_defaults(self):
+        self.assertEqual(compute_fields({"personalInformation": {"firstName": ""}}), COMPUTED_FIELDS)
+
+
+class SparseFieldsTests(SimpleTestCase):
+    def context(self, action, query=""):
+        request = Request(APIRequestFactory().get(f"/api/workflows/?{query}"))
+        return {"request": request, "view": mock.Mock(action=action)}
+
+    def test_list_responses_leave_expandable_fields_out(self):
+        self.assertEqual(WorkflowSerializer.selected_fields(self.context("list")), [
+            "id", "title", "body", "state", "created_by", "created_at", "updated_at",
+            "applicant_name", "applicant_national_id",
+        ])
+        self.assertIn("comments", WorkflowSerializer.selected_fields(self.context("list", "expand=comments")))
+        self.assertIn("attachments", WorkflowSerializer.selected_fields(self.context("retrieve")))
+
+    def test_fields_keeps_the_id_and_the_fields_asked_for(self):
+        context = self.context("list", "fields=title,attachments,unknown&fields=state")
+
+        self.assertEqual(WorkflowSerializer.selected_fields(context), ["id", "title", "state", "attachments"])
+        self.assertEqual(list(WorkflowSerializer(context=context).fields), ["id", "title", "state", "attachments"])
+
+    def test_expand_adds_to_the_fields_asked_for(self):
+        context = self.context("retrieve", "fields=title&expand=comments")
+
+        self.assertEqual(WorkflowSerializer.selected_fields(context), ["id", "title", "comments"])
+
+    def test_the_projection_reads_the_selected_fields_and_the_state(self):
+        self.assertEqual(
+            WorkflowSerializer.projection(self.context("list", "fields=title")),
+            (["id", "state", "title"], []),
+        )
+        self.assertEqual(
+            WorkflowSerializer.projection(self.context("list", "fields=created_by")),
+            (["created_by__username", "id", "state"], ["created_by"]),
+        )
+
+    def test_the_projection_leaves_the_form_data_out_unless_expanded(self):
+        collapsed, _ = WorkflowFormSerializer.projection(self.context("list"))
+        expanded, _ = WorkflowFormSerializer.projection(self.context("list", "expand=data"))
+
+        self.assertNotIn("_data", collapsed)
+        self.assertIn("_data", expanded)
+        self.assertIn("state", collapsed)
@@ -0,0 +1,91 @@
+# apps/workflows/versioning.py
+"""
+Per-workflow version counter and the ETags derived from it.
+
+Every change to a workflow, its actions, comments or attachments bumps
+``Workflow.version`` (an atomic ``$inc`` after the write). Read endpoints
+answer ``304`` from a permission-checked lookup of that counter alone when
+the client already holds the current representation, without loading or
+serializing anything.
+"""
+import functools
+import hashlib
+
+from django.db.models import F
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from .models import Workflow
+from .permissions import get_user_roles
+from .storage import DOWNLOAD_URL_EXPIRES, LINK_MAX_AGE, _expiry_bucket
+
+
+def bump_version(workflow_id) -> None:
+    if workflow_id is not None:
+        Workflow.objects.filter(pk=workflow_id).update(version=F("version") + 1)
+
+
+def authorized_version(view, workflow_id):
+    """
+    The version of the workflow the view would serve, looked up like
+    ``get_object`` (the view's queryset and its object permissions) but
+    reading only that column; None when the id is malformed.
+    """
+    queryset = view.filter_queryset(view.get_queryset()).select_related(None).only("pk", "version")
+    try:
+        workflow = get_object_or_404(queryset, **{view.lookup_field: workflow_id})
+    except (ValueError, TypeError):
+        return None
+    view.check_object_permissions(view.request, workflow)
+    return workflow.version
+
+
+def workflow_etag(request, workflow_id, version) -> str:
+    """
+    ETag of one endpoint's representation of a workflow for this user. It
+    covers the URL (query parameters change the payload), the user and their
+    roles (can_approve, editable sections), and the signing window, so
+    embedded attachment URLs are never revalidated past their expiry.
+    """
+    window, _ = _expiry_bucket(min(DOWNLOAD_URL_EXPIRES, LINK_MAX_AGE))
+    raw = "|".join((
+        str(workflow_id),
+        str(version),
+        request.get_full_path(),
+        str(request.user.pk),
+        ",".join(get_user_roles(request.user)),
+        str(window),
+    ))
+    return '"%s"' % hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def conditional_on_workflow_version(view_method):
+    """
+    Decorate a detail view (or action) of a workflow: GET/HEAD requests whose
+    If-None-Match matches get 304 before the view runs, once the view's
+    queryset and object permissions admit the user; other responses are
+    tagged with the ETag for the version read before the view ran, so a
+    concurrent write can only make the tag older, never newer than the data.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return view_method(self, request, *args, **kwargs)
+
+        workflow_id = kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        version = authorized_version(self, workflow_id)
+        if version is None:
+            return view_method(self, request, *args, **kwargs)
+
+        etag = workflow_etag(request, workflow_id, version)
+        resp = get_conditional_response(request, etag=etag)
+        if resp is None:
+            resp = view_method(self, request, *args, **kwargs)
+            if resp.status_code != 200:
+                return resp
+        resp["ETag"] = etag
+        # Cacheable by the browser, but always revalidated
+        patch_cache_control(resp, private=True, no_cache=True)
+        return resp
+
+    return wrapper
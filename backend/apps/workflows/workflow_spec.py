@@ -43,4 +43,9 @@ ADVANCER_STEPS = {
     "Settlment":              [["RE_ACQUISITION_REGEN_LEAD"]],
 }
 
-NEXT_STATE = {s: STATE_ORDER[i+1] for i, s in enumerate(STATE_ORDER[:-1])}
\ No newline at end of file
+NEXT_STATE = {s: STATE_ORDER[i+1] for i, s in enumerate(STATE_ORDER[:-1])}
+
+# Every state but the terminal one. Filter with state__in=OPEN_STATES rather
+# than exclude(state=...): the backend turns the latter into a $expr, which
+# cannot use the state index
+OPEN_STATES = STATE_ORDER[:-1]
\ No newline at end of file
@@ -0,0 +1,51 @@
+# config/background.py
+import atexit
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """
+    Run ``func`` every ``interval`` seconds on a daemon thread.
+
+    The thread is started lazily by ``ensure_started`` so that forking servers
+    (gunicorn --preload) get one thread per worker, and ``func`` runs once
+    more at interpreter exit so buffered work is not lost on restart.
+    """
+
+    def __init__(self, name, func, interval):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._stop = threading.Event()
+            thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            thread.start()
+            if self._pid is None:
+                atexit.register(self._run_once)
+            self._pid = os.getpid()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._run_once()
+
+    def _run_once(self):
+        try:
+            self.func()
+        except Exception:
+            logger.exception("Periodic task %s failed", self.name)
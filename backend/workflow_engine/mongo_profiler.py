@@ -0,0 +1,215 @@
+# backend/workflow_engine/mongo_profiler.py
+"""
+Count the MongoDB commands each request (or block of code) sends.
+
+``command_listener`` is handed to the MongoClient through
+``DATABASES["default"]["OPTIONS"]["event_listeners"]`` and does nothing
+unless a profile is active in the current context, so it costs one
+ContextVar lookup per command otherwise. ``MongoProfilerMiddleware``
+profiles every request, reports it in a ``Server-Timing`` header and keeps
+the most recent ones for the admin debug endpoint; ``assert_max_commands``
+puts a command budget on a block of test code.
+"""
+import contextvars
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+import bson
+from pymongo import monitoring
+
+_active = contextvars.ContextVar("mongo_profiles", default=())
+
+
+class CommandProfile:
+    """Commands, time spent in them and bytes exchanged, as seen by the driver"""
+
+    def __init__(self, label=""):
+        self.label = label
+        self.commands = []  # (name, collection, duration ms, bytes sent, bytes received, ok)
+        self._started = {}
+
+    @property
+    def count(self):
+        return len(self.commands)
+
+    @property
+    def duration_ms(self):
+        return sum(c[2] for c in self.commands)
+
+    @property
+    def bytes_sent(self):
+        return sum(c[3] for c in self.commands)
+
+    @property
+    def bytes_received(self):
+        return sum(c[4] for c in self.commands)
+
+    def by_command(self):
+        """``{"find workflows_workflow": count, ...}``, most frequent first"""
+        return dict(Counter(f"{c[0]} {c[1]}".strip() for c in self.commands).most_common())
+
+    def as_dict(self):
+        return {
+            "label": self.label,
+            "commands": self.count,
+            "duration_ms": round(self.duration_ms, 2),
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "by_command": self.by_command(),
+        }
+
+    def server_timing(self):
+        kib = (self.bytes_sent + self.bytes_received) / 1024
+        return f'mongo;dur={self.duration_ms:.1f};desc="{self.count} commands, {kib:.1f} KiB"'
+
+
+def _size(document) -> int:
+    try:
+        return len(bson.encode(document))
+    except Exception:
+        return 0
+
+
+class _CommandListener(monitoring.CommandListener):
+    def started(self, event):
+        profiles = _active.get()
+        if not profiles:
+            return
+        command = event.command
+        # The collection is the value of the command's first key (find, aggregate, insert, ...)
+        target = command.get(event.command_name)
+        entry = (event.command_name, target if isinstance(target, str) else "", _size(command))
+        for profile in profiles:
+            profile._started[(event.connection_id, event.request_id)] = entry
+
+    def _finished(self, event, reply, ok):
+        for profile in _active.get():
+            entry = profile._started.pop((event.connection_id, event.request_id), None)
+            if entry is not None:
+                name, collection, sent = entry
+                received = _size(reply) if reply is not None else 0
+                profile.commands.append((name, collection, event.duration_micros / 1000, sent, received, ok))
+
+    def succeeded(self, event):
+        if _active.get():
+            self._finished(event, event.reply, True)
+
+    def failed(self, event):
+        if _active.get():
+            self._finished(event, None, False)
+
+
+command_listener = _CommandListener()
+
+
+@contextmanager
+def profile_commands(label=""):
+    """Record the commands sent inside the block; profiles may be nested"""
+    profile = CommandProfile(label)
+    token = _active.set(_active.get() + (profile,))
+    try:
+        yield profile
+    finally:
+        _active.reset(token)
+
+
+@contextmanager
+def assert_max_commands(limit, label=""):
+    """
+    Fail when the block sends more than ``limit`` commands, like Django's
+    assertNumQueries but counting what actually goes over the wire::
+
+        with assert_max_commands(4):
+            client.get("/api/workflows/inbox/")
+    """
+    with profile_commands(label) as profile:
+        yield profile
+    if profile.count > limit:
+        lines = "\n".join(f"  {count} x {name}" for name, count in profile.by_command().items())
+        raise AssertionError(
+            f"{label or 'block'} sent {profile.count} MongoDB commands, budget is {limit}:\n{lines}"
+        )
+
+
+class RecentProfiles:
+    """The last ``size`` request profiles of this worker"""
+
+    def __init__(self, size=200):
+        self._lock = threading.Lock()
+        self._items = deque(maxlen=size)
+
+    def add(self, item):
+        with self._lock:
+            self._items.append(item)
+
+    def items(self):
+        with self._lock:
+            return list(self._items)
+
+    def summary(self):
+        """Per endpoint: requests, average and worst command counts and time"""
+        endpoints = {}
+        for item in self.items():
+            row = endpoints.setdefault(item["endpoint"], {"requests": 0, "commands": 0, "max_commands": 0, "duration_ms": 0.0})
+            row["requests"] += 1
+            row["commands"] += item["commands"]
+            row["max_commands"] = max(row["max_commands"], item["commands"])
+            row["duration_ms"] += item["duration_ms"]
+        return sorted(
+            (
+                {
+                    "endpoint": endpoint,
+                    "requests": row["requests"],
+                    "avg_commands": round(row["commands"] / row["requests"], 1),
+                    "max_commands": row["max_commands"],
+                    "avg_duration_ms": round(row["duration_ms"] / row["requests"], 2),
+                }
+                for endpoint, row in endpoints.items()
+            ),
+            key=lambda row: row["max_commands"],
+            reverse=True,
+        )
+
+
+recent = RecentProfiles()
+
+
+class MongoProfilerMiddleware:
+    """
+    Profile every request: adds ``Server-Timing: mongo;dur=...`` and keeps
+    the profile for ``/api/admin/mongo-profile/``. Enabled by the
+    ``MONGO_PROFILING`` setting (DEBUG by default).
+    """
+
+    def __init__(self, get_response):
+        from django.conf import settings
+        from django.core.exceptions import MiddlewareNotUsed
+
+        if not getattr(settings, "MONGO_PROFILING", settings.DEBUG):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with profile_commands(request.path) as profile:
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - start) * 1000
+
+        timing = f'{profile.server_timing()}, app;dur={total_ms:.1f}'
+        if response.has_header("Server-Timing"):
+            timing = f'{response["Server-Timing"]}, {timing}'
+        response["Server-Timing"] = timing
+
+        match = getattr(request, "resolver_match", None)
+        route = match.route if match is not None else request.path
+        recent.add({
+            "endpoint": f"{request.method} /{route.lstrip('/')}",
+            "path": request.get_full_path(),
+            "status": response.status_code,
+            "total_ms": round(total_ms, 2),
+            "at": time.time(),
+            **profile.as_dict(),
+        })
+        return response
@@ -1,5 +1,6 @@
 import os
 import workflow_engine.drf_mongo
+from workflow_engine.mongo_profiler import command_listener
 from datetime import timedelta
 from pathlib import Path
 from dotenv import load_dotenv
@@ -35,6 +36,9 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    "workflow_engine.tracing.TracingMiddleware",
+    "workflow_engine.metrics.MetricsMiddleware",
+    "workflow_engine.mongo_profiler.MongoProfilerMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -43,6 +47,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "apps.admin.presence.PresenceMiddleware",
 ]
 
 ROOT_URLCONF = "workflow_engine.urls"
@@ -89,6 +94,10 @@ DATABASES = {
         )
     }
 }
+# Counts commands per request (Server-Timing header, /api/admin/mongo-profile/)
+DATABASES["default"].setdefault("OPTIONS", {})["event_listeners"] = [command_listener]
+MONGO_PROFILING = os.getenv("MONGO_PROFILING", "1" if DEBUG else "0") in ("1", "true", "True")
+
 DEFAULT_AUTO_FIELD = "django_mongodb_backend.fields.ObjectIdAutoField"
 DATABASE_ROUTERS = ["django_mongodb_backend.routers.MongoRouter"]
 
@@ -103,6 +112,19 @@ AWS_S3_ADDRESSING_STYLE = "path"
 AWS_S3_SIGNATURE_VERSION = "s3v4"
 AWS_S3_VERIFY = os.getenv("MINIO_USE_SSL","0") == "1"
 DEFAULT_FILE_STORAGE = "storages.backends.s3boto3.S3Boto3Storage"
+# Browsers reach MinIO at a different address than the backend container does
+AWS_S3_PUBLIC_ENDPOINT_URL = os.getenv("MINIO_PUBLIC_ENDPOINT", AWS_S3_ENDPOINT_URL)
+ATTACHMENT_UPLOAD_URL_EXPIRES = int(os.getenv("ATTACHMENT_UPLOAD_URL_EXPIRES", "900"))
+ATTACHMENT_DOWNLOAD_URL_EXPIRES = int(os.getenv("ATTACHMENT_DOWNLOAD_URL_EXPIRES", "3600"))
+# "lazy" renders attachment links as a redirect endpoint signed on click, "eager" as presigned GETs
+ATTACHMENT_URL_MODE = os.getenv("ATTACHMENT_URL_MODE", "lazy")
+# A lazy link works without a bearer header (browsers do not send one on <a>/<img>),
+# so whoever holds it can open the file until it expires, like a presigned GET.
+# Keep it no longer than the presigned GET it redirects to.
+ATTACHMENT_LINK_MAX_AGE = int(os.getenv("ATTACHMENT_LINK_MAX_AGE", str(ATTACHMENT_DOWNLOAD_URL_EXPIRES)))
+ATTACHMENT_MAX_UPLOAD_SIZE = int(os.getenv("ATTACHMENT_MAX_UPLOAD_SIZE", str(100 * 1024 * 1024)))
+ATTACHMENT_UPLOAD_PART_SIZE = int(os.getenv("ATTACHMENT_UPLOAD_PART_SIZE", str(8 * 1024 * 1024)))
+ATTACHMENT_MAX_MULTIPART_SIZE = int(os.getenv("ATTACHMENT_MAX_MULTIPART_SIZE", str(2 * 1024 * 1024 * 1024)))
 
 STATIC_URL = "/static/"
 STATIC_ROOT = BASE_DIR / "static"
@@ -111,10 +133,15 @@ STATIC_ROOT = BASE_DIR / "static"
 REST_FRAMEWORK = {
     # ...
     "DEFAULT_RENDERER_CLASSES": [
-        "workflow_engine.encoders.MongoJSONRenderer",  # <= use custom encoder
+        "workflow_engine.encoders.OrjsonRenderer",  # <= orjson, same JSON as MongoJSONRenderer
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "workflow_engine.encoders.OrjsonParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "apps.accounts.authentication.ClaimsJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
@@ -126,8 +153,37 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
     "SIGNING_KEY": os.getenv("JWT_AUTH_SECRET", "jwt-auth-secret"),
     "ALGORITHM": os.getenv("JWT_SIGN_ALG", "HS256"),
+    # Refreshed access tokens re-read the role claims instead of copying them
+    "TOKEN_REFRESH_SERIALIZER": "apps.accounts.tokens.RoleClaimsTokenRefreshSerializer",
 }
 
+# Role claims in access tokens are trusted while the user's membership
+# version matches; this is how long the version is cached. CACHES is not
+# configured, so that cache is each worker's own local memory: a bump is seen
+# at once by the worker that made it and up to this many seconds later by the
+# others. Point CACHES at a shared backend to make revocation immediate.
+MEMBERSHIP_VERSION_CACHE_TTL = int(os.getenv("MEMBERSHIP_VERSION_CACHE_TTL", "30"))
+
+# ==== Online users (admin panel) ====
+PRESENCE_FLUSH_INTERVAL = int(os.getenv("PRESENCE_FLUSH_INTERVAL", "30"))  # seconds between batched writes
+PRESENCE_TTL = int(os.getenv("PRESENCE_TTL", "300"))                         # presence rows expire after this
+PRESENCE_ONLINE_WINDOW = int(os.getenv("PRESENCE_ONLINE_WINDOW", "300"))     # "online" means seen within this
+
+# ==== Form autosave drafts ====
+FORM_DRAFT_PERSIST_INTERVAL = int(os.getenv("FORM_DRAFT_PERSIST_INTERVAL", "5"))  # seconds between buffered draft writes
+FORM_DRAFT_FLUSH_DELAY = int(os.getenv("FORM_DRAFT_FLUSH_DELAY", "60"))            # idle drafts are written to the workflow
+
+# ==== Prometheus metrics (/metrics) ====
+# Directory shared by all worker processes; unset means per-process metrics
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR", "")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")  # bearer token the scraper must send, if set
+
+# ==== Tracing (OpenTelemetry) ====
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "")            # "file", "otlp" or empty for stage histograms only
+TRACING_SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "0.01"))  # share of requests whose spans are exported
+TRACING_FILE = os.getenv("TRACING_FILE", str(BASE_DIR / "traces-{pid}.jsonl"))
+TRACING_OTLP_ENDPOINT = os.getenv("TRACING_OTLP_ENDPOINT", "")   # e.g. http://otel-collector:4318/v1/traces
+
 # ==== CORS ====
 CORS_ALLOW_ALL_ORIGINS = True
 
@@ -0,0 +1,146 @@
+# backend/workflow_engine/tracing.py
+"""
+Tracing spans for the approval pipeline (OpenTelemetry).
+
+``span("approval.insert_action", workflow_id=...)`` times one stage. Every
+stage's duration goes to the ``wfengine_stage_duration_seconds{stage}``
+histogram, so per-stage breakdowns are always on in production; the span
+itself is recorded for the sampled share of requests (``TRACING_SAMPLE_RATE``,
+decided once per request by ``TracingMiddleware``, which also continues an
+incoming W3C ``traceparent``). Finished spans go to ``TRACING_EXPORTER``:
+
+- ``file``: one JSON span per line appended to ``TRACING_FILE``
+  (``{pid}`` in the name gives each worker its own file)
+- ``otlp``: an OpenTelemetry collector at ``TRACING_OTLP_ENDPOINT``
+  (needs opentelemetry-exporter-otlp-proto-http)
+- empty: no spans, stage histograms only
+
+Without opentelemetry-sdk installed spans are no-ops as well.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+
+from .metrics import STAGE_SECONDS
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.propagate import extract
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+except ImportError:  # optional: spans are only exported when it is installed
+    trace = None
+
+EXPORTER = getattr(settings, "TRACING_EXPORTER", "")
+SAMPLE_RATE = getattr(settings, "TRACING_SAMPLE_RATE", 0.01)
+TRACE_FILE = getattr(settings, "TRACING_FILE", "traces-{pid}.jsonl")
+OTLP_ENDPOINT = getattr(settings, "TRACING_OTLP_ENDPOINT", None)
+SERVICE_NAME = getattr(settings, "TRACING_SERVICE_NAME", "wfengine-backend")
+
+
+class _NoopSpan:
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+    def update_name(self, name):
+        pass
+
+    def is_recording(self):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+_lock = threading.Lock()
+_tracer = None
+_configured = False
+
+
+def _exporter():
+    if EXPORTER == "file":
+        path = TRACE_FILE.format(pid=os.getpid())
+        return ConsoleSpanExporter(
+            out=open(path, "a", buffering=1, encoding="utf-8"),
+            formatter=lambda span: span.to_json(indent=None) + "\n",
+        )
+    if EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter(endpoint=OTLP_ENDPOINT) if OTLP_ENDPOINT else OTLPSpanExporter()
+    raise ValueError(f"Unknown TRACING_EXPORTER {EXPORTER!r} (expected 'file' or 'otlp')")
+
+
+def get_tracer():
+    """The process's tracer, set up on first use (after any fork); None when tracing is off"""
+    global _tracer, _configured
+    if _configured:
+        return _tracer
+    with _lock:
+        if not _configured:
+            if trace is not None and EXPORTER:
+                provider = TracerProvider(
+                    resource=Resource.create({"service.name": SERVICE_NAME}),
+                    sampler=ParentBased(TraceIdRatioBased(SAMPLE_RATE)),
+                )
+                provider.add_span_processor(BatchSpanProcessor(_exporter()))
+                _tracer = provider.get_tracer(__name__)
+            _configured = True
+    return _tracer
+
+
+@contextmanager
+def span(name, **attributes):
+    """Time the block as stage ``name`` and, when sampled, record it as a span"""
+    tracer = get_tracer()
+    start = time.perf_counter()
+    try:
+        if tracer is None:
+            yield _NOOP_SPAN
+        else:
+            with tracer.start_as_current_span(name, attributes=attributes or None) as current:
+                yield current
+    finally:
+        STAGE_SECONDS.labels(name).observe(time.perf_counter() - start)
+
+
+def traced(name):
+    """Decorator form of ``span``"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TracingMiddleware:
+    """Open the request's root span, so each sampled request is one trace"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        tracer = get_tracer()
+        if tracer is None:
+            return self.get_response(request)
+
+        with tracer.start_as_current_span(
+            f"HTTP {request.method}", context=extract(request.headers), kind=trace.SpanKind.SERVER,
+        ) as root:
+            response = self.get_response(request)
+            if root.is_recording():
+                match = getattr(request, "resolver_match", None)
+                if match is not None:
+                    root.update_name(f"{request.method} {match.view_name}")
+                    root.set_attribute("http.route", match.route)
+                root.set_attribute("http.request.method", request.method)
+                root.set_attribute("http.response.status_code", response.status_code)
+            return response
@@ -2,23 +2,28 @@
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from rest_framework_simplejwt.views import TokenRefreshView
 
-from apps.workflows.api.api import WorkflowViewSet,AttachmentViewSet
+from apps.workflows.api.api import WorkflowViewSet,AttachmentViewSet,UploadSessionViewSet
 from apps.workflows.api.views import WorkflowFormViewSet
 from apps.accounts.api import AuthView, MeView
+from workflow_engine.metrics import metrics_view
 
 router = DefaultRouter()
 router.register(r"workflows", WorkflowViewSet, basename="workflows")
 router.register(r'workflow-forms', WorkflowFormViewSet, basename='workflow-forms')
 router.register(r"attachments", AttachmentViewSet, basename="attachments")
+router.register(r"uploads", UploadSessionViewSet, basename="uploads")
 
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/auth/", AuthView.as_view(), name="auth"),
+    path("api/auth/refresh/", TokenRefreshView.as_view(), name="auth-refresh"),
     path("api/me/", MeView.as_view(), name="me"),
     path("api/admin/", include("apps.admin.urls")),  # Add admin routes
     path("api/", include(router.urls)),
+    path("metrics", metrics_view, name="metrics"),
 ]
 
 for url_pattern in router.urls:
@@ -64,16 +64,132 @@ api.interceptors.response.use(
     }
 );
 
-// Add this method to your existing API client
+const sha256Hex = async (file) => {
+    const digest = await crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+    return Array.from(new Uint8Array(digest), (b) => b.toString(16).padStart(2, '0')).join('');
+};
+
+// Upload straight to MinIO with a presigned PUT, then register the attachment.
+// With the SHA-256, MinIO verifies the upload, and content already attached to this
+// workflow or by this user is attached again without uploading.
 export const uploadAttachment = async (workflowId, file, name) => {
-    const formData = new FormData();
-    formData.append('file', file);
-    formData.append('name', name);
-    formData.append('workflow', workflowId);
+    const contentType = file.type || 'application/octet-stream';
+    // crypto.subtle is only available in secure contexts
+    const sha256 = window.isSecureContext ? await sha256Hex(file) : undefined;
+    const { data: upload } = await api.post('/attachments/presign/', {
+        workflow: workflowId,
+        filename: file.name,
+        name: name || file.name,
+        content_type: contentType,
+        size: file.size,
+        sha256,
+    });
 
-    return api.post('/attachments/', formData, {
-        headers: { 'Content-Type': 'multipart/form-data' }
+    if (upload.deduplicated) {
+        return { data: upload.attachment };
+    }
+
+    // Plain axios: the presigned URL must not carry our Authorization header
+    await axios.put(upload.upload_url, file, {
+        headers: upload.headers,
+        timeout: 0,
     });
+
+    return api.post('/attachments/complete/', { upload_token: upload.upload_token });
 };
 
+// Most part URLs sign_parts returns per request (MAX_SIGNED_PARTS_PER_REQUEST)
+const SIGN_BATCH_SIZE = 100;
+
+// Resumable multipart upload for large scans: parts go to MinIO in parallel
+// and an interrupted upload continues from the parts MinIO already holds.
+export const uploadAttachmentResumable = async (workflowId, file, name, { concurrency = 4, onProgress } = {}) => {
+    const resumeKey = `upload:${workflowId}:${file.name}:${file.size}:${file.lastModified}`;
+    let session = null;
+
+    const savedId = localStorage.getItem(resumeKey);
+    let assembled = false;
+    if (savedId) {
+        try {
+            const { data } = await api.get(`/uploads/${savedId}/`);
+            if (data.status === 'ACTIVE') session = data;
+            assembled = data.status === 'ASSEMBLED';
+        } catch (err) {
+            localStorage.removeItem(resumeKey);
+        }
+    }
+    if (assembled) {
+        // An earlier attempt assembled the parts; only the completion is left
+        const result = await api.post(`/uploads/${savedId}/complete/`);
+        localStorage.removeItem(resumeKey);
+        return result;
+    }
+    if (!session) {
+        const { data } = await api.post('/uploads/', {
+            workflow: workflowId,
+            filename: file.name,
+            name: name || file.name,
+            content_type: file.type || 'application/octet-stream',
+            size: file.size,
+        });
+        session = data;
+        localStorage.setItem(resumeKey, session.id);
+    }
+
+    const done = new Set(session.uploaded_parts);
+    const queue = [];
+    for (let partNumber = 1; partNumber <= session.part_count; partNumber++) {
+        if (!done.has(partNumber)) queue.push(partNumber);
+    }
+
+    // Part URLs are signed a batch at a time as the workers reach them: the
+    // server signs at most SIGN_BATCH_SIZE per request and the URLs expire
+    const urls = {};
+    let signing = null;
+    const urlFor = async (partNumber) => {
+        while (!urls[partNumber]) {
+            if (!signing) {
+                const batch = [partNumber, ...queue.slice(0, SIGN_BATCH_SIZE - 1)];
+                signing = api.post(`/uploads/${session.id}/sign_parts/`, { part_numbers: batch })
+                    .then(({ data }) => Object.assign(urls, data.urls))
+                    .finally(() => { signing = null; });
+            }
+            await signing;
+        }
+        return urls[partNumber];
+    };
+
+    const worker = async () => {
+        while (queue.length) {
+            const partNumber = queue.shift();
+            const start = (partNumber - 1) * session.part_size;
+            const blob = file.slice(start, Math.min(start + session.part_size, file.size));
+            const res = await axios.put(await urlFor(partNumber), blob, { timeout: 0 });
+            await api.post(`/uploads/${session.id}/parts/`, {
+                part_number: partNumber,
+                etag: res.headers.etag,
+                size: blob.size,
+            });
+            done.add(partNumber);
+            onProgress?.(done.size / session.part_count);
+        }
+    };
+    await Promise.all(Array.from({ length: concurrency }, worker));
+
+    const result = await api.post(`/uploads/${session.id}/complete/`);
+    localStorage.removeItem(resumeKey);
+    return result;
+};
+
+// Autosave: partial edits are merged server-side and reach the workflow once idle
+export const getFormDraft = (workflowId, formNumber) =>
+    api.get(`/workflow-forms/${workflowId}/forms/${formNumber}/draft/`);
+
+export const saveFormDraft = (workflowId, formNumber, partial) =>
+    api.put(`/workflow-forms/${workflowId}/forms/${formNumber}/draft/`, partial);
+
+// Write the draft now, e.g. when the editor is closed
+export const flushFormDraft = (workflowId, formNumber) =>
+    api.post(`/workflow-forms/${workflowId}/forms/${formNumber}/draft/flush/`);
+
 export default api;
\ No newline at end of file
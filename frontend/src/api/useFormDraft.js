@@ -0,0 +1,76 @@
+// src/api/useFormDraft.js
+import { useCallback, useEffect, useRef } from 'react';
+import { flushFormDraft, saveFormDraft } from './client';
+
+// Typing pauses this long before the edited sections are sent
+const AUTOSAVE_DELAY = 1000;
+
+/**
+ * Autosave a form as a server-side draft: the top-level sections changed
+ * since the last save are sent after a pause in typing, and the draft is
+ * written to the workflow when the form closes (or by the server once idle).
+ *
+ * Call `settle()` before submitting the form: it drops unsent edits (the
+ * submission carries them) and waits for a save in flight, so no autosave
+ * lands after the submission and revives its discarded draft.
+ */
+export default function useFormDraft(workflowId, formNumber, formData, enabled) {
+    const latest = useRef(formData);
+    const saved = useRef(formData);
+    const wasEnabled = useRef(false);
+    const timer = useRef(null);
+    const inFlight = useRef(Promise.resolve());
+    const unflushed = useRef(false);
+    latest.current = formData;
+
+    const send = useCallback(() => {
+        timer.current = null;
+        const partial = {};
+        for (const [section, value] of Object.entries(latest.current)) {
+            if (value !== saved.current[section]) partial[section] = value;
+        }
+        saved.current = latest.current;
+        if (!Object.keys(partial).length) return inFlight.current;
+
+        unflushed.current = true;
+        inFlight.current = inFlight.current
+            .then(() => saveFormDraft(workflowId, formNumber, partial))
+            .catch(err => console.error('Autosave failed:', err));
+        return inFlight.current;
+    }, [workflowId, formNumber]);
+
+    useEffect(() => {
+        // Data loaded while disabled (or on enabling) is the baseline, not an edit
+        const starting = enabled && !wasEnabled.current;
+        wasEnabled.current = enabled;
+        if (!enabled || starting) {
+            saved.current = formData;
+            return;
+        }
+        if (formData === saved.current) return;
+        clearTimeout(timer.current);
+        timer.current = setTimeout(send, AUTOSAVE_DELAY);
+    }, [formData, enabled, send]);
+
+    useEffect(() => () => {
+        if (timer.current) {
+            clearTimeout(timer.current);
+            send();
+        }
+        if (unflushed.current) {
+            inFlight.current
+                .then(() => flushFormDraft(workflowId, formNumber))
+                .catch(err => console.error('Draft flush failed:', err));
+        }
+    }, [workflowId, formNumber, send]);
+
+    const settle = useCallback(() => {
+        clearTimeout(timer.current);
+        timer.current = null;
+        saved.current = latest.current;
+        unflushed.current = false;
+        return inFlight.current;
+    }, []);
+
+    return { settle };
+}
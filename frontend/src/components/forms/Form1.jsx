@@ -1,7 +1,8 @@
 // frontend/src/components/forms/Form1.jsx
 import React, { useState, useEffect } from 'react';
 import { User, FileText, Upload, Calendar, X, Check, AlertCircle, Save, ArrowRight } from 'lucide-react';
-import api from '../../api/client';
+import api, { getFormDraft, uploadAttachment } from '../../api/client';
+import useFormDraft from '../../api/useFormDraft';
 
 const FormField = ({ label, required, error, helper, children }) => (
     <div className="space-y-2">
@@ -31,15 +32,7 @@ const FileUpload = ({ label, accept, onUpload, currentFile, onRemove, required,
         
         setUploading(true);
         try {
-            const formData = new FormData();
-            formData.append('file', file);
-            formData.append('name', file.name);
-            formData.append('workflow', workflowId)
-
-            const response = await api.post('/attachments/', formData, {
-                headers: { 'Content-Type': 'multipart/form-data' }
-            });
-            console.log(response.data.file);
+            const response = await uploadAttachment(workflowId, file, file.name);
             
             onUpload(response.data.file); // URL to the uploaded file
         } catch (err) {
@@ -91,7 +84,7 @@ const FileUpload = ({ label, accept, onUpload, currentFile, onRemove, required,
     );
 };
 
-export default function Form1({ workflowId, isEditable, onSave, onSubmit }) {
+export default function Form1({ workflowId, initialData, isEditable, onSave, onSubmit }) {
     const [formData, setFormData] = useState({
         personalInformation: {
             firstName: '',
@@ -123,6 +116,7 @@ export default function Form1({ workflowId, isEditable, onSave, onSubmit }) {
     const [saving, setSaving] = useState(false);
     const [submitting, setSubmitting] = useState(false);
     const [errors, setErrors] = useState({});
+    const draft = useFormDraft(workflowId, 1, formData, isEditable && !loading);
 
     // Load existing form data
     useEffect(() => {
@@ -132,13 +126,17 @@ export default function Form1({ workflowId, isEditable, onSave, onSubmit }) {
     const loadFormData = async () => {
         try {
             setLoading(true);
-            const response = await api.get(`/workflow-forms/${workflowId}/forms/1/`);
-            if (response.data.data) {
-                setFormData(prev => ({
-                    ...prev,
-                    ...response.data.data
-                }));
-            }
+            const [data, saved] = await Promise.all([
+                // The detail page's snapshot already holds the current form
+                initialData ?? api.get(`/workflow-forms/${workflowId}/forms/1/`).then(r => r.data.data),
+                // Edits autosaved but not yet written to the workflow
+                isEditable ? getFormDraft(workflowId, 1).catch(() => null) : null,
+            ]);
+            setFormData(prev => ({
+                ...prev,
+                ...data,
+                ...saved?.data.data
+            }));
         } catch (err) {
             console.error('Failed to load form data:', err);
         } finally {
@@ -201,6 +199,7 @@ export default function Form1({ workflowId, isEditable, onSave, onSubmit }) {
 
         try {
             setSaving(true);
+            await draft.settle();
             await api.post(`/workflow-forms/${workflowId}/forms/1/`, formData);
             onSave?.();
         } catch (err) {
@@ -216,6 +215,7 @@ export default function Form1({ workflowId, isEditable, onSave, onSubmit }) {
         try {
             setSubmitting(true);
             // Save form data
+            await draft.settle();
             await api.post(`/workflow-forms/${workflowId}/forms/1/`, formData);
             // Move to next state
              await api.post(`/workflows/${workflowId}/perform_action/`, { 
@@ -1,7 +1,8 @@
 // frontend/src/components/forms/Form2.jsx
 import React, { useState, useEffect } from 'react';
 import { User, FileText, Calendar, X, Check, AlertCircle, Save, ArrowRight, UserCheck, Building } from 'lucide-react';
-import api from '../../api/client';
+import api, { getFormDraft } from '../../api/client';
+import useFormDraft from '../../api/useFormDraft';
 
 const FormField = ({ label, required, error, helper, children }) => (
     <div className="space-y-2">
@@ -33,7 +34,7 @@ const DateInput = ({ value, onChange, disabled, placeholder }) => (
     />
 );
 
-export default function Form2({ workflowId, isEditable, onSave, onSubmit }) {
+export default function Form2({ workflowId, initialData, isEditable, onSave, onSubmit }) {
     const [formData, setFormData] = useState({
         applicantDetails: {
             name: '',
@@ -60,6 +61,7 @@ export default function Form2({ workflowId, isEditable, onSave, onSubmit }) {
     const [saving, setSaving] = useState(false);
     const [submitting, setSubmitting] = useState(false);
     const [errors, setErrors] = useState({});
+    const draft = useFormDraft(workflowId, 2, formData, isEditable && !loading);
 
     // Load existing form data
     useEffect(() => {
@@ -69,13 +71,17 @@ export default function Form2({ workflowId, isEditable, onSave, onSubmit }) {
     const loadFormData = async () => {
         try {
             setLoading(true);
-            const response = await api.get(`/workflow-forms/${workflowId}/forms/2/`);
-            if (response.data.data) {
-                setFormData(prev => ({
-                    ...prev,
-                    ...response.data.data
-                }));
-            }
+            const [data, saved] = await Promise.all([
+                // The detail page's snapshot already holds the current form
+                initialData ?? api.get(`/workflow-forms/${workflowId}/forms/2/`).then(r => r.data.data),
+                // Edits autosaved but not yet written to the workflow
+                isEditable ? getFormDraft(workflowId, 2).catch(() => null) : null,
+            ]);
+            setFormData(prev => ({
+                ...prev,
+                ...data,
+                ...saved?.data.data
+            }));
         } catch (err) {
             console.error('Failed to load form data:', err);
         } finally {
@@ -133,6 +139,7 @@ export default function Form2({ workflowId, isEditable, onSave, onSubmit }) {
 
         try {
             setSaving(true);
+            await draft.settle();
             await api.post(`/workflow-forms/${workflowId}/forms/2/`, formData);
             onSave?.();
         } catch (err) {
@@ -148,6 +155,7 @@ export default function Form2({ workflowId, isEditable, onSave, onSubmit }) {
         try {
             setSubmitting(true);
             // Save form data
+            await draft.settle();
             await api.post(`/workflow-forms/${workflowId}/forms/2/`, formData);
             // Move to next state
             await api.post(`/workflows/${workflowId}/approve/`);
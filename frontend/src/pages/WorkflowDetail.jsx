@@ -97,6 +97,7 @@ export default function WorkflowDetail() {
     const [showSensitive, setShowSensitive] = useState(false);
     const [approving, setApproving] = useState(false);
     const [workflowStatus, setWorkflowStatus] = useState(null); // ✅ NEW: Separate status state
+    const [snapshot, setSnapshot] = useState(null);
 
     // State progression order
     const stateProgression = [
@@ -118,14 +119,17 @@ export default function WorkflowDetail() {
 
     useEffect(() => {
         fetchLetter();
-        fetchWorkflowStatus();
     }, [id]);
 
+    // One round trip for the workflow, its approval status (including can_approve),
+    // actions, comments and the current form
     const fetchLetter = async () => {
         try {
             setLoading(true);
-            const response = await api.get(`/workflows/${id}/`);
-            setLetter(response.data);
+            const response = await api.get(`/workflows/${id}/snapshot/`);
+            setLetter(response.data.workflow);
+            setWorkflowStatus(response.data.status);
+            setSnapshot(response.data);
         } catch (err) {
             setError(err.response?.data?.detail || 'خطا در بارگذاری جزئیات درخواست');
         } finally {
@@ -133,17 +137,6 @@ export default function WorkflowDetail() {
         }
     };
 
-    // ✅ NEW: Fetch accurate workflow status including can_approve
-    const fetchWorkflowStatus = async () => {
-        try {
-            const response = await api.get(`/workflows/${id}/status/`);
-            setWorkflowStatus(response.data);
-        } catch (err) {
-            console.error('Error fetching workflow status:', err);
-            // Don't set error here as the main workflow fetch might still succeed
-        }
-    };
-
     const handleApprove = async () => {
         // ✅ IMPROVED: Use workflowStatus for accurate can_approve check
         const canApprove = workflowStatus?.can_approve || false;
@@ -164,7 +157,7 @@ export default function WorkflowDetail() {
                 // Handle error (could add toast notification here)
             } else {
                 // ✅ IMPROVED: Refresh both letter and status
-                await Promise.all([fetchLetter(), fetchWorkflowStatus()]);
+                await fetchLetter();
             }
         } catch (err) {
             console.error('Approval failed:', err);
@@ -212,6 +205,10 @@ export default function WorkflowDetail() {
             </div>
         );
     }
+    // The snapshot carries the form of the current state; other forms load their own data
+    const currentFormData = (formNumber) =>
+        snapshot?.form?.form_number === formNumber ? snapshot.form.data : undefined;
+
     // Remove the generic FormTab component and add this instead:
 const renderFormContent = (tabId, letter, accessibility) => {
     const { isLocked, isEditable } = accessibility;
@@ -235,13 +232,13 @@ const renderFormContent = (tabId, letter, accessibility) => {
             return (
                 <Form1 
                     workflowId={letter.id}
+                    initialData={currentFormData(1)}
                     isEditable={isEditable}
                     onSave={() => {
                         fetchLetter();
                     }}
                     onSubmit={() => {
                         fetchLetter();
-                        fetchWorkflowStatus();
                     }}
                 />
             );
@@ -250,13 +247,13 @@ const renderFormContent = (tabId, letter, accessibility) => {
             return (
                 <Form2 
                     workflowId={letter.id}
+                    initialData={currentFormData(2)}
                     isEditable={isEditable}
                     onSave={() => {
                         fetchLetter();
                     }}
                     onSubmit={() => {
                         fetchLetter();
-                        fetchWorkflowStatus();
                     }}
                 />
             );
@@ -449,6 +446,23 @@ const renderFormContent = (tabId, letter, accessibility) => {
                                     </div>
                                 </div>
                             )}
+
+                            {snapshot?.actions?.length > 0 && (
+                                <div className="space-y-2">
+                                    {snapshot.actions.map(action => (
+                                        <div key={action.id} className="flex items-center justify-between p-3 bg-surface rounded-xl border">
+                                            <div className="flex items-center gap-2">
+                                                <StateChip label={action.state} size="small" />
+                                                <span className="text-sm text-text-primary">{action.action_type}</span>
+                                                <span className="text-sm text-text-secondary">{action.performer}</span>
+                                            </div>
+                                            <span className="text-xs text-text-secondary">
+                                                {new Date(action.created_at).toLocaleDateString('fa-IR')}
+                                            </span>
+                                        </div>
+                                    ))}
+                                </div>
+                            )}
                         </div>
                     )}
                     
@@ -458,10 +472,26 @@ const renderFormContent = (tabId, letter, accessibility) => {
                                 <MessageSquare className="w-5 h-5 text-primary-500" />
                                 نظرات و تاریخچه
                             </h3>
-                            <div className="text-center py-8 text-text-secondary">
-                                <MessageSquare className="w-12 h-12 mx-auto mb-3 opacity-50" />
-                                <p>هنوز نظری ثبت نشده است</p>
-                            </div>
+                            {snapshot?.comments?.length > 0 ? (
+                                <div className="space-y-3">
+                                    {snapshot.comments.map(comment => (
+                                        <div key={comment.id} className="p-4 bg-surface rounded-xl border">
+                                            <div className="flex items-center justify-between mb-2">
+                                                <span className="text-sm font-medium text-text-primary">{comment.author}</span>
+                                                <span className="text-xs text-text-secondary">
+                                                    {new Date(comment.created_at).toLocaleDateString('fa-IR')}
+                                                </span>
+                                            </div>
+                                            <p className="text-sm text-text-secondary whitespace-pre-line">{comment.text}</p>
+                                        </div>
+                                    ))}
+                                </div>
+                            ) : (
+                                <div className="text-center py-8 text-text-secondary">
+                                    <MessageSquare className="w-12 h-12 mx-auto mb-3 opacity-50" />
+                                    <p>هنوز نظری ثبت نشده است</p>
+                                </div>
+                            )}
                         </div>
                     )}
                 </div>
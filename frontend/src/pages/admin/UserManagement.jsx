@@ -332,9 +332,9 @@ export default function UserManagement() {
     const handleSaveUser = async (userData) => {
         try {
             if (selectedUser) {
-                await api.put(`/admin/users/${selectedUser.id}/`, userData);
+                await api.put(`/admin/manage-users/${selectedUser.id}/`, userData);
             } else {
-                await api.post('/admin/users/', userData);
+                await api.post('/admin/manage-users/', userData);
             }
             
             setShowModal(false);
@@ -348,7 +348,7 @@ export default function UserManagement() {
     const handleDeleteUser = async (user) => {
         if (window.confirm(`\u0622\u06cc\u0627 \u0627\u0632 \u062d\u0630\u0641 \u06a9\u0627\u0631\u0628\u0631 "${user.username}" \u0627\u0637\u0645\u06cc\u0646\u0627\u0646 \u062f\u0627\u0631\u06cc\u062f\u061f`)) {
             try {
-                await api.delete(`/admin/users/${user.id}/`);
+                await api.delete(`/admin/manage-users/${user.id}/`);
                 await fetchData();
             } catch (error) {
                 console.error('Error deleting user:', error);
@@ -359,7 +359,7 @@ export default function UserManagement() {
 
     const handleToggleStatus = async (user) => {
         try {
-            await api.patch(`/admin/users/${user.id}/`, {
+            await api.patch(`/admin/manage-users/${user.id}/`, {
                 is_active: !user.is_active
             });
             await fetchData();
@@ -17,27 +17,9 @@ db.createUser({
   ]
 });
 
-// Create initial collections with proper indexes
-db.createCollection('letters');
-db.createCollection('accounts_orgrolegroup');
-db.createCollection('accounts_orgrole');
-db.createCollection('accounts_membership');
-db.createCollection('letters_approval');
-db.createCollection('auth_user');
-
-// Create indexes for better performance
-db.letters.createIndex({ "state": 1 });
-db.letters.createIndex({ "created_at": -1 });
-db.letters.createIndex({ "created_by": 1 });
-db.letters.createIndex({ "applicant_national_id": 1 });
-
-db.letters_approval.createIndex({ "letter_id": 1, "state": 1 });
-db.letters_approval.createIndex({ "letter_id": 1, "state": 1, "step": 1 }, { unique: true });
-
-db.accounts_membership.createIndex({ "user": 1 });
-db.accounts_membership.createIndex({ "role": 1 });
-
-db.auth_user.createIndex({ "username": 1 }, { unique: true });
+// Collections and their indexes are not created here: the indexes are
+// declared on the Django models and built by `python manage.py ensure_indexes`,
+// which also checks the hot queries' plans for collection scans
 
 print('\U0001f389 MongoDB initialization completed for workflow management system');
 print('Database: office');